@@ -1,14 +1,33 @@
 from dotenv import load_dotenv
-from flask import Flask, jsonify, make_response, Response, request
+from flask import Flask, g, jsonify, make_response, Response, request, send_file
 from music_collection.models.stock_model import StockModel
 from music_collection.models.portfolio_model import PortfolioModel
-from music_collection.utils.sql_utils import check_database_connection, check_table_exists
-from typing import Any, Dict, Tuple
+from music_collection.models.indicator_model import IndicatorModel
+from music_collection.models.session_model import SessionModel
+from music_collection.models.price_refresher import PriceRefresher
+from music_collection.models.portfolio_stream import PortfolioStream
+from music_collection.utils import sql_utils
+from music_collection.utils.sql_utils import check_database_connection, check_table_exists, reset_db_connections_after_fork
+from music_collection.utils.history_series import FIELDS as HISTORY_FIELDS
+from music_collection.utils.migrations import run_migrations
+from music_collection.utils.hash_pool import HashPoolBusyError, hash_pool
+from music_collection.utils.quota import QuotaExhaustedError
+from music_collection.utils.compression import compress_response, etag_variants
+from music_collection.utils.json_provider import configure_json, stream_json_array, stream_json_object
+from music_collection.utils.metrics import METRICS_DIR, METRICS_FLUSH_INTERVAL, registry as metrics_registry
+from music_collection.utils.profiling import Profiler
+from datetime import date
+from functools import wraps
+from typing import Any, Dict, Iterable, Optional, Tuple
 from venv import logger
 from flask import Flask, jsonify, make_response, request
 
+import hashlib
+import itertools
 import os
+import queue
 import requests
+import time
 from dotenv import load_dotenv
 
 from music_collection.models.user_model import UserModel
@@ -16,10 +35,232 @@ from music_collection.models.user_model import UserModel
 # Load environment variables from .env file
 load_dotenv()
 
+# Bring the schema up to date without touching existing data
+run_migrations()
+
 app = Flask(__name__)
-user_model = UserModel()
+# orjson when available (JSON_PROVIDER), for every jsonify and stream below
+configure_json(app)
+
+# Largest order list accepted by /api/portfolio/orders
+MAX_BATCH_ORDERS = int(os.getenv('MAX_BATCH_ORDERS', 500))
+# Require a session token on the portfolio endpoints
+REQUIRE_AUTH = os.getenv('REQUIRE_AUTH', 'false').lower() == 'true'
+session_model = SessionModel()
+user_model = UserModel(session_model=session_model)
 stock_model = StockModel()
-portfolio_model = PortfolioModel()
+# Under gunicorn, workers keep the upstream quota buckets here so they share one budget
+QUOTA_STATE_PATH = os.getenv('QUOTA_STATE_PATH', sql_utils.DB_PATH + '.quota')
+portfolio_model = PortfolioModel(stock_model)
+indicator_model = IndicatorModel(stock_model)
+
+# Start with the quotes the previous process left behind instead of a cold cache
+app.logger.info("Warmed quote cache with %d stored quotes", stock_model.warm_quote_cache())
+
+# Keeps stored prices of held symbols fresh; one process at a time does the work
+PRICE_REFRESH_ENABLED = os.getenv('PRICE_REFRESH_ENABLED', 'true').lower() == 'true'
+price_refresher = PriceRefresher(
+    stock_model,
+    portfolio_model.prices,
+    lock_path=os.getenv('PRICE_REFRESH_LOCK', sql_utils.DB_PATH + '.refresh.lock'),
+    interval=float(os.getenv('PRICE_REFRESH_INTERVAL', 60)),
+    batch_size=int(os.getenv('PRICE_REFRESH_BATCH', 5))
+)
+
+# One shared portfolio computation feeds every /api/portfolio/stream subscriber
+portfolio_stream = PortfolioStream(
+    portfolio_model,
+    interval=float(os.getenv('PORTFOLIO_STREAM_INTERVAL', 2)),
+    queue_size=int(os.getenv('PORTFOLIO_STREAM_QUEUE', 16))
+)
+# Seconds between keep-alive comments on an idle stream
+PORTFOLIO_STREAM_HEARTBEAT = float(os.getenv('PORTFOLIO_STREAM_HEARTBEAT', 15))
+
+# Opt-in request profiling, see PROFILE_TOKEN; inert unless a token is configured
+profiler = Profiler()
+
+# Served on /metrics; SQLite and upstream metrics are recorded in sql_utils and http_client
+REQUEST_SECONDS = metrics_registry.histogram(
+    'http_request_duration_seconds', 'Time to produce a response; streamed bodies are not included',
+    ['method', 'route']
+)
+REQUESTS = metrics_registry.counter('http_requests_total', 'Responses sent', ['method', 'route', 'status'])
+REQUESTS_IN_FLIGHT = metrics_registry.gauge('http_requests_in_flight', 'Requests being handled', ['route'])
+
+# In-process caches, reported from the counters they already keep
+CACHES = {
+    'quote': stock_model.quote_cache,
+    'series': stock_model.series_cache,
+    'indicator': indicator_model.cache,
+    'session': session_model.cache
+}
+
+def cache_lookups() -> Dict[Tuple[str, ...], float]:
+    values = {}
+    for name, cache in CACHES.items():
+        stats = cache.stats()
+        for result, key in (('hit', 'hits'), ('stale_hit', 'stale_hits'), ('miss', 'misses')):
+            values[(name, result)] = stats[key]
+    return values
+
+def cache_hit_ratios(values: Dict[str, Dict[Tuple[str, ...], float]]) -> Dict[Tuple[str, ...], float]:
+    lookups = values.get('cache_lookups_total', {})
+    ratios = {}
+    for name in CACHES:
+        hits = lookups.get((name, 'hit'), 0) + lookups.get((name, 'stale_hit'), 0)
+        total = hits + lookups.get((name, 'miss'), 0)
+        ratios[(name,)] = hits / total if total else 0.0
+    return ratios
+
+metrics_registry.callback('cache_lookups_total', 'Cache lookups by result', ['cache', 'result'], 'counter',
+                          cache_lookups)
+metrics_registry.derived('cache_hit_ratio', 'Share of cache lookups served from the cache, stale hits included',
+                         ['cache'], cache_hit_ratios)
+
+def start_background_tasks() -> None:
+    """Start background threads. Called in each server worker, never before a fork."""
+    if PRICE_REFRESH_ENABLED:
+        price_refresher.start()
+    if METRICS_DIR:
+        metrics_registry.start_flushing(METRICS_DIR, METRICS_FLUSH_INTERVAL)
+
+def reset_after_fork() -> None:
+    """
+    Make process-wide state safe to use in a server worker forked from a
+    preloaded parent: DB connections, upstream connection pools, thread pools
+    and the hashing pool are re-created, while warm caches are kept.
+    Called from the post_fork hook in gunicorn.conf.py.
+    """
+    reset_db_connections_after_fork()
+    hash_pool.reset_after_fork()
+    # Also resets the shared stock_model
+    portfolio_model.reset_after_fork()
+    indicator_model.cache.reset_after_fork()
+    portfolio_stream.reset_after_fork()
+    session_model.cache.reset_after_fork()
+    metrics_registry.reset_after_fork()
+    profiler.reset_after_fork()
+
+def bearer_token() -> str:
+    """Get the session token from an "Authorization: Bearer <token>" header."""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        raise ValueError("Missing session token")
+    return token.strip()
+
+def require_session(view):
+    """
+    Reject requests without a valid session token when REQUIRE_AUTH is on.
+    The session is checked against the in-memory cache, so this costs no
+    password hashing; the validated session is available as g.session.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if REQUIRE_AUTH:
+            try:
+                g.session = session_model.validate(bearer_token())
+            except ValueError as ve:
+                return make_response(jsonify({"error": str(ve)}), 401)
+        return view(*args, **kwargs)
+    return wrapper
+
+def require_profile_token(view):
+    """Guard the profiling admin routes: 404 unless profiling is configured, 403 without the token."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not profiler.enabled:
+            return make_response(jsonify({'error': 'Not found'}), 404)
+        if not profiler.check_token(request.headers.get('X-Profile-Token')):
+            return make_response(jsonify({'error': 'Invalid profile token'}), 403)
+        return view(*args, **kwargs)
+    return wrapper
+
+def make_etag(*parts: Any) -> str:
+    """Build a strong ETag value from the data versions and parameters a response depends on."""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+def matching_etag(etag: str) -> Optional[str]:
+    """Return the variant of `etag` (identity or compressed) the client already has, if any."""
+    for variant in etag_variants(etag):
+        if variant in request.if_none_match:
+            return variant
+    return None
+
+def not_modified(etag: str) -> Response:
+    """A 304 response for a representation the client already holds."""
+    response = make_response('', 304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+def streamed_json(chunks: Iterable[bytes], etag: Optional[str] = None) -> Response:
+    """A 200 response streaming pre-encoded JSON chunks, so large bodies are never built in memory."""
+    response = Response(chunks, 200, mimetype='application/json')
+    if etag is not None:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def json_with_etag(data: Any, etag: Optional[str]) -> Response:
+    """A 200 JSON response tagged with `etag`, or a 304 if the client already has it."""
+    if etag is None:
+        return make_response(jsonify(data), 200)
+    matched = matching_etag(etag)
+    if matched is not None:
+        return not_modified(matched)
+    response = make_response(jsonify(data), 200)
+    response.set_etag(etag)
+    # Clients may keep the body but must revalidate before reusing it
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.before_request
+def start_profile() -> None:
+    """Profile the request if it carries the profile token or is sampled."""
+    if profiler.enabled:
+        token = profiler.start(request.method, request.path, request.headers.get('X-Profile-Token'))
+        if token is not None:
+            g.profile_token = token
+
+@app.before_request
+def start_request_metrics() -> None:
+    """Count the request as in flight under its route pattern, which keeps label values bounded."""
+    g.metrics_route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    g.metrics_started = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc((g.metrics_route,))
+
+@app.after_request
+def record_request_metrics(response: Response) -> Response:
+    """Record latency and status. Registered before compress, so it runs after it and includes it."""
+    if 'metrics_started' in g:
+        REQUEST_SECONDS.observe(time.perf_counter() - g.metrics_started, (request.method, g.metrics_route))
+        REQUESTS.inc((request.method, g.metrics_route, str(response.status_code)))
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error: Optional[BaseException]) -> None:
+    if 'metrics_route' in g:
+        REQUESTS_IN_FLIGHT.dec((g.metrics_route,))
+
+@app.after_request
+def finish_profile(response: Response) -> Response:
+    """Save the request's profile and point the client at it. Runs after compress, so includes it."""
+    if 'profile_token' in g:
+        profiler.finish_response(g.pop('profile_token'), response)
+    return response
+
+@app.teardown_request
+def abandon_profile(error: Optional[BaseException]) -> None:
+    # Only left set when the request failed before after_request ran
+    if 'profile_token' in g:
+        profiler.finish(g.pop('profile_token'), 500)
+
+@app.after_request
+def compress(response: Response) -> Response:
+    """Compress large JSON bodies with gzip, or brotli when it is installed and accepted."""
+    return compress_response(response, request.accept_encodings)
+
 @app.route('/api/create-account', methods=['POST'])
 def create_account():
     """
@@ -53,6 +294,9 @@ def create_account():
     except ValueError as ve:
         # Handle validation errors (e.g., username exists, invalid password)
         return jsonify({"error": str(ve)}), 400
+    except HashPoolBusyError as be:
+        # Shed load instead of queueing behind a hashing burst
+        return jsonify({"error": str(be)}), 503, {"Retry-After": "1"}
     except Exception as e:
         # Handle unexpected errors
         return jsonify({"error": "An unexpected error occurred"}), 500
@@ -90,6 +334,9 @@ def login():
     except ValueError as ve:
         # Handle login errors (e.g., invalid credentials)
         return jsonify({"error": str(ve)}), 401
+    except HashPoolBusyError as be:
+        # Shed load instead of queueing behind a hashing burst
+        return jsonify({"error": str(be)}), 503, {"Retry-After": "1"}
     except Exception as e:
         # Handle unexpected errors
         return jsonify({"error": "An unexpected error occurred"}), 500
@@ -129,10 +376,41 @@ def update_password():
     except ValueError as ve:
         # Handle validation errors (e.g., incorrect current password)
         return jsonify({"error": str(ve)}), 400
+    except HashPoolBusyError as be:
+        # Shed load instead of queueing behind a hashing burst
+        return jsonify({"error": str(be)}), 503, {"Retry-After": "1"}
     except Exception as e:
         # Handle unexpected errors
         return jsonify({"error": "An unexpected error occurred"}), 500
 
+@app.route('/api/session', methods=['GET'])
+def get_session() -> Response:
+    """
+    Endpoint to check a session token
+    Expected header: Authorization: Bearer <token>
+    """
+    try:
+        session = session_model.validate(bearer_token())
+        return make_response(jsonify(session), 200)
+    except ValueError as ve:
+        return make_response(jsonify({"error": str(ve)}), 401)
+    except Exception as e:
+        return make_response(jsonify({"error": "An unexpected error occurred"}), 500)
+
+@app.route('/api/logout', methods=['POST'])
+def logout() -> Response:
+    """
+    Endpoint to end a session
+    Expected header: Authorization: Bearer <token>
+    """
+    try:
+        session_model.revoke(bearer_token())
+        return make_response(jsonify({"message": "Logged out"}), 200)
+    except ValueError as ve:
+        return make_response(jsonify({"error": str(ve)}), 401)
+    except Exception as e:
+        return make_response(jsonify({"error": "An unexpected error occurred"}), 500)
+
 
 ####################################################
 #
@@ -175,6 +453,104 @@ def db_check() -> Response:
     except Exception as e:
         return make_response(jsonify({'error': str(e)}), 404)
 
+@app.route('/metrics', methods=['GET'])
+def metrics() -> Response:
+    """
+    Expose request, upstream, SQLite and cache metrics in the Prometheus text format.
+
+    Returns:
+        Plain text exposition. With METRICS_DIR set, values from every server
+        worker are merged.
+    """
+    return Response(metrics_registry.render(METRICS_DIR), 200,
+                    content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/quota', methods=['GET'])
+def get_quota() -> Response:
+    """
+    Report the remaining Alpha Vantage call budget.
+
+    Returns:
+        JSON response with the remaining tokens per limit and granted/rejected
+        counts per priority class (trade, valuation, browse).
+    """
+    return make_response(jsonify(stock_model.get_quota_stats()), 200)
+
+####################################################
+#
+# Profiling
+#
+####################################################
+
+@app.route('/api/admin/profiling', methods=['POST'])
+@require_profile_token
+def set_profiling() -> Response:
+    """
+    Profile a share of all requests for a while, in every server worker.
+
+    Expected JSON Input:
+        - sample_rate (float): Share of requests to profile, 0 to 1 (0 turns sampling off).
+        - duration (float, optional): Seconds before sampling reverts to PROFILE_SAMPLE_RATE. Defaults to 600.
+
+    Returns:
+        JSON response with the applied sample rate and duration.
+    Raises:
+        400 error if the input is invalid.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        sample_rate = float(data.get('sample_rate'))
+        duration = float(data.get('duration', 600))
+        profiler.set_sample_rate(sample_rate, duration)
+    except (TypeError, ValueError) as e:
+        return make_response(jsonify({'error': str(e) or 'sample_rate is required'}), 400)
+    return make_response(jsonify({'sample_rate': sample_rate, 'duration': duration}), 200)
+
+@app.route('/api/admin/profiles', methods=['GET'])
+@require_profile_token
+def list_profiles() -> Response:
+    """
+    List stored request profiles, newest first.
+
+    Returns:
+        JSON array of profile summaries (request, status, wall time and per-phase times).
+    """
+    return make_response(jsonify(profiler.list_profiles()), 200)
+
+@app.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+@require_profile_token
+def get_profile(profile_id: str) -> Response:
+    """
+    Get a stored request profile.
+
+    Path Parameter:
+        - profile_id (str): The id from a response's X-Profile-Id header.
+
+    Query Parameters:
+        - format (str, optional): "json" (default) for the summary with the top functions,
+          "text" for pstats output or "pstats" to download the raw capture.
+        - sort (str, optional): pstats sort key for "text". Defaults to cumulative.
+
+    Returns:
+        The profile in the requested format.
+    Raises:
+        404 error if there is no such profile.
+    """
+    output = request.args.get('format', 'json')
+    try:
+        if output == 'pstats':
+            path = profiler.stats_path(profile_id)
+            if not os.path.exists(path):
+                raise ValueError(f"Profile {profile_id} not found")
+            return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                             download_name=f"{profile_id}.prof")
+        if output == 'text':
+            text = profiler.format_stats(profile_id, request.args.get('sort', 'cumulative'))
+            return Response(text, 200, mimetype='text/plain')
+        return make_response(jsonify(profiler.get_profile(profile_id)), 200)
+    except ValueError as e:
+        return make_response(jsonify({'error': str(e)}), 404)
+
 ####################################################
 #
 # Stock Information
@@ -195,6 +571,9 @@ def get_stock_info(symbol: str) -> Response:
     try:
         stock_info = stock_model.get_stock_info(symbol)
         return make_response(jsonify(stock_info), 200)
+    except QuotaExhaustedError as qe:
+        # Upstream quota is spent; tell the client when to come back
+        return make_response(jsonify({'error': str(qe)}), 503, {'Retry-After': str(qe.retry_after)})
     except Exception as e:
         return make_response(jsonify({'error': str(e)}), 404)
 
@@ -223,12 +602,92 @@ def get_stock_history(symbol: str) -> Response:
     Path Parameter:
         - symbol (str): The stock symbol to look up.
 
+    Query Parameters:
+        - start (str, optional): First date to include (YYYY-MM-DD).
+        - end (str, optional): Last date to include (YYYY-MM-DD).
+        - fields (str, optional): Comma-separated subset of open,high,low,close,volume.
+        - limit (int, optional): Return only the most recent N bars in the range.
+
     Returns:
         JSON response with historical price data.
     """
+    start = request.args.get('start')
+    end = request.args.get('end')
+    fields = request.args.get('fields')
+    limit = request.args.get('limit')
+
+    try:
+        for value in (start, end):
+            if value is not None:
+                date.fromisoformat(value)
+    except ValueError:
+        return make_response(jsonify({'error': 'start and end must be dates in YYYY-MM-DD format'}), 400)
+
+    if fields is not None:
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+        if not fields or any(field not in HISTORY_FIELDS for field in fields):
+            return make_response(jsonify({'error': f'fields must be a subset of {",".join(HISTORY_FIELDS)}'}), 400)
+
+    if limit is not None:
+        if not limit.isdigit() or int(limit) <= 0:
+            return make_response(jsonify({'error': 'limit must be a positive integer'}), 400)
+        limit = int(limit)
+
+    # Stored bars are append-only, so the last bar date plus the parameters identify the body
+    etag_parts = ('history', symbol.upper(), start, end, fields, limit)
+    try:
+        version = stock_model.get_history_version(symbol)
+        if version is not None:
+            matched = matching_etag(make_etag(*etag_parts, version))
+            if matched is not None:
+                return not_modified(matched)
+
+        series = stock_model.get_history_series(symbol)
+        etag = make_etag(*etag_parts, series.last_date or "")
+        matched = matching_etag(etag)
+        if matched is not None:
+            return not_modified(matched)
+        # Bars are encoded block by block as the response is written
+        return streamed_json(stream_json_object(app, series.slice(start, end, limit).iter_items(fields)), etag)
+    except QuotaExhaustedError as qe:
+        # Upstream quota is spent; tell the client when to come back
+        return make_response(jsonify({'error': str(qe)}), 503, {'Retry-After': str(qe.retry_after)})
+    except Exception as e:
+        return make_response(jsonify({'error': str(e)}), 404)
+
+@app.route('/api/stock/<symbol>/indicators', methods=['GET'])
+def get_stock_indicators(symbol: str) -> Response:
+    """
+    Get technical indicators computed over the symbol's daily closes.
+
+    Path Parameter:
+        - symbol (str): The stock symbol to look up.
+
+    Query Parameters:
+        - indicators (str): Comma-separated list of sma, ema, volatility, rsi, drawdown,
+          each optionally followed by ":window" (e.g. "sma:50,rsi:14,drawdown").
+        - limit (int, optional): Return only the most recent N points.
+
+    Returns:
+        JSON response with the dates and one series per indicator.
+    """
+    limit = request.args.get('limit')
+    if limit is not None:
+        if not limit.isdigit() or int(limit) <= 0:
+            return make_response(jsonify({'error': 'limit must be a positive integer'}), 400)
+        limit = int(limit)
+
+    try:
+        specs = indicator_model.parse_specs(request.args.get('indicators', ''))
+    except ValueError as e:
+        return make_response(jsonify({'error': str(e)}), 400)
+
     try:
-        historical_data = stock_model.get_historical_data(symbol)
-        return make_response(jsonify(historical_data), 200)
+        result = indicator_model.get_indicators(symbol, specs, limit)
+        return make_response(jsonify(result), 200)
+    except QuotaExhaustedError as qe:
+        # Upstream quota is spent; tell the client when to come back
+        return make_response(jsonify({'error': str(qe)}), 503, {'Retry-After': str(qe.retry_after)})
     except Exception as e:
         return make_response(jsonify({'error': str(e)}), 404)
 
@@ -239,6 +698,7 @@ def get_stock_history(symbol: str) -> Response:
 ####################################################
 
 @app.route('/api/portfolio', methods=['GET'])
+@require_session
 def get_portfolio() -> Response:
     """
     Get current portfolio holdings.
@@ -247,12 +707,21 @@ def get_portfolio() -> Response:
         JSON response with portfolio holdings and their current values.
     """
     try:
+        # Checked before computing, so an unchanged portfolio costs one query
+        version = portfolio_model.get_data_version()
+        etag = make_etag('portfolio', version) if version is not None else None
+        if etag is not None:
+            matched = matching_etag(etag)
+            if matched is not None:
+                return not_modified(matched)
+
         portfolio = portfolio_model.get_portfolio()
-        return make_response(jsonify(portfolio), 200)
+        return json_with_etag(portfolio, etag)
     except Exception as e:
         return make_response(jsonify({'error': str(e)}), 500)
 
 @app.route('/api/portfolio/value', methods=['GET'])
+@require_session
 def get_portfolio_value() -> Response:
     """
     Get total portfolio value and performance metrics.
@@ -261,12 +730,74 @@ def get_portfolio_value() -> Response:
         JSON response with portfolio value and gains/losses.
     """
     try:
+        version = portfolio_model.get_data_version()
+        etag = make_etag('portfolio-value', version) if version is not None else None
+        if etag is not None:
+            matched = matching_etag(etag)
+            if matched is not None:
+                return not_modified(matched)
+
         portfolio_value = portfolio_model.get_portfolio_value()
-        return make_response(jsonify(portfolio_value), 200)
+        return json_with_etag(portfolio_value, etag)
     except Exception as e:
         return make_response(jsonify({'error': str(e)}), 500)
 
+@app.route('/api/portfolio/lots', methods=['GET'])
+@require_session
+def get_portfolio_lots() -> Response:
+    """
+    List the individual purchase lots behind the holdings.
+
+    Query Parameters:
+        - symbol (str, optional): Only list lots of this symbol.
+
+    Returns:
+        JSON array of lots (id, symbol, shares, purchase_price, purchase_date)
+        ordered by symbol and purchase date, streamed as it is read.
+    """
+    try:
+        lots = portfolio_model.iter_lots(request.args.get('symbol'))
+        # Run the query now so database errors still produce a 500
+        first = next(lots, None)
+    except Exception as e:
+        return make_response(jsonify({'error': str(e)}), 500)
+    return streamed_json(stream_json_array(app, itertools.chain([] if first is None else [first], lots)))
+
+@app.route('/api/portfolio/stream', methods=['GET'])
+@require_session
+def stream_portfolio() -> Response:
+    """
+    Stream portfolio value changes as Server-Sent Events.
+
+    The first "snapshot" event carries every holding (keyed by symbol) and the
+    totals. Later "delta" events carry only the fields that changed; a holding
+    set to null is no longer held. A slow client may get a fresh "snapshot" in
+    place of the deltas it missed.
+
+    Returns:
+        A text/event-stream response.
+    """
+    subscriber = portfolio_stream.subscribe()
+
+    def events():
+        sequence = 0
+        try:
+            while True:
+                try:
+                    event, data = subscriber.get(timeout=PORTFOLIO_STREAM_HEARTBEAT)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                sequence += 1
+                yield f"id: {sequence}\nevent: {event}\ndata: {app.json.dumps(data)}\n\n"
+        finally:
+            portfolio_stream.unsubscribe(subscriber)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/portfolio/buy', methods=['POST'])
+@require_session
 def buy_stock() -> Response:
     """
     Buy shares of a stock.
@@ -291,10 +822,14 @@ def buy_stock() -> Response:
 
         result = portfolio_model.buy_stock(symbol, shares)
         return make_response(jsonify(result), 201)
+    except QuotaExhaustedError as qe:
+        # Upstream quota is spent; tell the client when to come back
+        return make_response(jsonify({'error': str(qe)}), 503, {'Retry-After': str(qe.retry_after)})
     except Exception as e:
         return make_response(jsonify({'error': str(e)}), 500)
 
 @app.route('/api/portfolio/sell', methods=['POST'])
+@require_session
 def sell_stock() -> Response:
     """
     Sell shares of a stock.
@@ -319,11 +854,50 @@ def sell_stock() -> Response:
 
         result = portfolio_model.sell_stock(symbol, shares)
         return make_response(jsonify(result), 200)
+    except QuotaExhaustedError as qe:
+        # Upstream quota is spent; tell the client when to come back
+        return make_response(jsonify({'error': str(qe)}), 503, {'Retry-After': str(qe.retry_after)})
     except ValueError as e:
         return make_response(jsonify({'error': str(e)}), 400)
     except Exception as e:
         return make_response(jsonify({'error': str(e)}), 500)
 
 
+@app.route('/api/portfolio/orders', methods=['POST'])
+@require_session
+def execute_orders() -> Response:
+    """
+    Execute a batch of buy/sell orders in one transaction.
+
+    Expected JSON Input:
+        - orders (list): Orders, each with:
+            - side (str): "buy" or "sell".
+            - symbol (str): The stock symbol.
+            - shares (int): Number of shares.
+
+    Returns:
+        JSON response with one result per order, in request order.
+    """
+    try:
+        data = request.get_json()
+        orders = data.get('orders') if isinstance(data, dict) else None
+
+        if not isinstance(orders, list) or not orders:
+            return make_response(jsonify({'error': 'A non-empty list of orders is required'}), 400)
+
+        if len(orders) > MAX_BATCH_ORDERS:
+            return make_response(jsonify({'error': f'At most {MAX_BATCH_ORDERS} orders per batch'}), 400)
+
+        results = portfolio_model.execute_orders(orders)
+        filled = sum(1 for result in results if result['status'] == 'filled')
+        return make_response(jsonify({
+            'results': results,
+            'filled': filled,
+            'rejected': len(results) - filled
+        }), 200)
+    except Exception as e:
+        return make_response(jsonify({'error': str(e)}), 500)
+
 if __name__ == '__main__':
+    start_background_tasks()
     app.run(debug=True, host='0.0.0.0', port=6000)
@@ -0,0 +1,75 @@
+"""
+Measure PBKDF2 password hashing throughput.
+
+Reports hashes per second on one core (inline) and through the process pool
+used by UserModel, normalized per core in use, for the configured iteration count.
+
+Usage:
+    python benchmarks/bench_hashing.py [--iterations N] [--workers N] [--seconds S]
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from music_collection.utils.hash_pool import HashPool, PASSWORD_HASH_ITERATIONS, pbkdf2
+
+
+def hashes_per_second_inline(iterations: int, seconds: float) -> float:
+    """Hash repeatedly on the calling thread for about `seconds`."""
+    salt = os.urandom(32)
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        pbkdf2("benchmark-password", salt, iterations)
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def hashes_per_second_pool(iterations: int, workers: int, seconds: float) -> float:
+    """Keep the pool saturated from as many threads as it has workers for about `seconds`."""
+    pool = HashPool(workers=workers, max_pending=workers * 2)
+    salt = os.urandom(32)
+    pool.hash("warm-up", salt, 1)
+
+    deadline = time.perf_counter() + seconds
+
+    def worker() -> int:
+        count = 0
+        while time.perf_counter() < deadline:
+            pool.hash("benchmark-password", salt, iterations)
+            count += 1
+        return count
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as threads:
+        total = sum(threads.map(lambda _: worker(), range(workers)))
+    elapsed = time.perf_counter() - start
+    pool.shutdown()
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=PASSWORD_HASH_ITERATIONS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    inline = hashes_per_second_inline(args.iterations, args.seconds)
+    pooled = hashes_per_second_pool(args.iterations, args.workers, args.seconds)
+    cores = min(args.workers, os.cpu_count() or 1)
+    print(json.dumps({
+        "iterations": args.iterations,
+        "cpu_count": os.cpu_count(),
+        "workers": args.workers,
+        "inline_hashes_per_second": round(inline, 2),
+        "inline_ms_per_hash": round(1000 / inline, 2),
+        "pool_hashes_per_second": round(pooled, 2),
+        "pool_hashes_per_second_per_core": round(pooled / cores, 2)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Benchmark the model hot paths against a local Alpha Vantage stand-in.
+
+Seeds synthetic portfolios of each size into a scratch database, times
+PortfolioModel.get_portfolio (warm and cold prices), FIFO lot consumption in
+sell_stock, UserModel.hash_password and StockModel's quote and history
+fetch-and-parse, and measures each one's peak Python allocations with
+tracemalloc. Results are written as JSON for benchmarks/compare.py.
+
+Usage:
+    python benchmarks/bench_models.py [--sizes 10,1000,100000] [--repeat N] [--output FILE]
+        [--upstream-latency-ms MS] [--seed N]
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from fake_alpha_vantage import FakeAlphaVantage
+from music_collection.models.portfolio_model import PortfolioModel, UPSERT_POSITION
+from music_collection.models.stock_model import StockModel
+from music_collection.models.user_model import UserModel
+from music_collection.utils import sql_utils
+from music_collection.utils.hash_pool import HashPool
+from music_collection.utils.migrations import run_migrations
+from music_collection.utils.sql_utils import close_db_connections, get_db_connection
+
+
+INSERT_LOT = "INSERT INTO portfolio (symbol, shares, purchase_price, purchase_date) VALUES (?, ?, ?, ?)"
+
+# Symbol whose lots the FIFO benchmark sells from
+FIFO_SYMBOL = "FIFO"
+
+
+def measure(fn: Callable[[], Any], repeat: int, setup: Optional[Callable[[], None]] = None,
+            warmup: int = 1) -> Dict[str, float]:
+    """
+    Time `fn` over `repeat` runs, then trace one more run's peak allocations.
+
+    `setup` runs before every call, outside the timing.
+
+    Returns:
+        Dict with min, median, p95, mean and standard deviation in milliseconds,
+        and the traced peak in KiB.
+    """
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        fn()
+
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    times.sort()
+    return {
+        "repeat": repeat,
+        "min_ms": round(times[0], 4),
+        "median_ms": round(statistics.median(times), 4),
+        "p95_ms": round(times[max(0, math.ceil(0.95 * len(times)) - 1)], 4),
+        "mean_ms": round(statistics.fmean(times), 4),
+        "stdev_ms": round(statistics.stdev(times), 4) if len(times) > 1 else 0.0,
+        "peak_kib": round(peak / 1024, 1)
+    }
+
+
+def seed_portfolio(lots: int, symbols: List[str], rng: random.Random) -> None:
+    """Replace the lots with `lots` random purchases spread over `symbols`, oldest first."""
+    start = datetime(2015, 1, 1)
+    rows = [(symbols[i % len(symbols)], rng.randint(1, 100), round(rng.uniform(10, 500), 2),
+             (start + timedelta(minutes=i)).isoformat(sep=" "))
+            for i in range(lots)]
+    with get_db_connection() as conn:
+        conn.execute("DELETE FROM portfolio")
+        conn.executemany(INSERT_LOT, rows)
+        conn.commit()
+
+
+def seed_fifo_lots(lots: int) -> None:
+    """Add `lots` one-share lots of FIFO_SYMBOL and its position."""
+    start = datetime(2016, 1, 1)
+    rows = [(FIFO_SYMBOL, 1, 100.0, (start + timedelta(minutes=i)).isoformat(sep=" ")) for i in range(lots)]
+    with get_db_connection() as conn:
+        conn.executemany(INSERT_LOT, rows)
+        conn.execute(UPSERT_POSITION, (FIFO_SYMBOL, lots, 100.0 * lots))
+        conn.commit()
+
+
+def restore_oldest_fifo_lot() -> None:
+    """Add back the oldest one-share lot, which the next one-share sale consumes."""
+    with get_db_connection() as conn:
+        conn.execute(INSERT_LOT, (FIFO_SYMBOL, 1, 100.0, "2000-01-01 00:00:00"))
+        conn.execute(UPSERT_POSITION, (FIFO_SYMBOL, 1, 100.0))
+        conn.commit()
+
+
+def bench_size(size: int, args: argparse.Namespace, rng: random.Random, workdir: str) -> List[Dict[str, Any]]:
+    """Run the portfolio and FIFO benchmarks on a fresh database with `size` lots."""
+    sql_utils.DB_PATH = os.path.join(workdir, f"bench-{size}.db")
+    run_migrations()
+    try:
+        portfolio_model = PortfolioModel()
+        stock_model = portfolio_model.stock_model
+        symbols = [f"S{index:03d}" for index in range(min(size, args.symbols))]
+        seed_portfolio(size, symbols, rng)
+        portfolio_model.rebuild_positions()
+        params = {"lots": size, "symbols": len(symbols)}
+
+        def prices_fresh():
+            portfolio_model.prices.save_prices({symbol: 100.0 for symbol in symbols})
+
+        def prices_stale():
+            # Force every holding upstream: no stored price, no cached quote
+            portfolio_model.prices.save_prices({symbol: 100.0 for symbol in symbols}, time.time() - 86400)
+            stock_model.quote_cache.clear()
+            with get_db_connection() as conn:
+                conn.execute("DELETE FROM quotes")
+                conn.commit()
+
+        results = [
+            {"name": "get_portfolio_warm", "params": params,
+             **measure(portfolio_model.get_portfolio, args.repeat, prices_fresh)},
+            {"name": "get_portfolio_cold", "params": params,
+             **measure(portfolio_model.get_portfolio, args.repeat, prices_stale)}
+        ]
+
+        seed_fifo_lots(size)
+        results.append({"name": "sell_stock_fifo", "params": {"lots": size},
+                        **measure(lambda: portfolio_model.sell_stock(FIFO_SYMBOL, 1), args.repeat,
+                                  restore_oldest_fifo_lot)})
+        return results
+    finally:
+        close_db_connections()
+
+
+def bench_fixed(args: argparse.Namespace, workdir: str) -> List[Dict[str, Any]]:
+    """Run the benchmarks that do not depend on portfolio size."""
+    sql_utils.DB_PATH = os.path.join(workdir, "bench-fixed.db")
+    run_migrations()
+    try:
+        stock_model = StockModel()
+        user_model = UserModel(hash_pool=HashPool(workers=0))
+        return [
+            {"name": "hash_password", "params": {},
+             **measure(lambda: user_model.hash_password("benchmark-password"), args.repeat)},
+            {"name": "fetch_quote", "params": {},
+             **measure(lambda: stock_model._fetch_stock_info("AAPL"), args.repeat)},
+            {"name": "fetch_history_full", "params": {"bars": args.history_days},
+             **measure(lambda: stock_model._fetch_historical_data("AAPL", "full"), args.repeat)}
+        ]
+    finally:
+        close_db_connections()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000,10000,100000",
+                        help="Comma-separated portfolio sizes, in lots")
+    parser.add_argument("--symbols", type=int, default=20, help="Distinct symbols the lots are spread over")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--upstream-latency-ms", type=float, default=0.0)
+    parser.add_argument("--history-days", type=int, default=5000)
+    parser.add_argument("--output", help="Write results here instead of stdout")
+    args = parser.parse_args()
+
+    fake = FakeAlphaVantage(latency_ms=args.upstream_latency_ms, history_days=args.history_days).start()
+    # Models read these when constructed: use the stand-in, without quota limits
+    os.environ["ALPHA_VANTAGE_BASE_URL"] = fake.url
+    os.environ["ALPHA_VANTAGE_CALLS_PER_MINUTE"] = "0"
+    os.environ["ALPHA_VANTAGE_CALLS_PER_DAY"] = "0"
+
+    rng = random.Random(args.seed)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            for size in (int(size) for size in args.sizes.split(",")):
+                print(f"Benchmarking {size} lots...", file=sys.stderr)
+                results.extend(bench_size(size, args, rng, workdir))
+            results.extend(bench_fixed(args, workdir))
+    finally:
+        fake.stop()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args)
+        },
+        "results": results
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
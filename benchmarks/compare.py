@@ -0,0 +1,69 @@
+"""
+Compare two bench_models.py result files.
+
+Matches benchmarks by name and parameters and reports the change in a timing
+statistic and in peak memory. Exits with status 1 when any benchmark got
+slower (or used more memory) by more than the threshold, so it can gate CI.
+
+Usage:
+    python benchmarks/compare.py BASELINE.json CANDIDATE.json [--metric median_ms] [--threshold 0.1]
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, Tuple
+
+
+def load_results(path: str) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Index a result file's benchmarks by (name, parameters)."""
+    with open(path) as f:
+        report = json.load(f)
+    return {(result["name"], json.dumps(result["params"], sort_keys=True)): result
+            for result in report["results"]}
+
+
+def change(baseline: float, candidate: float) -> float:
+    return (candidate - baseline) / baseline if baseline else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", default="median_ms", help="Timing statistic to compare (min_ms, median_ms, p95_ms...)")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown reported as a regression")
+    parser.add_argument("--memory-threshold", type=float, default=0.2,
+                        help="Relative peak memory growth reported as a regression")
+    args = parser.parse_args()
+
+    baseline = load_results(args.baseline)
+    candidate = load_results(args.candidate)
+
+    print(f"{'benchmark':<24} {'params':<32} {'baseline':>10} {'candidate':>10} {'change':>8} "
+          f"{'peak KiB':>10} {'change':>8}")
+    regressions = 0
+    for key in sorted(baseline.keys() & candidate.keys()):
+        name, params = key
+        old, new = baseline[key], candidate[key]
+        time_change = change(old[args.metric], new[args.metric])
+        memory_change = change(old["peak_kib"], new["peak_kib"])
+        flags = []
+        if time_change > args.threshold:
+            flags.append("SLOWER")
+        if memory_change > args.memory_threshold:
+            flags.append("MORE MEMORY")
+        regressions += bool(flags)
+        print(f"{name:<24} {params:<32} {old[args.metric]:>10.3f} {new[args.metric]:>10.3f} {time_change:>+8.1%} "
+              f"{new['peak_kib']:>10.1f} {memory_change:>+8.1%} {' '.join(flags)}")
+
+    for key in sorted(baseline.keys() - candidate.keys()):
+        print(f"{key[0]:<24} {key[1]:<32} only in baseline")
+    for key in sorted(candidate.keys() - baseline.keys()):
+        print(f"{key[0]:<24} {key[1]:<32} only in candidate")
+
+    print(f"\n{regressions} regression(s) beyond {args.threshold:.0%} time / {args.memory_threshold:.0%} memory")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Local stand-in for the Alpha Vantage API, for benchmarks and load tests.
+
+Serves GLOBAL_QUOTE and TIME_SERIES_DAILY from /query with deterministic data
+derived from the symbol, after a configurable delay, and fails a configurable
+share of calls with HTTP 503 or an Alpha Vantage style rate-limit note.
+Symbols starting with "INVALID" get the empty response Alpha Vantage returns
+for unknown symbols. Point the app at it with
+ALPHA_VANTAGE_BASE_URL=http://127.0.0.1:<port>/query.
+
+Usage:
+    python benchmarks/fake_alpha_vantage.py [--port N] [--latency-ms MS] [--jitter-ms MS]
+        [--error-rate F] [--note-rate F] [--history-days N]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+def base_price(symbol: str) -> float:
+    """A stable price between 10 and 500 for a symbol."""
+    return 10 + zlib.crc32(symbol.encode("utf-8")) % 49000 / 100
+
+
+def trading_days(count: int, end: Optional[date] = None) -> List[date]:
+    """The last `count` weekdays up to `end` (today by default), newest first."""
+    day = end or date.today()
+    days = []
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day)
+        day -= timedelta(days=1)
+    return days
+
+
+def global_quote(symbol: str) -> Dict[str, Any]:
+    price = base_price(symbol)
+    return {"Global Quote": {
+        "01. symbol": symbol,
+        "02. open": f"{price * 0.99:.4f}",
+        "03. high": f"{price * 1.01:.4f}",
+        "04. low": f"{price * 0.98:.4f}",
+        "05. price": f"{price:.4f}",
+        "06. volume": str(1000000 + zlib.crc32(symbol.encode("utf-8")) % 1000000),
+        "07. latest trading day": trading_days(1)[0].isoformat(),
+        "08. previous close": f"{price * 0.995:.4f}",
+        "09. change": f"{price * 0.005:.4f}",
+        "10. change percent": "0.5025%"
+    }}
+
+
+def time_series_daily(symbol: str, days: int) -> Dict[str, Any]:
+    """A seeded random walk ending at the symbol's base price."""
+    rng = random.Random(symbol)
+    price = base_price(symbol)
+    series = {}
+    for day in trading_days(days):
+        close = price
+        price = max(1.0, price * (1 + rng.gauss(0, 0.015)))
+        series[day.isoformat()] = {
+            "1. open": f"{price:.4f}",
+            "2. high": f"{max(price, close) * 1.005:.4f}",
+            "3. low": f"{min(price, close) * 0.995:.4f}",
+            "4. close": f"{close:.4f}",
+            "5. volume": str(rng.randint(100000, 5000000))
+        }
+    return {
+        "Meta Data": {"1. Information": "Daily Prices (open, high, low, close) and Volumes", "2. Symbol": symbol},
+        "Time Series (Daily)": series
+    }
+
+
+class FakeAlphaVantage:
+    """
+    The stand-in server, run on a background thread.
+
+    Args:
+        port (int): Port to listen on; 0 picks a free one.
+        latency_ms (float): Delay before every response.
+        jitter_ms (float): Extra delay, uniform between 0 and this.
+        error_rate (float): Share of calls answered with HTTP 503.
+        note_rate (float): Share of calls answered with a rate-limit note.
+        history_days (int): Bars returned for outputsize=full (compact returns 100).
+    """
+
+    def __init__(self, port: int = 0, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, note_rate: float = 0.0, history_days: int = 5000):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.note_rate = note_rate
+        self.history_days = history_days
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._history: Dict[tuple, bytes] = {}
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/query"
+
+    def start(self) -> "FakeAlphaVantage":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-alpha-vantage", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def respond(self, params: Dict[str, str]) -> tuple:
+        """Build (status, body) for a query, counting it by function."""
+        function = params.get("function", "")
+        symbol = params.get("symbol", "").upper()
+        with self._lock:
+            self.calls[function] = self.calls.get(function, 0) + 1
+
+        roll = random.random()
+        if roll < self.error_rate:
+            return 503, b'{"error": "Service Unavailable"}'
+        if roll < self.error_rate + self.note_rate:
+            return 200, json.dumps({"Note": "Thank you for using Alpha Vantage! Our standard API call "
+                                            "frequency is 5 calls per minute and 25 calls per day."}).encode()
+
+        if function == "GLOBAL_QUOTE":
+            data = {"Global Quote": {}} if symbol.startswith("INVALID") else global_quote(symbol)
+            return 200, json.dumps(data).encode()
+        if function == "TIME_SERIES_DAILY":
+            if symbol.startswith("INVALID"):
+                return 200, b'{"Error Message": "Invalid API call."}'
+            days = self.history_days if params.get("outputsize") == "full" else 100
+            # Series are deterministic, so each one is generated once
+            key = (symbol, days, date.today())
+            body = self._history.get(key)
+            if body is None:
+                body = self._history[key] = json.dumps(time_series_daily(symbol, days)).encode()
+            return 200, body
+        return 200, b'{"Error Message": "Invalid API call."}'
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; without this, delayed ACKs add ~40ms
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != "/query":
+                    self.send_error(404)
+                    return
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                delay = fake.latency_ms + random.uniform(0, fake.jitter_ms)
+                if delay > 0:
+                    time.sleep(delay / 1000)
+                status, body = fake.respond(params)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--note-rate", type=float, default=0.0)
+    parser.add_argument("--history-days", type=int, default=5000)
+    args = parser.parse_args()
+
+    fake = FakeAlphaVantage(args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.note_rate,
+                            args.history_days).start()
+    print(f"Serving fake Alpha Vantage at {fake.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""
+Replay a weighted mix of API traffic and report latency and throughput per endpoint.
+
+Virtual users send create-account, login, quote, history, buy, sell and
+portfolio-value requests picked by weight, either as fast as `--concurrency`
+users can (closed loop) or at a fixed `--rate` of requests per second (open
+loop, with latency measured from each request's scheduled start so a slow
+server cannot hide its queueing). Reports p50/p95/p99 latency, throughput and
+error rate per endpoint.
+
+With --start-app it also starts the fake Alpha Vantage stand-in and the app
+(under gunicorn, on a scratch database, without upstream quota limits) and
+stops them afterwards; otherwise it targets a running app at --url.
+
+Usage:
+    python benchmarks/loadgen.py --start-app [--concurrency 32 | --rate 500] [--duration 30]
+        [--mix quote=10,history=2,...] [--output FILE]
+"""
+import argparse
+import collections
+import contextlib
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import requests
+
+from fake_alpha_vantage import FakeAlphaVantage
+
+
+DEFAULT_MIX = "create_account=1,login=2,quote=10,history=3,buy=2,sell=2,portfolio_value=5"
+PASSWORD = "loadtest-password"
+# Shares bought per symbol before the run, so sells never run out
+SEED_SHARES = 1000000
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Workload:
+    """
+    The requests of the mix, sharing one account pool and symbol set.
+
+    Each operation returns (status code, ok); connection errors are raised.
+    """
+
+    def __init__(self, base_url: str, symbols: List[str], users: int, timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.symbols = symbols
+        self.timeout = timeout
+        self.run_id = uuid.uuid4().hex[:8]
+        self.usernames = [f"lt-{self.run_id}-{index}" for index in range(users)]
+        self.token: Optional[str] = None
+        self._counter = 0
+        self._counter_lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        # One keep-alive connection per virtual user
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            if self.token:
+                session.headers["Authorization"] = f"Bearer {self.token}"
+        return session
+
+    def setup(self) -> None:
+        """Create the login accounts, take a session token and seed holdings to sell from."""
+        for username in self.usernames:
+            self._post("/api/create-account", {"username": username, "password": PASSWORD})
+        response = self.session.post(f"{self.base_url}/api/login",
+                                     json={"username": self.usernames[0], "password": PASSWORD},
+                                     timeout=self.timeout)
+        response.raise_for_status()
+        self.token = response.json().get("token")
+        self.session.headers["Authorization"] = f"Bearer {self.token}"
+        for symbol in self.symbols:
+            status, ok = self._post("/api/portfolio/buy", {"symbol": symbol, "shares": SEED_SHARES})
+            if not ok:
+                raise RuntimeError(f"Seeding {symbol} failed with status {status}")
+
+    def create_account(self) -> Tuple[int, bool]:
+        with self._counter_lock:
+            self._counter += 1
+            username = f"lt-{self.run_id}-new-{self._counter}"
+        return self._post("/api/create-account", {"username": username, "password": PASSWORD})
+
+    def login(self) -> Tuple[int, bool]:
+        return self._post("/api/login", {"username": random.choice(self.usernames), "password": PASSWORD})
+
+    def quote(self) -> Tuple[int, bool]:
+        return self._get(f"/api/stock/{random.choice(self.symbols)}")
+
+    def history(self) -> Tuple[int, bool]:
+        return self._get(f"/api/stock/{random.choice(self.symbols)}/history?limit=100")
+
+    def buy(self) -> Tuple[int, bool]:
+        return self._post("/api/portfolio/buy", {"symbol": random.choice(self.symbols), "shares": 1})
+
+    def sell(self) -> Tuple[int, bool]:
+        return self._post("/api/portfolio/sell", {"symbol": random.choice(self.symbols), "shares": 1})
+
+    def portfolio_value(self) -> Tuple[int, bool]:
+        return self._get("/api/portfolio/value")
+
+    def _get(self, path: str) -> Tuple[int, bool]:
+        response = self.session.get(self.base_url + path, timeout=self.timeout)
+        response.content
+        return response.status_code, response.status_code < 400
+
+    def _post(self, path: str, payload: Dict[str, Any]) -> Tuple[int, bool]:
+        response = self.session.post(self.base_url + path, json=payload, timeout=self.timeout)
+        response.content
+        return response.status_code, response.status_code < 400
+
+
+class Recorder:
+    """Collects (latency, status, ok) per endpoint after the warm-up period."""
+
+    def __init__(self, measure_from: float):
+        self.measure_from = measure_from
+        self.samples: Dict[str, List[Tuple[float, str, bool]]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, started: float, status: str, ok: bool) -> None:
+        if started < self.measure_from:
+            return
+        latency_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append((latency_ms, status, ok))
+
+
+def run_operation(workload: Workload, recorder: Recorder, endpoint: str, started: float) -> None:
+    try:
+        status, ok = getattr(workload, endpoint)()
+        recorder.record(endpoint, started, str(status), ok)
+    except requests.exceptions.RequestException as e:
+        recorder.record(endpoint, started, type(e).__name__, False)
+
+
+def run_closed_loop(workload: Workload, pick: Callable[[], str], recorder: Recorder, concurrency: int,
+                    deadline: float) -> None:
+    """Each of `concurrency` users sends its next request as soon as the previous one completes."""
+    def user():
+        while time.perf_counter() < deadline:
+            run_operation(workload, recorder, pick(), time.perf_counter())
+
+    threads = [threading.Thread(target=user, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_open_loop(workload: Workload, pick: Callable[[], str], recorder: Recorder, concurrency: int,
+                  rate: float, deadline: float) -> int:
+    """
+    Start requests on a fixed schedule of `rate` per second, served by up to
+    `concurrency` users. Latency counts from the scheduled start, so time a
+    request spends waiting for a free user is included.
+
+    Returns:
+        int: Requests still waiting for a user when the schedule ended; they are
+        sent and measured before returning.
+    """
+    schedule: Deque[Tuple[float, str]] = collections.deque()
+    cond = threading.Condition()
+    done = threading.Event()
+
+    def user():
+        while True:
+            with cond:
+                while not schedule and not done.is_set():
+                    cond.wait()
+                if not schedule:
+                    return
+                started, endpoint = schedule.popleft()
+            run_operation(workload, recorder, endpoint, started)
+
+    threads = [threading.Thread(target=user, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    interval = 1 / rate
+    next_start = time.perf_counter()
+    while next_start < deadline:
+        delay = next_start - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        with cond:
+            schedule.append((next_start, pick()))
+            cond.notify()
+        next_start += interval
+
+    with cond:
+        backlog = len(schedule)
+        done.set()
+        cond.notify_all()
+    for thread in threads:
+        thread.join()
+    return backlog
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def summarize(samples: List[Tuple[float, str, bool]], seconds: float) -> Dict[str, Any]:
+    latencies = sorted(latency for latency, _, _ in samples)
+    errors = sum(1 for _, _, ok in samples if not ok)
+    statuses: Dict[str, int] = {}
+    for _, status, _ in samples:
+        statuses[status] = statuses.get(status, 0) + 1
+    return {
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / seconds, 2),
+        "error_rate": round(errors / len(samples), 4),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "max_ms": round(latencies[-1], 2),
+        "statuses": statuses
+    }
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        endpoint, _, weight = part.partition("=")
+        endpoint = endpoint.strip()
+        if not callable(getattr(Workload, endpoint, None)) or endpoint.startswith("_") or endpoint == "setup":
+            raise ValueError(f"Unknown endpoint {endpoint} in --mix")
+        weights[endpoint] = float(weight or 1)
+    return weights
+
+
+def start_app(port: int, upstream_url: str, workdir: str, workers: int, log) -> subprocess.Popen:
+    """Start the app under gunicorn against the stand-in and wait until it answers."""
+    env = dict(os.environ,
+               PORT=str(port),
+               DB_PATH=os.path.join(workdir, "loadtest.db"),
+               ALPHA_VANTAGE_BASE_URL=upstream_url,
+               ALPHA_VANTAGE_CALLS_PER_MINUTE="0",
+               ALPHA_VANTAGE_CALLS_PER_DAY="0",
+               METRICS_DIR=os.path.join(workdir, "metrics"),
+               WEB_WORKERS=str(workers),
+               WEB_LOG_LEVEL="warning")
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+                                "--access-logfile", "/dev/null", "app:app"],
+                               cwd=APP_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App exited with status {process.returncode}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/api/health", timeout=1).ok:
+                return process
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("App did not become healthy within 30s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:6000", help="App to target (ignored with --start-app)")
+    parser.add_argument("--start-app", action="store_true", help="Start the stand-in and the app for the run")
+    parser.add_argument("--port", type=int, default=6100, help="Port for --start-app")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Gunicorn workers for --start-app")
+    parser.add_argument("--upstream-latency-ms", type=float, default=50.0, help="Stand-in latency for --start-app")
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0, help="Stand-in 503 share for --start-app")
+    parser.add_argument("--app-log", default=os.devnull, help="File for the app's log output with --start-app")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Comma-separated endpoint=weight pairs")
+    parser.add_argument("--concurrency", type=int, default=16, help="Virtual users")
+    parser.add_argument("--rate", type=float, help="Target requests per second (open loop) instead of closed loop")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds of traffic before measuring")
+    parser.add_argument("--symbols", default=",".join(f"S{index:03d}" for index in range(20)))
+    parser.add_argument("--users", type=int, default=20, help="Accounts created up front for logins")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Also write the report as JSON here")
+    args = parser.parse_args()
+
+    try:
+        weights = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    random.seed(args.seed)
+    endpoints, endpoint_weights = list(weights), list(weights.values())
+
+    def pick() -> str:
+        return random.choices(endpoints, endpoint_weights)[0]
+
+    fake = app = None
+    stack = contextlib.ExitStack()
+    workdir = stack.enter_context(tempfile.TemporaryDirectory())
+    try:
+        base_url = args.url
+        if args.start_app:
+            fake = FakeAlphaVantage(latency_ms=args.upstream_latency_ms, error_rate=args.upstream_error_rate).start()
+            app_log = stack.enter_context(open(args.app_log, "w"))
+            app = start_app(args.port, fake.url, workdir, args.workers, app_log)
+            base_url = f"http://127.0.0.1:{args.port}"
+
+        workload = Workload(base_url, args.symbols.split(","), args.users, args.timeout)
+        workload.setup()
+
+        start = time.perf_counter()
+        recorder = Recorder(measure_from=start + args.warmup)
+        deadline = start + args.warmup + args.duration
+        backlog = 0
+        print(f"Running {'%g req/s' % args.rate if args.rate else 'closed loop'} with {args.concurrency} users "
+              f"for {args.warmup:g}s warm-up + {args.duration:g}s against {base_url}", file=sys.stderr)
+        if args.rate:
+            backlog = run_open_loop(workload, pick, recorder, args.concurrency, args.rate, deadline)
+        else:
+            run_closed_loop(workload, pick, recorder, args.concurrency, deadline)
+        measured = max(time.perf_counter() - recorder.measure_from, 1e-9)
+    finally:
+        if app is not None:
+            app.terminate()
+            app.wait()
+        if fake is not None:
+            fake.stop()
+        stack.close()
+
+    per_endpoint = {endpoint: summarize(samples, measured) for endpoint, samples in sorted(recorder.samples.items())}
+    all_samples = [sample for samples in recorder.samples.values() for sample in samples]
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "measured_seconds": round(measured, 2),
+        "queued_at_end": backlog,
+        "total": summarize(all_samples, measured) if all_samples else None,
+        "endpoints": per_endpoint
+    }
+
+    print(f"{'endpoint':<16} {'requests':>9} {'req/s':>9} {'errors':>8} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9}")
+    for endpoint, stats in list(per_endpoint.items()) + [("TOTAL", report["total"])]:
+        if stats is None:
+            continue
+        print(f"{endpoint:<16} {stats['requests']:>9} {stats['throughput_rps']:>9.1f} {stats['error_rate']:>8.2%} "
+              f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['max_ms']:>9.1f}")
+    if backlog > args.concurrency:
+        print(f"{backlog} requests were still queued when the schedule ended: the target rate was not sustained",
+              file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
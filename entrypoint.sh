@@ -13,5 +13,10 @@ else
     echo "Skipping database creation."
 fi
 
-# Start the Python application
-exec python app.py
+# Start the Python application: gunicorn with several workers in production,
+# the single-process Flask development server otherwise
+if [ "${SERVER_MODE:-production}" = "production" ]; then
+    exec gunicorn -c gunicorn.conf.py app:app
+else
+    exec python app.py
+fi
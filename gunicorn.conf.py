@@ -0,0 +1,67 @@
+"""
+Gunicorn settings for production serving (SERVER_MODE=production).
+
+The app is imported once in the master (preload_app), which applies schema
+migrations a single time and lets workers share its memory copy-on-write.
+Each worker then re-creates its DB connections, thread pools and upstream
+connections in post_fork. Workers are recycled after a jittered number of
+requests so they do not all restart at once.
+"""
+import multiprocessing
+import os
+
+# Workers share metrics through snapshot files so any of them can serve
+# /metrics for the whole server; set before the app is preloaded
+os.environ.setdefault("METRICS_DIR", "/tmp/stock-trading-metrics")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '6000')}"
+
+# Requests mostly wait on SQLite and Alpha Vantage, so each process serves
+# several at once on threads
+worker_class = "gthread"
+workers = int(os.getenv("WEB_WORKERS", multiprocessing.cpu_count()))
+threads = int(os.getenv("WEB_THREADS", 8))
+
+preload_app = True
+
+# Graceful recycling
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.getenv("WEB_MAX_REQUESTS_JITTER", 1000))
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", 30))
+timeout = int(os.getenv("WEB_TIMEOUT", 60))
+keepalive = int(os.getenv("WEB_KEEPALIVE", 5))
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("WEB_LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    # Counters restart with the server, not with each recycled worker
+    import app
+    from music_collection.utils.metrics import clear_snapshots
+    clear_snapshots(app.METRICS_DIR)
+
+
+def post_fork(server, worker):
+    import app
+    app.reset_after_fork()
+    # All workers spend from one upstream quota
+    app.stock_model.scheduler.share(app.QUOTA_STATE_PATH)
+    app.start_background_tasks()
+
+
+def worker_exit(server, worker):
+    # Stop the password hashing processes and the price refresher with the worker,
+    # and leave its final metrics for the workers that remain
+    import app
+    app.hash_pool.shutdown()
+    app.price_refresher.stop()
+    app.metrics_registry.stop_flushing(app.METRICS_DIR)
+
+
+def child_exit(server, worker):
+    # In the master once a worker is gone: keep its counters, drop its gauges
+    import app
+    from music_collection.utils.metrics import fold_snapshot
+    fold_snapshot(app.METRICS_DIR, worker.pid)
@@ -1,3 +1,6 @@
+-- Resets the database. Dropping schema_migrations makes the app re-apply every
+-- migration in sql/migrations on its next start.
+DROP TABLE IF EXISTS schema_migrations;
 DROP TABLE IF EXISTS stocks; 
 CREATE TABLE stocks (
     symbol TEXT, 
@@ -22,4 +25,30 @@ CREATE TABLE users(
 	hashed_password BLOB NOT NULL, 
 	PRIMARY KEY (id), 
 	UNIQUE (username)
-);
\ No newline at end of file
+);
+DROP TABLE IF EXISTS daily_bars;
+CREATE TABLE daily_bars (
+    symbol TEXT NOT NULL,
+    date TEXT NOT NULL,
+    open REAL NOT NULL,
+    high REAL NOT NULL,
+    low REAL NOT NULL,
+    close REAL NOT NULL,
+    volume INTEGER NOT NULL,
+    PRIMARY KEY (symbol, date)
+) WITHOUT ROWID;
+DROP TABLE IF EXISTS history_sync;
+CREATE TABLE history_sync (
+    symbol TEXT PRIMARY KEY,
+    last_checked REAL NOT NULL
+);
+DROP TABLE IF EXISTS positions;
+CREATE TABLE positions (
+    symbol TEXT PRIMARY KEY,
+    total_shares INTEGER NOT NULL,
+    total_cost REAL NOT NULL
+);
+-- Tables created only by migrations; they are re-created on the next start
+DROP TABLE IF EXISTS sessions;
+DROP TABLE IF EXISTS quotes;
+DROP TABLE IF EXISTS data_versions;
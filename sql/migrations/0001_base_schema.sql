@@ -0,0 +1,49 @@
+-- Tables that existed before migrations were introduced. Everything is
+-- IF NOT EXISTS so databases created by create_portfolio_table.sql keep their data.
+CREATE TABLE IF NOT EXISTS stocks (
+    symbol TEXT,
+    company_name TEXT,
+    last_price REAL,
+    last_updated TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS portfolio (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    symbol TEXT,
+    shares INTEGER,
+    purchase_price REAL,
+    purchase_date TIMESTAMP,
+    FOREIGN KEY (symbol) REFERENCES stocks(symbol)
+);
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER NOT NULL,
+    username VARCHAR(50) NOT NULL,
+    salt BLOB NOT NULL,
+    hashed_password BLOB NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE (username)
+);
+CREATE TABLE IF NOT EXISTS daily_bars (
+    symbol TEXT NOT NULL,
+    date TEXT NOT NULL,
+    open REAL NOT NULL,
+    high REAL NOT NULL,
+    low REAL NOT NULL,
+    close REAL NOT NULL,
+    volume INTEGER NOT NULL,
+    PRIMARY KEY (symbol, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS history_sync (
+    symbol TEXT PRIMARY KEY,
+    last_checked REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS positions (
+    symbol TEXT PRIMARY KEY,
+    total_shares INTEGER NOT NULL,
+    total_cost REAL NOT NULL
+);
+-- Fill positions for symbols that only have lots (databases older than the table)
+INSERT OR IGNORE INTO positions (symbol, total_shares, total_cost)
+SELECT symbol, SUM(shares), SUM(shares * purchase_price)
+FROM portfolio
+GROUP BY symbol
+HAVING SUM(shares) > 0;
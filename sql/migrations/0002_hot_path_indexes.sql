@@ -0,0 +1,2 @@
+-- FIFO lot reads: WHERE symbol = ? ORDER BY purchase_date, id
+CREATE INDEX IF NOT EXISTS idx_portfolio_symbol_purchase_date ON portfolio (symbol, purchase_date);
@@ -0,0 +1,11 @@
+-- Login sessions. Only the random token id is stored; the signature half of
+-- the token is derived from SESSION_SECRET and never persisted.
+CREATE TABLE IF NOT EXISTS sessions (
+    token_id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    username TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions (user_id);
+CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at);
@@ -0,0 +1,6 @@
+-- The stocks table now holds the latest known price per held symbol, written
+-- by the background refresher. last_updated is Unix time in seconds.
+-- Keep one row per symbol before making symbol unique.
+DELETE FROM stocks
+WHERE rowid NOT IN (SELECT MAX(rowid) FROM stocks GROUP BY symbol);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_stocks_symbol ON stocks (symbol);
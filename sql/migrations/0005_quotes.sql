@@ -0,0 +1,8 @@
+-- Second-tier quote cache that survives restarts. payload is the quote as
+-- returned by StockModel.get_stock_info, as JSON; fetched_at is Unix time.
+CREATE TABLE IF NOT EXISTS quotes (
+    symbol TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_quotes_fetched_at ON quotes (fetched_at);
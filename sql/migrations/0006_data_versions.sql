@@ -0,0 +1,20 @@
+-- Version counters bumped by triggers whenever the underlying data changes, so
+-- any process can tell whether a cached response is still current.
+CREATE TABLE IF NOT EXISTS data_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO data_versions (name, version) VALUES ('portfolio', 0);
+
+CREATE TRIGGER IF NOT EXISTS portfolio_version_insert AFTER INSERT ON portfolio
+BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'portfolio';
+END;
+CREATE TRIGGER IF NOT EXISTS portfolio_version_update AFTER UPDATE ON portfolio
+BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'portfolio';
+END;
+CREATE TRIGGER IF NOT EXISTS portfolio_version_delete AFTER DELETE ON portfolio
+BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'portfolio';
+END;
@@ -0,0 +1,11 @@
+#!/bin/bash
+
+# Recompute the positions summary table from the portfolio lots
+if [ -f "$DB_PATH" ]; then
+    echo "Rebuilding positions in $DB_PATH."
+    sqlite3 "$DB_PATH" < /app/sql/rebuild_positions.sql
+    echo "Positions rebuilt successfully."
+else
+    echo "Database not found at $DB_PATH."
+    exit 1
+fi
@@ -0,0 +1,13 @@
+CREATE TABLE IF NOT EXISTS positions (
+    symbol TEXT PRIMARY KEY,
+    total_shares INTEGER NOT NULL,
+    total_cost REAL NOT NULL
+);
+BEGIN;
+DELETE FROM positions;
+INSERT INTO positions (symbol, total_shares, total_cost)
+SELECT symbol, SUM(shares), SUM(shares * purchase_price)
+FROM portfolio
+GROUP BY symbol
+HAVING SUM(shares) > 0;
+COMMIT;
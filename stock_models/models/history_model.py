@@ -0,0 +1,52 @@
+import time
+from typing import Dict, Optional
+from music_collection.utils.history_series import HistorySeries
+from music_collection.utils.sql_utils import get_db_connection
+
+
+class HistoryModel:
+    """Local store of daily OHLCV bars, keyed by (symbol, date)."""
+
+    def __init__(self, refresh_interval: float = 3600):
+        self.refresh_interval = refresh_interval
+
+    def get_series(self, symbol: str) -> HistorySeries:
+        """Get every stored bar for a symbol as columnar arrays, oldest first."""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT date, open, high, low, close, volume FROM daily_bars WHERE symbol = ? ORDER BY date",
+                (symbol,)
+            )
+            return HistorySeries.from_rows(cursor.fetchall())
+
+    def get_last_date(self, symbol: str) -> Optional[str]:
+        """Get the date (YYYY-MM-DD) of the newest stored bar, or None if there are none."""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT MAX(date) FROM daily_bars WHERE symbol = ?", (symbol,))
+            return cursor.fetchone()[0]
+
+    def save_bars(self, symbol: str, bars: Dict[str, Dict]) -> None:
+        """Store bars for a symbol and record that it was just checked upstream."""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                "INSERT OR REPLACE INTO daily_bars (symbol, date, open, high, low, close, volume) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(symbol, date, bar["open"], bar["high"], bar["low"], bar["close"], bar["volume"])
+                 for date, bar in bars.items()]
+            )
+            cursor.execute(
+                "INSERT OR REPLACE INTO history_sync (symbol, last_checked) VALUES (?, ?)",
+                (symbol, time.time())
+            )
+            conn.commit()
+
+    def needs_refresh(self, symbol: str) -> bool:
+        """Check whether a symbol has not been synced with upstream within the refresh interval."""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT last_checked FROM history_sync WHERE symbol = ?", (symbol,))
+            row = cursor.fetchone()
+        return row is None or time.time() - row[0] > self.refresh_interval
@@ -0,0 +1,111 @@
+import math
+import os
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from .stock_model import StockModel
+from music_collection.utils import indicators
+from music_collection.utils.cache import TTLCache
+
+
+# Indicator name -> (function, default window). Windowless indicators use None.
+INDICATORS = {
+    "sma": (indicators.sma, 20),
+    "ema": (indicators.ema, 20),
+    "volatility": (indicators.volatility, 20),
+    "rsi": (indicators.rsi, 14),
+    "drawdown": (indicators.drawdown, None)
+}
+
+# Smallest window an indicator is defined for, where more than 1.
+# The sample standard deviation needs at least two closes.
+MIN_WINDOWS = {"volatility": 2}
+
+
+class IndicatorModel:
+    def __init__(self, stock_model: Optional[StockModel] = None):
+        self.stock_model = stock_model or StockModel()
+
+        # Results are keyed by the last bar date, so a new bar naturally misses
+        self.cache = TTLCache(
+            maxsize=int(os.getenv('INDICATOR_CACHE_SIZE', 1024)),
+            ttl=float(os.getenv('INDICATOR_CACHE_TTL', 86400))
+        )
+
+    def parse_specs(self, spec: str) -> List[Tuple[str, Optional[int]]]:
+        """
+        Parse an indicator list such as "sma:50,ema,rsi:14,drawdown".
+
+        Args:
+            spec (str): Comma-separated indicator names, each optionally followed by ":window".
+
+        Returns:
+            List of (name, window) pairs, with default windows filled in.
+
+        Raises:
+            ValueError: If a name is unknown or a window is not a positive integer
+                (or is below the indicator's minimum).
+        """
+        specs = []
+        for item in spec.split(','):
+            item = item.strip().lower()
+            if not item:
+                continue
+            name, _, window = item.partition(':')
+            if name not in INDICATORS:
+                raise ValueError(f"Unknown indicator {name}. Choose from {', '.join(INDICATORS)}")
+
+            default_window = INDICATORS[name][1]
+            if default_window is None:
+                if window:
+                    raise ValueError(f"Indicator {name} does not take a window")
+                specs.append((name, None))
+                continue
+
+            if window and (not window.isdigit() or int(window) <= 0):
+                raise ValueError(f"Window for {name} must be a positive integer")
+            if window and int(window) < MIN_WINDOWS.get(name, 1):
+                raise ValueError(f"Window for {name} must be at least {MIN_WINDOWS[name]}")
+            specs.append((name, int(window) if window else default_window))
+
+        if not specs:
+            raise ValueError("At least one indicator is required")
+        return specs
+
+    def get_indicators(self, symbol: str, specs: List[Tuple[str, Optional[int]]],
+                       limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Compute indicators over a symbol's daily closes.
+
+        Args:
+            symbol (str): The stock symbol.
+            specs (List[Tuple[str, Optional[int]]]): (name, window) pairs from parse_specs.
+            limit (int, optional): Return only the most recent N points.
+
+        Returns:
+            Dict with the dates and one series per indicator, oldest first. Points
+            without enough history are null.
+        """
+        series = self.stock_model.get_history_series(symbol)
+        key_prefix = (symbol.upper(), series.last_date)
+
+        start = 0 if limit is None else max(0, len(series) - limit)
+        result = {}
+        for name, window in specs:
+            label = name if window is None else f"{name}_{window}"
+            values, _ = self.cache.get(key_prefix + (name, window))
+            if values is None:
+                function = INDICATORS[name][0]
+                values = function(series.close) if window is None else function(series.close, window)
+                self.cache.set(key_prefix + (name, window), values)
+            result[label] = [None if math.isnan(value) else value for value in values[start:].tolist()]
+
+        return {
+            "symbol": symbol.upper(),
+            "last_date": series.last_date,
+            "dates": np.datetime_as_string(series.dates[start:]).tolist(),
+            "indicators": result
+        }
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get the indicator memo hit/miss/eviction counters."""
+        return self.cache.stats()
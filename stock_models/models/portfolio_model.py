@@ -1,18 +1,90 @@
+import os
 import sqlite3
-from typing import Dict, List, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional
 from datetime import datetime
+from .price_model import PriceModel
 from .stock_model import StockModel
+from music_collection.utils import profiling
+from music_collection.utils.quota import TRADE, VALUATION
 from music_collection.utils.sql_utils import get_db_connection
 
 
+UPSERT_POSITION = """
+    INSERT INTO positions (symbol, total_shares, total_cost) VALUES (?, ?, ?)
+    ON CONFLICT(symbol) DO UPDATE SET
+        total_shares = total_shares + excluded.total_shares,
+        total_cost = total_cost + excluded.total_cost
+"""
+
+# A symbol's lots in FIFO order, walked on idx_portfolio_symbol_purchase_date
+# only as far as a sale needs
+SELECT_LOTS_TO_CONSUME = """
+    SELECT id, shares, purchase_price
+    FROM portfolio
+    WHERE symbol = ?
+    ORDER BY purchase_date, id
+"""
+
+# Lots read per round trip while covering a sale
+CONSUME_BATCH_SIZE = 64
+# Lot ids per DELETE statement, well under SQLite's bound parameter limit
+DELETE_BATCH_SIZE = 500
+
+# Lots in (symbol, purchase date) order, served by idx_portfolio_symbol_purchase_date
+SELECT_LOTS = """
+    SELECT id, symbol, shares, purchase_price, purchase_date
+    FROM portfolio
+    {where}
+    ORDER BY symbol, purchase_date, id
+"""
+
+REBUILD_POSITIONS = """
+    INSERT INTO positions (symbol, total_shares, total_cost)
+    SELECT symbol, SUM(shares), SUM(shares * purchase_price)
+    FROM portfolio
+    GROUP BY symbol
+    HAVING SUM(shares) > 0
+"""
+
 class PortfolioModel:
-    def __init__(self):
-        self.db_path = "stocks.db"
-        self.stock_model = StockModel()
+    def __init__(self, stock_model: Optional[StockModel] = None):
+        # Share the app's StockModel so trades and browsing draw on one upstream quota
+        self.stock_model = stock_model or StockModel()
+
+        # Prices written by the background refresher, served while younger than PRICE_MAX_AGE
+        self.prices = PriceModel(max_age=float(os.getenv('PRICE_MAX_AGE', 300)))
+
+        # Bounded pool for per-holding quote lookups, with a deadline per request
+        self.quote_timeout = float(os.getenv('PORTFOLIO_QUOTE_TIMEOUT', 10))
+        self.quote_workers = int(os.getenv('PORTFOLIO_QUOTE_WORKERS', 8))
+        self._quote_executor = ThreadPoolExecutor(
+            max_workers=self.quote_workers,
+            thread_name_prefix='portfolio-quote'
+        )
+
+        # Told whenever this process changes the lots
+        self._change_listeners: List[Callable[[], None]] = []
+
+    def add_change_listener(self, listener: Callable[[], None]) -> None:
+        """Call `listener` (with no arguments) after every change to the lots."""
+        self._change_listeners.append(listener)
+
+    def _notify_change(self) -> None:
+        for listener in self._change_listeners:
+            listener()
+
+    def reset_after_fork(self) -> None:
+        """Re-create the quote pool and the stock model's shared state in a forked worker."""
+        self.stock_model.reset_after_fork()
+        self._quote_executor = ThreadPoolExecutor(
+            max_workers=self.quote_workers,
+            thread_name_prefix='portfolio-quote'
+        )
 
     def buy_stock(self, symbol: str, shares: int) -> Dict:
         """Buy shares of a stock and add to portfolio."""
-
         
         # Validate inputs
         if not symbol or not isinstance(symbol, str):
@@ -21,17 +93,18 @@ class PortfolioModel:
             raise ValueError("Shares must be a positive integer")
             
         # Get current stock price
-        stock_info = self.stock_model.get_stock_info(symbol)
+        stock_info = self.stock_model.get_stock_info(symbol, TRADE)
         current_price = stock_info["price"]
 
         try:
-        # Use the context manager to handle the database connection
-            with sqlite3.connect('/app/db/stocks.db') as conn:
+            # Record the lot and update the position in the same transaction
+            with get_db_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
-                "INSERT INTO portfolio (symbol, shares, purchase_price, purchase_date) VALUES (?, ?, ?, ?)",
-                (symbol, shares, current_price, datetime.now())
+                    "INSERT INTO portfolio (symbol, shares, purchase_price, purchase_date) VALUES (?, ?, ?, ?)",
+                    (symbol, shares, current_price, datetime.now())
                 )
+                cursor.execute(UPSERT_POSITION, (symbol, shares, current_price * shares))
                 conn.commit()
         except sqlite3.Error as e:
             print(f"Database error: {str(e)}")
@@ -40,211 +113,489 @@ class PortfolioModel:
             print(f"Error buying stock: {str(e)}")
             raise ValueError(f"Failed to buy {shares} shares of {symbol}")
 
-
-
-            
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "INSERT INTO portfolio (symbol, shares, purchase_price, purchase_date) VALUES (?, ?, ?, ?)",
-                    (symbol, shares, current_price, datetime.now())
-                )
-                conn.commit()
-                
-            return {
-                "symbol": symbol,
-                "shares": shares,
-                "price_per_share": current_price,
-                "total_cost": current_price * shares
-            }
-        
+        self._notify_change()
+        return {
+            "symbol": symbol,
+            "shares": shares,
+            "price_per_share": current_price,
+            "total_cost": current_price * shares
+        }
 
     def sell_stock(self, symbol: str, shares: int) -> Dict:
-        """Sell shares of a stock from portfolio."""
+        """Sell shares of a stock from portfolio, consuming the oldest lots first."""
         if not symbol or not isinstance(symbol, str):
             raise ValueError("Invalid symbol provided")
         if not isinstance(shares, int) or shares <= 0:
             raise ValueError("Shares must be a positive integer")
-        # Check if we have enough shares
-        total_shares = self._get_total_shares(symbol)
-        if total_shares < shares:
-            raise ValueError(f"Not enough shares to sell. You own {total_shares} shares of {symbol}")
         
-        # Get current stock price
-        stock_info = self.stock_model.get_stock_info(symbol)
+        # Reject an oversell before it spends upstream quota; the check is
+        # repeated under the write lock, where it is authoritative
+        held = self._held_shares([symbol]).get(symbol, 0)
+        if held < shares:
+            raise ValueError(f"Not enough shares to sell. You own {held} shares of {symbol}")
+
+        # Get current stock price before taking the write lock
+        stock_info = self.stock_model.get_stock_info(symbol, TRADE)
         current_price = stock_info["price"]
         
-        # Remove shares from portfolio
-        shares_to_remove = shares
         try:
             with get_db_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Get portfolio entries ordered by purchase date (FIFO)
-                cursor.execute(
-                    "SELECT id, shares FROM portfolio WHERE symbol = ? ORDER BY purchase_date",
-                    (symbol,)
-                )
-                entries = cursor.fetchall()
-                
-                for entry_id, entry_shares in entries:
-                    if shares_to_remove <= 0:
-                        break
-                        
-                    if entry_shares <= shares_to_remove:
-                        # Remove entire entry
-                        cursor.execute("DELETE FROM portfolio WHERE id = ?", (entry_id,))
-                        shares_to_remove -= entry_shares
-                    else:
-                        # Update entry with remaining shares
-                        cursor.execute(
-                            "UPDATE portfolio SET shares = ? WHERE id = ?",
-                            (entry_shares - shares_to_remove, entry_id)
-                        )
-                        shares_to_remove = 0
-                        
-                conn.commit()
+                # Take the write lock up front so the share check and the lot
+                # consumption see the same state as concurrent sells
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._consume_lots(conn.cursor(), symbol, shares)
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
         except sqlite3.Error as e:
-            raise sqlite3.Error(f"Database error: {str(e)}")
+            print(f"Database error: {str(e)}")
+            raise ValueError("Failed to record sale in database")
 
-            
-            with sqlite3.connect(self.db_path) as conn:
+        self._notify_change()
+        return {
+            "symbol": symbol,
+            "shares_sold": shares,
+            "price_per_share": current_price,
+            "total_value": current_price * shares
+        }
+
+    def execute_orders(self, orders: List[Dict]) -> List[Dict]:
+        """
+        Execute a batch of buy/sell orders in a single transaction.
+
+        Each distinct symbol is quoted once, concurrently. Orders are applied in
+        the order given, so a sell may consume shares bought earlier in the same
+        batch. An order that is invalid, has no quote or would oversell is
+        rejected without affecting the others.
+
+        Args:
+            orders (List[Dict]): Orders with "side" ("buy" or "sell"), "symbol" and "shares".
+
+        Returns:
+            List[Dict]: One result per order, in the same order, with "status"
+            "filled" or "rejected".
+        """
+        results: List[Optional[Dict]] = [None] * len(orders)
+        valid = []
+        for index, order in enumerate(orders):
+            side = order.get('side') if isinstance(order, dict) else None
+            symbol = order.get('symbol') if isinstance(order, dict) else None
+            shares = order.get('shares') if isinstance(order, dict) else None
+            if side not in ('buy', 'sell'):
+                error = "Side must be 'buy' or 'sell'"
+            elif not symbol or not isinstance(symbol, str):
+                error = "Invalid symbol provided"
+            elif not isinstance(shares, int) or isinstance(shares, bool) or shares <= 0:
+                error = "Shares must be a positive integer"
+            else:
+                valid.append((index, side, symbol, shares))
+                continue
+            results[index] = {"index": index, "status": "rejected", "error": error}
+
+        # Reject sells the holdings (plus earlier buys in the batch) cannot cover
+        # before quoting, so they spend no trade quota. _consume_lots repeats the
+        # check under the write lock, where it is authoritative.
+        held = self._held_shares(sorted({symbol for _, side, symbol, _ in valid if side == 'sell'}))
+        covered = []
+        for index, side, symbol, shares in valid:
+            if side == 'sell':
+                if held.get(symbol, 0) < shares:
+                    results[index] = {"index": index, "status": "rejected",
+                                      "error": f"Not enough shares to sell. You own {held.get(symbol, 0)} "
+                                               f"shares of {symbol}"}
+                    continue
+                held[symbol] -= shares
+            else:
+                held[symbol] = held.get(symbol, 0) + shares
+            covered.append((index, side, symbol, shares))
+        valid = covered
+
+        quotes = self._fetch_quotes(sorted({symbol for _, _, symbol, _ in valid}), TRADE)
+        pending_buys = []
+
+        def flush_buys(cursor):
+            cursor.executemany(
+                "INSERT INTO portfolio (symbol, shares, purchase_price, purchase_date) VALUES (?, ?, ?, ?)",
+                [(symbol, shares, price, now) for symbol, shares, price, now in pending_buys]
+            )
+            cursor.executemany(UPSERT_POSITION,
+                               [(symbol, shares, price * shares) for symbol, shares, price, _ in pending_buys])
+            pending_buys.clear()
+
+        try:
+            with get_db_connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    cursor = conn.cursor()
+                    for index, side, symbol, shares in valid:
+                        quote = quotes[symbol]
+                        if isinstance(quote, Exception):
+                            results[index] = {"index": index, "status": "rejected", "error": str(quote)}
+                            continue
+
+                        price = quote["price"]
+                        if side == 'buy':
+                            pending_buys.append((symbol, shares, price, datetime.now()))
+                        else:
+                            # Lots bought earlier in the batch must exist before they can be sold
+                            if any(buy[0] == symbol for buy in pending_buys):
+                                flush_buys(cursor)
+                            try:
+                                self._consume_lots(cursor, symbol, shares)
+                            except ValueError as e:
+                                results[index] = {"index": index, "status": "rejected", "error": str(e)}
+                                continue
+
+                        results[index] = {
+                            "index": index,
+                            "status": "filled",
+                            "side": side,
+                            "symbol": symbol,
+                            "shares": shares,
+                            "price_per_share": price,
+                            "total": price * shares
+                        }
+
+                    flush_buys(cursor)
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+        except sqlite3.Error as e:
+            print(f"Database error: {str(e)}")
+            raise ValueError("Failed to record orders in database")
+
+        if any(result["status"] == "filled" for result in results):
+            self._notify_change()
+        return results
+
+    def _held_shares(self, symbols: List[str]) -> Dict[str, int]:
+        """Get the number of shares currently held of each symbol, in one query; unheld ones are left out."""
+        if not symbols:
+            return {}
+        try:
+            with get_db_connection() as conn:
                 cursor = conn.cursor()
-                
-                # Get portfolio entries ordered by purchase date (FIFO)
                 cursor.execute(
-                    "SELECT id, shares FROM portfolio WHERE symbol = ? ORDER BY purchase_date",
-                    (symbol,)
+                    f"SELECT symbol, total_shares FROM positions WHERE symbol IN ({','.join('?' * len(symbols))})",
+                    list(symbols)
                 )
-                entries = cursor.fetchall()
-                
-                if not entries:
-                    raise ValueError(f"No portfolio entries found for {symbol}")
-                
-                shares_to_remove = shares
-                for entry_id, entry_shares in entries:
-                    if shares_to_remove <= 0:
-                        break
-                        
-                    if entry_shares <= shares_to_remove:
-                        cursor.execute("DELETE FROM portfolio WHERE id = ?", (entry_id,))
-                        shares_to_remove -= entry_shares
-                    else:
-                        cursor.execute(
-                            "UPDATE portfolio SET shares = ? WHERE id = ?",
-                            (entry_shares - shares_to_remove, entry_id)
-                        )
-                        shares_to_remove = 0
-                        
-                conn.commit()
-                
-            return {
-                "symbol": symbol,
-                "shares_sold": shares,
-                "price_per_share": current_price,
-                "total_value": current_price * shares
-            }
+                return dict(cursor.fetchall())
         except sqlite3.Error as e:
             print(f"Database error: {str(e)}")
-            raise ValueError("Failed to record sale in database")
-        except Exception as e:
-            print(f"Error selling stock: {str(e)}")
-            raise ValueError(f"Failed to sell {shares} shares of {symbol}")
+            raise ValueError("Failed to check holdings in database")
+
+    def _consume_lots(self, cursor: sqlite3.Cursor, symbol: str, shares: int) -> float:
+        """
+        Remove shares from a symbol's lots in FIFO order and update its position.
+
+        Must be called inside a write transaction. Reads only the lots needed to
+        cover the sale, deletes the fully consumed ones in one batch and updates
+        the partially consumed one, if any.
+
+        Args:
+            cursor (sqlite3.Cursor): Cursor on the connection holding the transaction.
+            symbol (str): The stock symbol.
+            shares (int): Number of shares to remove.
+
+        Returns:
+            float: The cost basis of the removed shares.
+
+        Raises:
+            ValueError: If fewer than `shares` shares are held.
+        """
+        cursor.execute("SELECT total_shares FROM positions WHERE symbol = ?", (symbol,))
+        row = cursor.fetchone()
+        total_shares = row[0] if row else 0
+        if total_shares < shares:
+            raise ValueError(f"Not enough shares to sell. You own {total_shares} shares of {symbol}")
+
+        # Walk the lots oldest first and stop at the one that covers the sale
+        consumed_ids = []
+        cost_removed = 0.0
+        partial = None
+        needed = shares
+        reader = cursor.connection.cursor()
+        try:
+            reader.execute(SELECT_LOTS_TO_CONSUME, (symbol,))
+            while needed > 0:
+                rows = reader.fetchmany(CONSUME_BATCH_SIZE)
+                if not rows:
+                    break
+                for lot_id, lot_shares, purchase_price in rows:
+                    if lot_shares <= needed:
+                        consumed_ids.append(lot_id)
+                        cost_removed += lot_shares * purchase_price
+                        needed -= lot_shares
+                    else:
+                        partial = (lot_shares - needed, lot_id)
+                        cost_removed += needed * purchase_price
+                        needed = 0
+                    if needed == 0:
+                        break
+        finally:
+            reader.close()
+
+        for start in range(0, len(consumed_ids), DELETE_BATCH_SIZE):
+            batch = consumed_ids[start:start + DELETE_BATCH_SIZE]
+            cursor.execute(f"DELETE FROM portfolio WHERE id IN ({','.join('?' * len(batch))})", batch)
+        if partial is not None:
+            cursor.execute("UPDATE portfolio SET shares = ? WHERE id = ?", partial)
+
+        # Take the consumed lots' cost basis off the position
+        cursor.execute(
+            "UPDATE positions SET total_shares = total_shares - ?, total_cost = total_cost - ? WHERE symbol = ?",
+            (shares, cost_removed, symbol)
+        )
+        cursor.execute("DELETE FROM positions WHERE symbol = ? AND total_shares <= 0", (symbol,))
+        return cost_removed
 
     def get_portfolio(self) -> List[Dict]:
-        """Get current portfolio with latest stock prices."""
+        """Get current portfolio with latest stock prices.
+
+        Holdings come from the positions table; avg_purchase_price is the remaining
+        cost basis per share. Prices come from the stocks table when they are within
+        the staleness bound; only the remaining symbols are quoted upstream,
+        concurrently, and their prices are written back. Holdings whose quote failed
+        or missed the deadline are returned with "partial": True and no price fields.
+        """
         portfolio = []
         try:
             with get_db_connection() as conn:
                 cursor = conn.cursor()
                 
-                # Get unique symbols and total shares
+                # Positions are maintained on every buy/sell, so this is one small scan
                 cursor.execute("""
-                    SELECT symbol, SUM(shares) as total_shares
-                    FROM portfolio
-                    GROUP BY symbol
-                    HAVING total_shares > 0
+                    SELECT p.symbol, p.total_shares, p.total_cost, s.last_price, s.last_updated
+                    FROM positions p
+                    LEFT JOIN stocks s ON s.symbol = p.symbol
+                    WHERE p.total_shares > 0
+                    ORDER BY p.symbol
                 """)
                 
-                holdings = cursor.fetchall()
-                
-                for symbol, shares in holdings:
-                    # Get current stock price
-                    stock_info = self.stock_model.get_stock_info(symbol)
-                    current_price = stock_info["price"]
-                    
-                    # Calculate average purchase price
-                    cursor.execute("""
-                        SELECT AVG(purchase_price)
-                        FROM portfolio
-                        WHERE symbol = ?
-                    """, (symbol,))
-                    avg_purchase_price = cursor.fetchone()[0]
-                    
-                    portfolio.append({
-                        "symbol": symbol,
-                        "shares": shares,
-                        "current_price": current_price,
-                        "current_value": current_price * shares,
-                        "avg_purchase_price": avg_purchase_price,
-                        "total_gain_loss": (current_price - avg_purchase_price) * shares
-                    })
+                holdings = []
+                avg_purchase_prices = {}
+                prices = {}
+                fresh_after = time.time() - self.prices.max_age
+                for symbol, shares, total_cost, last_price, last_updated in cursor.fetchall():
+                    holdings.append((symbol, shares))
+                    avg_purchase_prices[symbol] = total_cost / shares
+                    if last_updated is not None and last_updated >= fresh_after:
+                        prices[symbol] = (last_price, last_updated)
         except sqlite3.Error as e:
             raise sqlite3.Error(f"Database error: {str(e)}")
+
+        # Only symbols without a fresh stored price go upstream
+        quotes = self._fetch_quotes([symbol for symbol, _ in holdings if symbol not in prices], VALUATION)
+        fetched_at = time.time()
+        fetched = {symbol: quote["price"] for symbol, quote in quotes.items() if not isinstance(quote, Exception)}
+        try:
+            self.prices.save_prices(fetched, fetched_at)
+        except sqlite3.Error as e:
+            print(f"Database error: {str(e)}")
+        prices.update((symbol, (price, fetched_at)) for symbol, price in fetched.items())
+
+        for symbol, shares in holdings:
+            avg_purchase_price = avg_purchase_prices[symbol]
+
+            if symbol not in prices:
+                quote = quotes[symbol]
+                portfolio.append({
+                    "symbol": symbol,
+                    "shares": shares,
+                    "current_price": None,
+                    "current_value": None,
+                    "avg_purchase_price": avg_purchase_price,
+                    "total_gain_loss": None,
+                    "partial": True,
+                    "error": str(quote)
+                })
+                continue
+
+            current_price, price_updated_at = prices[symbol]
+            portfolio.append({
+                "symbol": symbol,
+                "shares": shares,
+                "current_price": current_price,
+                "current_value": current_price * shares,
+                "avg_purchase_price": avg_purchase_price,
+                "total_gain_loss": (current_price - avg_purchase_price) * shares,
+                "price_updated_at": price_updated_at,
+                "partial": False
+            })
                 
         return portfolio
 
+    def iter_lots(self, symbol: Optional[str] = None, batch_size: int = 500) -> Iterator[Dict]:
+        """
+        Yield the individual purchase lots, a batch of rows at a time.
+
+        Rows are fetched `batch_size` at a time from one cursor, so a listing
+        of any size is never held in memory at once.
+
+        Args:
+            symbol (str, optional): Only list lots of this symbol, matched exactly
+                as it was given when buying, like sell_stock does.
+            batch_size (int): Rows fetched per round trip.
+
+        Yields:
+            Dict with the lot's id, symbol, shares, purchase_price and purchase_date.
+        """
+        if symbol is None:
+            query, params = SELECT_LOTS.format(where=""), ()
+        else:
+            query, params = SELECT_LOTS.format(where="WHERE symbol = ?"), (symbol,)
+
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for lot_id, lot_symbol, shares, purchase_price, purchase_date in rows:
+                        yield {
+                            "id": lot_id,
+                            "symbol": lot_symbol,
+                            "shares": shares,
+                            "purchase_price": purchase_price,
+                            "purchase_date": purchase_date
+                        }
+        except sqlite3.Error as e:
+            raise sqlite3.Error(f"Database error: {str(e)}")
+
+    def get_data_version(self) -> Optional[str]:
+        """
+        Identify the data behind get_portfolio without computing it.
+
+        Combines the portfolio lots version, which triggers bump on every change
+        in any process, with the newest stored price of the held symbols.
+
+        Returns:
+            str: The version, or None if a held symbol has no fresh stored price,
+            in which case get_portfolio would go upstream and the version cannot
+            describe its result.
+        """
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT
+                    (SELECT version FROM data_versions WHERE name = 'portfolio'),
+                    COUNT(*),
+                    MIN(COALESCE(s.last_updated, 0)),
+                    MAX(s.last_updated)
+                FROM positions p
+                LEFT JOIN stocks s ON s.symbol = p.symbol
+                WHERE p.total_shares > 0
+            """)
+            version, holdings, oldest_price, newest_price = cursor.fetchone()
+
+        if holdings and oldest_price < time.time() - self.prices.max_age:
+            return None
+        return f"{version}:{newest_price}"
+
     def get_portfolio_value(self) -> Dict:
-        """Calculate total portfolio value and gains/losses."""
+        """Calculate total portfolio value and gains/losses.
+
+        Holdings without a current quote are left out of the totals and listed
+        under "missing_symbols", with "partial" set to True.
+        """
         try:
-            portfolio = self.get_portfolio()
-            
-            if not portfolio:
-                return {
-                    "total_value": 0.0,
-                    "total_cost": 0.0,
-                    "total_gain_loss": 0.0,
-                    "total_gain_loss_percent": 0.0
-                }
-            
-            total_value = sum(holding["current_value"] for holding in portfolio)
-            total_cost = sum(holding["avg_purchase_price"] * holding["shares"] for holding in portfolio)
-            total_gain_loss = sum(holding["total_gain_loss"] for holding in portfolio)
-            
-            return {
-                "total_value": total_value,
-                "total_cost": total_cost,
-                "total_gain_loss": total_gain_loss,
-                "total_gain_loss_percent": (total_gain_loss / total_cost * 100) if total_cost > 0 else 0
-            }
+            return self.summarize(self.get_portfolio())
         except ZeroDivisionError:
             return {
                 "total_value": 0.0,
                 "total_cost": 0.0,
                 "total_gain_loss": 0.0,
-                "total_gain_loss_percent": 0.0
+                "total_gain_loss_percent": 0.0,
+                "partial": False,
+                "missing_symbols": []
             }
         except Exception as e:
             print(f"Error calculating portfolio value: {str(e)}")
             raise ValueError("Failed to calculate portfolio value")
 
-    def _get_total_shares(self, symbol: str) -> int:
-        """Get total shares owned of a particular stock."""
-        try:
-            with get_db_connection() as conn:
+    def summarize(self, portfolio: List[Dict]) -> Dict:
+        """Compute the totals reported by get_portfolio_value from get_portfolio's holdings."""
+        if not portfolio:
+            return {
+                "total_value": 0.0,
+                "total_cost": 0.0,
+                "total_gain_loss": 0.0,
+                "total_gain_loss_percent": 0.0,
+                "partial": False,
+                "missing_symbols": []
+            }
+
+        priced = [holding for holding in portfolio if not holding["partial"]]
+        missing_symbols = [holding["symbol"] for holding in portfolio if holding["partial"]]
+
+        total_value = sum(holding["current_value"] for holding in priced)
+        total_cost = sum(holding["avg_purchase_price"] * holding["shares"] for holding in priced)
+        total_gain_loss = sum(holding["total_gain_loss"] for holding in priced)
+
+        return {
+            "total_value": total_value,
+            "total_cost": total_cost,
+            "total_gain_loss": total_gain_loss,
+            "total_gain_loss_percent": (total_gain_loss / total_cost * 100) if total_cost > 0 else 0,
+            "partial": bool(missing_symbols),
+            "missing_symbols": missing_symbols
+        }
+
+    def _fetch_quotes(self, symbols: List[str], priority: int = VALUATION) -> Dict[str, Any]:
+        """
+        Look up quotes for several symbols concurrently.
+
+        Args:
+            symbols (List[str]): The symbols to look up.
+            priority (int): Upstream quota priority for cache misses.
+
+        Returns:
+            Dict mapping each symbol to its quote, or to the exception raised for it
+            (a TimeoutError if it did not finish before the deadline).
+        """
+        if not symbols:
+            return {}
 
+        futures = {profiling.submit(self._quote_executor, self.stock_model.get_stock_info, symbol, priority): symbol
+                   for symbol in symbols}
+        with profiling.phase("upstream"):
+            done, not_done = wait(futures, timeout=self.quote_timeout)
 
+        quotes = {}
+        for future in done:
+            symbol = futures[future]
+            try:
+                quotes[symbol] = future.result()
+            except Exception as e:
+                print(f"Error fetching quote for {symbol}: {str(e)}")
+                quotes[symbol] = e
+        for future in not_done:
+            future.cancel()
+            quotes[futures[future]] = TimeoutError(
+                f"Quote for {futures[future]} not available within {self.quote_timeout}s")
+        return quotes
+
+    def rebuild_positions(self) -> int:
+        """
+        Recompute the positions table from the portfolio lots.
+
+        Returns:
+            int: The number of positions written.
+        """
+        try:
+            with get_db_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT SUM(shares) FROM portfolio WHERE symbol = ?",
-                    (symbol,)
-                )
-                result = cursor.fetchone()[0]
+                cursor.execute("DELETE FROM positions")
+                cursor.execute(REBUILD_POSITIONS)
+                count = cursor.rowcount
+                conn.commit()
         except sqlite3.Error as e:
             print(f"Database error: {str(e)}")
-            raise ValueError(f"Failed to get total shares for {symbol}")
-        except Exception as e:
-            print(f"Error getting total shares: {str(e)}")
-            raise ValueError(f"Failed to get total shares for {symbol}")
-        return result or 0
-
+            raise ValueError("Failed to rebuild positions")
+        self._notify_change()
+        return count
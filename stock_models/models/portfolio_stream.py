@@ -0,0 +1,153 @@
+import logging
+import queue
+import threading
+from typing import Any, Dict, Optional, Set, Tuple
+from .portfolio_model import PortfolioModel
+from music_collection.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+def take_snapshot(portfolio_model: PortfolioModel) -> Dict[str, Any]:
+    """Compute holdings (keyed by symbol) and totals with a single get_portfolio call."""
+    portfolio = portfolio_model.get_portfolio()
+    return {
+        "holdings": {holding["symbol"]: holding for holding in portfolio},
+        "totals": portfolio_model.summarize(portfolio)
+    }
+
+
+def diff_snapshots(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Describe how a snapshot changed.
+
+    Returns:
+        Dict with "holdings" mapping each changed symbol to its changed fields (or
+        None if it is no longer held) and "totals" holding the changed totals.
+        Unchanged parts are left out, so an empty dict means nothing changed.
+    """
+    delta = {}
+
+    holdings = {}
+    for symbol, holding in new["holdings"].items():
+        previous = old["holdings"].get(symbol, {})
+        changed = {field: value for field, value in holding.items() if previous.get(field) != value}
+        if changed:
+            holdings[symbol] = changed
+    for symbol in old["holdings"].keys() - new["holdings"].keys():
+        holdings[symbol] = None
+    if holdings:
+        delta["holdings"] = holdings
+
+    totals = {field: value for field, value in new["totals"].items() if old["totals"].get(field) != value}
+    if totals:
+        delta["totals"] = totals
+    return delta
+
+
+class PortfolioStream:
+    """
+    Fans one portfolio computation out to every stream subscriber.
+
+    A single hub thread recomputes the portfolio every `interval` seconds, or
+    straight away when the lots change or someone subscribes. New subscribers
+    get the full snapshot; everyone else gets only what changed, and nothing
+    when nothing did. Each subscriber has a bounded queue: one that falls
+    behind has its backlog replaced by a fresh snapshot instead of holding up
+    the others. The thread only runs while there are subscribers.
+    """
+
+    def __init__(self, portfolio_model: PortfolioModel, interval: float = 2.0, queue_size: int = 16):
+        self.portfolio_model = portfolio_model
+        self.interval = interval
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._subscribers: Set[queue.Queue] = set()
+        self._pending: Set[queue.Queue] = set()
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._thread: Optional[threading.Thread] = None
+
+        portfolio_model.add_change_listener(self._on_change)
+
+    def subscribe(self) -> queue.Queue:
+        """
+        Register a subscriber.
+
+        Returns:
+            queue.Queue of (event, data) tuples, where event is "snapshot" or "delta".
+        """
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            self._pending.add(subscriber)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='portfolio-stream', daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue) -> None:
+        """Remove a subscriber; the hub stops once none are left."""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            self._pending.discard(subscriber)
+        self._wake.set()
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def reset_after_fork(self) -> None:
+        """Forget the parent's subscribers and hub thread in a forked worker."""
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._subscribers = set()
+        self._pending = set()
+        self._snapshot = None
+        self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    self._snapshot = None
+                    return
+            self._wake.clear()
+
+            try:
+                snapshot = take_snapshot(self.portfolio_model)
+            except Exception as e:
+                logger.error("Portfolio stream update failed: %s", e)
+                snapshot = None
+
+            if snapshot is not None:
+                delta = diff_snapshots(self._snapshot, snapshot) if self._snapshot is not None else None
+                self._snapshot = snapshot
+                with self._lock:
+                    for subscriber in self._subscribers:
+                        if subscriber in self._pending or delta is None:
+                            self._send(subscriber, ("snapshot", snapshot))
+                        elif delta:
+                            self._send(subscriber, ("delta", delta))
+                    self._pending.clear()
+
+            self._wake.wait(self.interval)
+
+    def _on_change(self) -> None:
+        self._wake.set()
+
+    def _send(self, subscriber: queue.Queue, message: Tuple[str, Dict[str, Any]]) -> None:
+        try:
+            subscriber.put_nowait(message)
+        except queue.Full:
+            # A slow reader skips the backlog and resynchronizes from the latest state
+            try:
+                while True:
+                    subscriber.get_nowait()
+            except queue.Empty:
+                pass
+            subscriber.put_nowait(("snapshot", self._snapshot))
@@ -0,0 +1,45 @@
+import time
+from typing import Dict, List, Optional
+from music_collection.utils.sql_utils import get_db_connection
+
+
+UPSERT_PRICE = """
+    INSERT INTO stocks (symbol, last_price, last_updated) VALUES (?, ?, ?)
+    ON CONFLICT(symbol) DO UPDATE SET
+        last_price = excluded.last_price,
+        last_updated = excluded.last_updated
+"""
+
+
+class PriceModel:
+    """Latest known price per symbol, kept in the stocks table."""
+
+    def __init__(self, max_age: float = 300):
+        # Stored prices older than this are not served on the request path
+        self.max_age = max_age
+
+    def save_prices(self, prices: Dict[str, float], updated_at: Optional[float] = None) -> None:
+        """Store the latest price for each symbol."""
+        if not prices:
+            return
+        updated_at = time.time() if updated_at is None else updated_at
+        with get_db_connection() as conn:
+            conn.executemany(UPSERT_PRICE, [(symbol, price, updated_at) for symbol, price in prices.items()])
+            conn.commit()
+
+    def get_symbols_to_refresh(self, older_than: float, limit: int) -> List[str]:
+        """
+        Get held symbols whose price was last updated before `older_than`
+        (Unix time), those without a price or with the oldest price first.
+        """
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT p.symbol
+                FROM positions p
+                LEFT JOIN stocks s ON s.symbol = p.symbol
+                WHERE p.total_shares > 0 AND COALESCE(s.last_updated, 0) < ?
+                ORDER BY COALESCE(s.last_updated, 0), p.symbol
+                LIMIT ?
+            """, (older_than, limit))
+            return [row[0] for row in cursor.fetchall()]
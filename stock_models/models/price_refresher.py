@@ -0,0 +1,101 @@
+import fcntl
+import logging
+import os
+import threading
+import time
+from typing import Optional
+from .price_model import PriceModel
+from .stock_model import StockModel
+from music_collection.utils.logger import configure_logger
+from music_collection.utils.quota import BACKGROUND, QuotaExhaustedError
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+class PriceRefresher:
+    """
+    Background thread that keeps stored prices of held symbols fresh.
+
+    Every `interval` seconds it refreshes up to `batch_size` of the stalest held
+    symbols whose price would go stale (older than the price model's max_age)
+    before the next run. Calls go through the upstream quota scheduler at
+    background priority, which may only spend the first half of each bucket,
+    and the batch stops early when quota runs out. Only the process holding an exclusive lock on `lock_path`
+    does any work, so several server workers can all start a refresher and a
+    single one refreshes; another takes over if it exits.
+    """
+
+    def __init__(self, stock_model: StockModel, price_model: PriceModel, lock_path: str,
+                 interval: float = 60, batch_size: int = 5):
+        self.stock_model = stock_model
+        self.price_model = price_model
+        self.lock_path = lock_path
+        self.interval = interval
+        self.batch_size = batch_size
+        self._lock_file = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the refresher thread if it is not running."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='price-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the thread and give up the lock."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def refresh_once(self) -> int:
+        """
+        Refresh one batch of the stalest held symbols.
+
+        Returns:
+            int: The number of prices written.
+        """
+        # Prices still fresh at the next run are left alone
+        cutoff = time.time() - max(0.0, self.price_model.max_age - self.interval)
+        symbols = self.price_model.get_symbols_to_refresh(cutoff, self.batch_size)
+        prices = {}
+        for index, symbol in enumerate(symbols):
+            try:
+                prices[symbol] = self.stock_model.refresh_quote(symbol, BACKGROUND)["price"]
+            except QuotaExhaustedError:
+                logger.info("Upstream quota exhausted, deferring %d price refreshes", len(symbols) - index)
+                break
+            except ValueError as e:
+                logger.warning("Price refresh failed for %s: %s", symbol, e)
+        self.price_model.save_prices(prices)
+        return len(prices)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if self._acquire_lock():
+                try:
+                    self.refresh_once()
+                except Exception as e:
+                    logger.error("Price refresh failed: %s", e)
+            self._stop.wait(self.interval)
+
+    def _acquire_lock(self) -> bool:
+        """Take the refresher lock without blocking; once held it is kept."""
+        if self._lock_file is not None:
+            return True
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info("Price refresher running in process %d", os.getpid())
+        return True
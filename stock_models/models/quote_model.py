@@ -0,0 +1,36 @@
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from music_collection.utils.sql_utils import get_db_connection
+
+
+class QuoteModel:
+    """Persistent quote cache in the quotes table, keyed by symbol."""
+
+    def get_quote(self, symbol: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Get the stored quote for a symbol and when it was fetched (Unix time), or None."""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT payload, fetched_at FROM quotes WHERE symbol = ?", (symbol,))
+            row = cursor.fetchone()
+        return None if row is None else (json.loads(row[0]), row[1])
+
+    def save_quote(self, symbol: str, quote: Dict[str, Any], fetched_at: Optional[float] = None) -> None:
+        """Store the latest quote for a symbol."""
+        with get_db_connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO quotes (symbol, payload, fetched_at) VALUES (?, ?, ?)",
+                (symbol, json.dumps(quote), time.time() if fetched_at is None else fetched_at)
+            )
+            conn.commit()
+
+    def get_recent_quotes(self, max_age: float, limit: int) -> List[Tuple[str, Dict[str, Any], float]]:
+        """Get up to `limit` quotes fetched within the last `max_age` seconds, newest first."""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT symbol, payload, fetched_at FROM quotes WHERE fetched_at >= ? "
+                "ORDER BY fetched_at DESC LIMIT ?",
+                (time.time() - max_age, limit)
+            )
+            return [(symbol, json.loads(payload), fetched_at) for symbol, payload, fetched_at in cursor.fetchall()]
@@ -0,0 +1,158 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+from music_collection.utils.cache import TTLCache
+from music_collection.utils.sql_utils import get_db_connection
+
+
+def _load_secret() -> bytes:
+    secret = os.getenv('SESSION_SECRET')
+    if secret:
+        return secret.encode('utf-8')
+    # Without a configured secret tokens only survive as long as this process
+    print("SESSION_SECRET is not set; using a random secret, sessions will not survive a restart")
+    return secrets.token_bytes(32)
+
+
+class SessionModel:
+    """
+    Signed, expiring session tokens.
+
+    A token is "<token id>.<expiry>.<signature>". Validation checks the HMAC
+    signature and expiry in memory, then confirms the session still exists
+    (i.e. was not revoked) through a short-lived in-process cache backed by
+    the sessions table, so repeat requests never touch the password hash.
+    """
+
+    def __init__(self, secret: Optional[bytes] = None):
+        self.secret = secret or _load_secret()
+        self.ttl = float(os.getenv('SESSION_TTL', 86400))
+
+        # How long a validated session is trusted before re-checking the table,
+        # which bounds how long a revocation in another process takes to apply
+        self.cache = TTLCache(
+            maxsize=int(os.getenv('SESSION_CACHE_SIZE', 10000)),
+            ttl=float(os.getenv('SESSION_CACHE_TTL', 60))
+        )
+
+    def create_session(self, user_id: int, username: str) -> Dict[str, Any]:
+        """
+        Start a session for an authenticated user.
+
+        Args:
+            user_id (int): The user's id.
+            username (str): The user's name.
+
+        Returns:
+            Dict with the token and its expiry (Unix time).
+        """
+        token_id = secrets.token_urlsafe(24)
+        now = time.time()
+        expires_at = int(now + self.ttl)
+
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "INSERT INTO sessions (token_id, user_id, username, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (token_id, user_id, username, now, expires_at)
+                )
+                # Opportunistically drop expired sessions so the table stays small
+                cursor.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Database error: {str(e)}")
+            raise ValueError("Failed to create session")
+
+        self.cache.set(token_id, {"user_id": user_id, "username": username, "expires_at": expires_at})
+        return {
+            "token": f"{token_id}.{expires_at}.{self._sign(token_id, expires_at)}",
+            "expires_at": expires_at
+        }
+
+    def validate(self, token: str) -> Dict[str, Any]:
+        """
+        Validate a session token.
+
+        Args:
+            token (str): The token returned at login.
+
+        Returns:
+            Dict with the session's user_id, username and expires_at.
+
+        Raises:
+            ValueError: If the token is malformed, forged, expired or revoked.
+        """
+        token_id, expires_at = self._parse(token)
+        if expires_at < time.time():
+            raise ValueError("Session expired")
+
+        session, _ = self.cache.get(token_id)
+        if session is not None:
+            return session
+
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT user_id, username, expires_at FROM sessions WHERE token_id = ?", (token_id,))
+                row = cursor.fetchone()
+        except sqlite3.Error as e:
+            print(f"Database error: {str(e)}")
+            raise ValueError("Failed to validate session")
+
+        if row is None:
+            raise ValueError("Invalid session")
+
+        session = {"user_id": row[0], "username": row[1], "expires_at": row[2]}
+        self.cache.set(token_id, session)
+        return session
+
+    def revoke(self, token: str) -> None:
+        """
+        End the session a token belongs to.
+
+        Raises:
+            ValueError: If the token is malformed or forged.
+        """
+        token_id, _ = self._parse(token)
+        self.cache.delete(token_id)
+        try:
+            with get_db_connection() as conn:
+                conn.execute("DELETE FROM sessions WHERE token_id = ?", (token_id,))
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Database error: {str(e)}")
+            raise ValueError("Failed to revoke session")
+
+    def revoke_user_sessions(self, user_id: int) -> None:
+        """End every session of a user, e.g. after a password change."""
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT token_id FROM sessions WHERE user_id = ?", (user_id,))
+                for (token_id,) in cursor.fetchall():
+                    self.cache.delete(token_id)
+                cursor.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Database error: {str(e)}")
+            raise ValueError("Failed to revoke sessions")
+
+    def _parse(self, token: str):
+        try:
+            token_id, expires_at, signature = token.split('.')
+            expires_at = int(expires_at)
+        except (AttributeError, ValueError):
+            raise ValueError("Invalid session")
+        if not hmac.compare_digest(signature, self._sign(token_id, expires_at)):
+            raise ValueError("Invalid session")
+        return token_id, expires_at
+
+    def _sign(self, token_id: str, expires_at: int) -> str:
+        digest = hmac.new(self.secret, f"{token_id}.{expires_at}".encode('utf-8'), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
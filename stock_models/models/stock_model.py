@@ -1,30 +1,220 @@
-from typing import Dict, Any
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Dict, Any, Optional, Tuple
+import sqlite3
+import threading
+import time
 import os
 from dotenv import load_dotenv
+from music_collection.utils.cache import TTLCache, STALE
+from music_collection.utils.history_series import HistorySeries
+from music_collection.utils.http_client import UpstreamClient
+from music_collection.utils.quota import BACKGROUND, BROWSE, TRADE, VALUATION, QuotaExhaustedError, QuotaScheduler
+from music_collection.utils.singleflight import SingleFlight
+from .history_model import HistoryModel
+from .quote_model import QuoteModel
 
 class StockModel:
     def __init__(self):
         load_dotenv()
         self.api_key = os.getenv('ALPHA_VANTAGE_API_KEY')
-        self.base_url = 'https://www.alphavantage.co/query'
+        # Overridable so benchmarks and load tests can use a local stand-in
+        self.base_url = os.getenv('ALPHA_VANTAGE_BASE_URL', 'https://www.alphavantage.co/query')
 
-    def get_stock_info(self, symbol: str) -> Dict[str, Any]:
-        """Get current stock information."""
+        # Alpha Vantage call limits, spent by priority: trades, then portfolio
+        # valuation, then browsing, then background refreshes. 0 disables a limit.
+        self.scheduler = QuotaScheduler(
+            per_minute=float(os.getenv('ALPHA_VANTAGE_CALLS_PER_MINUTE', 5)),
+            per_day=float(os.getenv('ALPHA_VANTAGE_CALLS_PER_DAY', 25)),
+            deadlines={
+                TRADE: float(os.getenv('QUOTA_WAIT_TRADE', 10)),
+                VALUATION: float(os.getenv('QUOTA_WAIT_VALUATION', 5)),
+                BROWSE: float(os.getenv('QUOTA_WAIT_BROWSE', 2)),
+                BACKGROUND: float(os.getenv('QUOTA_WAIT_BACKGROUND', 0))
+            }
+        )
+
+        # Pooled keep-alive client: every upstream call is bounded by timeouts and
+        # retried with jitter only while the shared retry budget allows it.
+        self.client = UpstreamClient(
+            self.base_url,
+            pool_size=int(os.getenv('ALPHA_VANTAGE_POOL_SIZE', 10)),
+            connect_timeout=float(os.getenv('ALPHA_VANTAGE_CONNECT_TIMEOUT', 3.05)),
+            read_timeout=float(os.getenv('ALPHA_VANTAGE_READ_TIMEOUT', 10)),
+            max_retries=int(os.getenv('ALPHA_VANTAGE_MAX_RETRIES', 2)),
+            scheduler=self.scheduler
+        )
+
+        # In-process quote cache: entries are fresh for QUOTE_CACHE_TTL seconds and
+        # may be served stale for QUOTE_CACHE_STALE_TTL more while they are refreshed.
+        self.quote_cache = TTLCache(
+            maxsize=int(os.getenv('QUOTE_CACHE_SIZE', 512)),
+            ttl=float(os.getenv('QUOTE_CACHE_TTL', 60)),
+            stale_ttl=float(os.getenv('QUOTE_CACHE_STALE_TTL', 240))
+        )
+        # Second tier in SQLite, so quotes survive restarts and are shared by workers
+        self.quote_store = QuoteModel()
+        self._refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='quote-refresh')
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+
+        # Concurrent lookups for the same symbol share one upstream request. Reads
+        # (which may be served from the store) and forced refreshes return
+        # different shapes, so they use separate keys: ('quote', SYMBOL) and
+        # ('quote-refresh', SYMBOL).
+        self._flight = SingleFlight()
+
+        # Daily bars are kept locally and only topped up from upstream
+        self.history = HistoryModel(refresh_interval=float(os.getenv('HISTORY_REFRESH_INTERVAL', 3600)))
+        self.history_backfill_outputsize = os.getenv('HISTORY_BACKFILL_OUTPUTSIZE', 'compact')
+        self.series_cache = TTLCache(
+            maxsize=int(os.getenv('HISTORY_CACHE_SIZE', 64)),
+            ttl=self.history.refresh_interval
+        )
+
+    def reset_after_fork(self) -> None:
+        """
+        Re-create thread pools, locks and upstream connections in a forked worker.
+        Cached quotes and series loaded before the fork are kept.
+        """
+        self.client.reset_after_fork()
+        self.quote_cache.reset_after_fork()
+        self.series_cache.reset_after_fork()
+        self._refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='quote-refresh')
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    def get_stock_info(self, symbol: str, priority: int = BROWSE) -> Dict[str, Any]:
+        """
+        Get current stock information, served from the in-memory quote cache, then
+        the persistent quote store, when possible.
+
+        On a miss the upstream call waits for quota at the given priority
+        (quota.TRADE, VALUATION or BROWSE) and raises QuotaExhaustedError if
+        none becomes available in time.
+        """
+        key = symbol.upper()
+        quote, state = self.quote_cache.get(key)
+
+        if quote is None:
+            quote, stale = self._flight.do(('quote', key), self._load_quote, symbol, priority)
+            if stale:
+                self._schedule_refresh(symbol)
+        elif state == STALE:
+            self._schedule_refresh(symbol)
+
+        return dict(quote)
+
+    def refresh_quote(self, symbol: str, priority: int = BROWSE) -> Dict[str, Any]:
+        """Fetch a quote from upstream regardless of the cache, and cache it."""
+        return dict(self._flight.do(('quote-refresh', symbol.upper()), self._load_stock_info, symbol, priority))
+
+    def warm_quote_cache(self) -> int:
+        """
+        Load recent quotes from the persistent store into the in-memory cache,
+        keeping their original age so expired ones still go upstream.
+
+        Returns:
+            int: The number of quotes loaded.
+        """
+        try:
+            rows = self.quote_store.get_recent_quotes(self.quote_cache.ttl + self.quote_cache.stale_ttl,
+                                                      self.quote_cache.maxsize)
+        except sqlite3.Error as e:
+            print(f"Database error: {str(e)}")
+            return 0
+
+        # Oldest first, so the newest quotes end up most recently used
+        for symbol, quote, fetched_at in reversed(rows):
+            self.quote_cache.set(symbol, quote, stored_at=time.monotonic() - (time.time() - fetched_at))
+        return len(rows)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get the quote cache hit/miss/eviction counters."""
+        return self.quote_cache.stats()
+
+    def get_coalescing_stats(self) -> Dict[str, int]:
+        """Get the counters of upstream calls made and shared between callers."""
+        return self._flight.stats()
+
+    def get_upstream_stats(self) -> Dict[str, Any]:
+        """Get upstream call counts and latency split into header wait and body read."""
+        return self.client.stats()
+
+    def get_quota_stats(self) -> Dict[str, Any]:
+        """Get the remaining upstream quota and per-priority grant/reject counts."""
+        return self.scheduler.stats()
+
+    def _schedule_refresh(self, symbol: str) -> None:
+        """Refresh a stale quote in the background, at most once per symbol at a time."""
+        key = symbol.upper()
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._refresh_executor.submit(self._refresh_quote, symbol)
+
+    def _refresh_quote(self, symbol: str) -> None:
+        key = symbol.upper()
+        try:
+            self._flight.do(('quote-refresh', key), self._load_stock_info, symbol)
+        except Exception as e:
+            # Keep serving the stale quote until it expires or a refresh succeeds
+            print(f"Background refresh failed for {symbol}: {str(e)}")
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(key)
+
+    def _load_quote(self, symbol: str, priority: int = BROWSE) -> Tuple[Dict[str, Any], bool]:
+        """
+        Load a quote missing from memory, from the persistent store if it is still
+        servable there and from upstream otherwise.
+
+        Returns:
+            Tuple of the quote and whether it is stale and should be refreshed.
+        """
+        key = symbol.upper()
+        try:
+            stored = self.quote_store.get_quote(key)
+        except sqlite3.Error as e:
+            print(f"Database error: {str(e)}")
+            stored = None
+
+        if stored is not None:
+            quote, fetched_at = stored
+            age = max(0.0, time.time() - fetched_at)
+            if age <= self.quote_cache.ttl + self.quote_cache.stale_ttl:
+                self.quote_cache.set(key, quote, stored_at=time.monotonic() - age)
+                return quote, age > self.quote_cache.ttl
+
+        return self._load_stock_info(symbol, priority), False
+
+    def _load_stock_info(self, symbol: str, priority: int = BROWSE) -> Dict[str, Any]:
+        """Fetch a quote from upstream and store it in both cache tiers."""
+        quote = self._fetch_stock_info(symbol, priority)
+        self.quote_cache.set(symbol.upper(), quote)
+        try:
+            self.quote_store.save_quote(symbol.upper(), quote)
+        except sqlite3.Error as e:
+            print(f"Database error: {str(e)}")
+        return quote
+
+    def _fetch_stock_info(self, symbol: str, priority: int = BROWSE) -> Dict[str, Any]:
+        """Fetch current stock information from Alpha Vantage."""
         params = {
             'function': 'GLOBAL_QUOTE',
             'symbol': symbol,
             'apikey': self.api_key
         }
-        
+
         try:
-            response = requests.get(self.base_url, params=params)
-            data = response.json()
-            
+            data = self.client.get_json(params, priority)
+
             if "Global Quote" not in data or not data["Global Quote"]:
                 print(f"API Response: {data}")
                 raise ValueError(f"Could not fetch data for symbol {symbol}")
-            
+
             quote = data["Global Quote"]
             return {
                 "symbol": quote.get("01. symbol", symbol),
@@ -35,26 +225,87 @@ class StockModel:
                 "change": float(quote.get("09. change", 0)),
                 "change_percent": quote.get("10. change percent", "0%")
             }
+        except QuotaExhaustedError:
+            raise
         except Exception as e:
             print(f"Exception: {str(e)}")
             raise ValueError(f"Could not fetch data for symbol {symbol}")
 
     def get_historical_data(self, symbol: str) -> Dict[str, Any]:
-        """Get historical stock data."""
+        """Get historical stock data as a date -> OHLCV mapping, newest first."""
+        return self.get_history_series(symbol).to_dict()
+
+    def get_history_series(self, symbol: str) -> HistorySeries:
+        """
+        Get historical stock data as columnar arrays from the local bar store.
+
+        Upstream is only asked for bars newer than the last stored date, and only
+        when the symbol has not been synced within the refresh interval. Concurrent
+        requests for a symbol share one sync, at browsing priority. Loaded series
+        are kept in memory until the next sync.
+        """
+        key = symbol.upper()
+        if self.history.needs_refresh(key):
+            try:
+                self._flight.do(('history', key), self._sync_historical_data, symbol)
+            except (ValueError, QuotaExhaustedError):
+                if self.history.get_last_date(key) is None:
+                    raise
+                print(f"Serving stored history for {symbol} after failed sync")
+
+        series, _ = self.series_cache.get(key)
+        if series is None:
+            series = self.history.get_series(key)
+            self.series_cache.set(key, series)
+        return series
+
+    def get_history_version(self, symbol: str) -> Optional[str]:
+        """
+        Get the date of the newest stored bar if the stored history is current,
+        i.e. get_history_series would not go upstream. Bars are only ever
+        appended, so this date identifies the series.
+
+        Returns:
+            str: The last bar date ("" if there are no bars), or None if the
+            symbol is due for a sync.
+        """
+        key = symbol.upper()
+        if self.history.needs_refresh(key):
+            return None
+        return self.history.get_last_date(key) or ""
+
+    def _sync_historical_data(self, symbol: str) -> None:
+        """Fetch bars newer than the last stored one and add them to the store."""
+        key = symbol.upper()
+        last_date = self.history.get_last_date(key)
+
+        # The compact series covers the last 100 trading days, which is enough
+        # unless the stored history is older than that (or missing altogether)
+        outputsize = self.history_backfill_outputsize
+        if last_date is not None and (date.today() - date.fromisoformat(last_date)).days < 140:
+            outputsize = 'compact'
+
+        bars = self._fetch_historical_data(symbol, outputsize)
+        self.history.save_bars(key, {day: bar for day, bar in bars.items()
+                                     if last_date is None or day > last_date})
+        self.series_cache.delete(key)
+
+    def _fetch_historical_data(self, symbol: str, outputsize: str = 'compact') -> Dict[str, Any]:
+        """Fetch historical stock data from Alpha Vantage."""
         params = {
             'function': 'TIME_SERIES_DAILY',
             'symbol': symbol,
+            'outputsize': outputsize,
             'apikey': self.api_key
         }
-        
+
         try:
-            response = requests.get(self.base_url, params=params)
-            data = response.json()
-            
+            data = self.client.get_json(params)
+
             if "Time Series (Daily)" not in data:
                 print(f"API Response: {data}")
                 raise ValueError(f"Could not fetch historical data for symbol {symbol}")
-            
+
             time_series = data["Time Series (Daily)"]
             return {date: {
                 "open": float(values["1. open"]),
@@ -63,6 +314,8 @@ class StockModel:
                 "close": float(values["4. close"]),
                 "volume": int(values["5. volume"])
             } for date, values in time_series.items()}
+        except QuotaExhaustedError:
+            raise
         except Exception as e:
             print(f"Exception: {str(e)}")
             raise ValueError(f"Could not fetch historical data for symbol {symbol}")
@@ -1,12 +1,17 @@
 import sqlite3
-import hashlib
+import hmac
 import os
 from typing import Dict, Optional
+from music_collection.utils.hash_pool import HashPool, PASSWORD_HASH_ITERATIONS, hash_pool as default_hash_pool
 from music_collection.utils.sql_utils import get_db_connection
+from .session_model import SessionModel
 
 class UserModel:
-    def __init__(self):
-        self.db_path = "users.db"
+    def __init__(self, hash_pool: Optional[HashPool] = None, session_model: Optional[SessionModel] = None):
+        # Hashing runs on a bounded process pool so it cannot starve request threads
+        self.hash_pool = hash_pool or default_hash_pool
+        # Login hands out session tokens so later requests skip the password hash
+        self.sessions = session_model or SessionModel()
 
     def hash_password(self, password: str, salt: bytes = None) -> Dict[str, bytes]:
         """
@@ -18,19 +23,17 @@ class UserModel:
         
         Returns:
             Dict containing salt and hashed password
+
+        Raises:
+            HashPoolBusyError: If the hashing queue is full
         """
         if salt is None:
             # Generate a new salt
             salt = os.urandom(32)  # 32 bytes = 256 bits
         
-        # Hash the password with the salt using SHA-256
-        # We use PBKDF2-like approach with multiple iterations for added security
-        hashed_password = hashlib.pbkdf2_hmac(
-            'sha256',  # hash digest algorithm
-            password.encode('utf-8'),  # convert password to bytes
-            salt,  # provide the salt
-            100000  # 100,000 iterations of SHA-256 
-        )
+        # Hash the password with the salt using PBKDF2-SHA256
+        # (PASSWORD_HASH_ITERATIONS iterations, 100,000 by default)
+        hashed_password = self.hash_pool.hash(password, salt, PASSWORD_HASH_ITERATIONS)
         
         return {
             'salt': salt,
@@ -91,7 +94,7 @@ class UserModel:
             password (str): The password to verify
         
         Returns:
-            Dict with login details if successful
+            Dict with login details and a session token if successful
         """
         # Validate inputs
         if not username or not password:
@@ -116,16 +119,19 @@ class UserModel:
                 # Verify password
                 if not self.verify_password(password, stored_salt, stored_hashed_password):
                     raise ValueError("Invalid username or password")
-                
-                return {
-                    "id": user_id,
-                    "username": username,
-                    "message": "Login successful"
-                }
         except sqlite3.Error as e:
             print(f"Database error: {str(e)}")
             raise ValueError("Login failed")
 
+        session = self.sessions.create_session(user_id, username)
+        return {
+            "id": user_id,
+            "username": username,
+            "token": session["token"],
+            "expires_at": session["expires_at"],
+            "message": "Login successful"
+        }
+
     def update_password(self, username: str, old_password: str, new_password: str) -> Dict:
         """
         Update a user's password.
@@ -148,7 +154,7 @@ class UserModel:
                 
                 # First, verify the old password
                 cursor.execute(
-                    "SELECT salt, hashed_password FROM users WHERE username = ?",
+                    "SELECT id, salt, hashed_password FROM users WHERE username = ?",
                     (username,)
                 )
                 user = cursor.fetchone()
@@ -156,7 +162,7 @@ class UserModel:
                 if not user:
                     raise ValueError("User not found")
                 
-                stored_salt, stored_hashed_password = user
+                user_id, stored_salt, stored_hashed_password = user
                 
                 # Verify old password
                 if not self.verify_password(old_password, stored_salt, stored_hashed_password):
@@ -171,15 +177,17 @@ class UserModel:
                     (new_hashed_data['salt'], new_hashed_data['hashed_password'], username)
                 )
                 conn.commit()
-                
-                return {
-                    "username": username,
-                    "message": "Password updated successfully"
-                }
         except sqlite3.Error as e:
             print(f"Database error: {str(e)}")
             raise ValueError("Failed to update password")
 
+        # Tokens issued under the old password stop working
+        self.sessions.revoke_user_sessions(user_id)
+        return {
+            "username": username,
+            "message": "Password updated successfully"
+        }
+
     def verify_password(self, input_password: str, stored_salt: bytes, stored_hashed_password: bytes) -> bool:
         """
         Verify a password against stored salt and hashed password.
@@ -195,5 +203,5 @@ class UserModel:
         # Hash the input password with the stored salt
         hashed_data = self.hash_password(input_password, stored_salt)
         
-        # Compare the newly hashed password with the stored hashed password
-        return hashed_data['hashed_password'] == stored_hashed_password
\ No newline at end of file
+        # Compare the newly hashed password with the stored hashed password in constant time
+        return hmac.compare_digest(hashed_data['hashed_password'], stored_hashed_password)
\ No newline at end of file
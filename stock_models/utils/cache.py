@@ -0,0 +1,130 @@
+from collections import OrderedDict
+import logging
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from music_collection.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+FRESH = "fresh"
+STALE = "stale"
+
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded LRU cache whose entries expire after a TTL.
+
+    An entry is "fresh" for `ttl` seconds after it was stored and "stale" for a
+    further `stale_ttl` seconds, during which callers may still serve it while a
+    refresh happens elsewhere. After that it is treated as a miss and dropped.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 60.0, stale_ttl: float = 0.0):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer")
+        if ttl < 0 or stale_ttl < 0:
+            raise ValueError("ttl and stale_ttl must not be negative")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: Hashable) -> Tuple[Optional[Any], Optional[str]]:
+        """
+        Look up a key.
+
+        Args:
+            key (Hashable): The cache key.
+
+        Returns:
+            Tuple of (value, state) where state is FRESH, STALE or None on a miss.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._misses += 1
+                return None, None
+
+            value, stored_at = entry
+            age = now - stored_at
+            if age > self.ttl + self.stale_ttl:
+                del self._data[key]
+                self._expirations += 1
+                self._misses += 1
+                return None, None
+
+            self._data.move_to_end(key)
+            if age > self.ttl:
+                self._stale_hits += 1
+                return value, STALE
+
+            self._hits += 1
+            return value, FRESH
+
+    def set(self, key: Hashable, value: Any, stored_at: Optional[float] = None) -> None:
+        """
+        Store a value, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key (Hashable): The cache key.
+            value (Any): The value to cache.
+            stored_at (float, optional): monotonic() timestamp the value was produced at.
+        """
+        with self._lock:
+            self._data[key] = (value, time.monotonic() if stored_at is None else stored_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                evicted_key, _ = self._data.popitem(last=False)
+                self._evictions += 1
+                logger.debug("Evicted %s from cache", evicted_key)
+
+    def delete(self, key: Hashable) -> None:
+        """Remove a key if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove every entry. Counters are left untouched."""
+        with self._lock:
+            self._data.clear()
+
+    def reset_after_fork(self) -> None:
+        """Replace the lock in a forked worker. Cached entries are kept and stay valid."""
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the cache counters.
+
+        Returns:
+            Dict with hits, stale_hits, misses, evictions, expirations, size and hit_ratio.
+        """
+        with self._lock:
+            lookups = self._hits + self._stale_hits + self._misses
+            return {
+                "hits": self._hits,
+                "stale_hits": self._stale_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hit_ratio": (self._hits + self._stale_hits) / lookups if lookups else 0.0
+            }
@@ -0,0 +1,100 @@
+import gzip
+import os
+import zlib
+from typing import Iterable, Iterator, List
+
+from flask import Response
+from werkzeug.datastructures import Accept
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Bodies smaller than this are sent as they are
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", 6))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", 4))
+
+# Preferred first when the client accepts several with equal weight
+ENCODINGS = ["br", "gzip"] if brotli is not None else ["gzip"]
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+# Streamed bodies are compressed on the fly, except event streams whose
+# events must reach the client as soon as they are written
+STREAM_COMPRESSIBLE_TYPES = ("application/json",)
+
+
+def etag_variants(etag: str) -> List[str]:
+    """Every ETag a representation of `etag` may carry: identity and each encoding."""
+    return [etag] + [f"{etag}-{encoding}" for encoding in ENCODINGS]
+
+
+def compress_chunks(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """
+    Compress a streamed body chunk by chunk.
+
+    Args:
+        chunks (Iterable[bytes]): The uncompressed body.
+        encoding (str): "br" or "gzip".
+
+    Yields:
+        bytes: Compressed output, as the compressor produces it.
+    """
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+        compress, finish = compressor.process, compressor.finish
+    else:
+        # wbits 31 writes a gzip header and trailer around the deflate stream
+        compressor = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 31)
+        compress, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def compress_response(response: Response, accept_encodings: Accept) -> Response:
+    """
+    Compress a response body with the best encoding the client accepts.
+
+    Streamed JSON is compressed chunk by chunk without buffering; other
+    streamed, small, already-encoded and non-text responses are left alone.
+    A strong ETag gets the encoding appended, since the compressed bytes are
+    a different representation.
+
+    Args:
+        response (Response): The response to compress in place.
+        accept_encodings (Accept): The request's Accept-Encoding header.
+
+    Returns:
+        Response: The same response.
+    """
+    mimetype = response.mimetype or ""
+    if (response.status_code != 200 or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or not mimetype.startswith(STREAM_COMPRESSIBLE_TYPES if response.is_streamed else COMPRESSIBLE_TYPES)):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    if not response.is_streamed and len(response.get_data()) < COMPRESS_MIN_SIZE:
+        return response
+
+    encoding = accept_encodings.best_match(ENCODINGS)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_chunks(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    elif encoding == "br":
+        response.set_data(brotli.compress(response.get_data(), quality=COMPRESS_BROTLI_QUALITY))
+    else:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=COMPRESS_GZIP_LEVEL))
+    response.headers["Content-Encoding"] = encoding
+
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
@@ -0,0 +1,115 @@
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from typing import Optional
+
+from music_collection.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# PBKDF2-SHA256 iterations for new and verified password hashes
+PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", 100000))
+
+
+class HashPoolBusyError(RuntimeError):
+    """Raised when the hashing queue is full or a hash times out, and the request should be shed."""
+
+
+def pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    """Hash a password with PBKDF2-SHA256. Module-level so worker processes can run it."""
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+
+
+class HashPool:
+    """
+    Runs password hashing on a dedicated process pool with a bounded queue.
+
+    At most `max_pending` hashes may be queued or running at once; further
+    requests fail immediately with HashPoolBusyError instead of waiting, so a
+    login burst cannot tie up every request thread. With workers=0 hashing runs
+    inline on the calling thread.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: Optional[int] = None, timeout: float = 10.0):
+        self.workers = workers
+        self.max_pending = max_pending if max_pending is not None else max(1, workers) * 4
+        self.timeout = timeout
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def hash(self, password: str, salt: bytes, iterations: int = PASSWORD_HASH_ITERATIONS) -> bytes:
+        """
+        Hash a password, on the pool if one is configured.
+
+        Args:
+            password (str): The plain text password.
+            salt (bytes): The salt.
+            iterations (int): PBKDF2 iteration count.
+
+        Returns:
+            bytes: The derived key.
+
+        Raises:
+            HashPoolBusyError: If the queue is full or the hash does not finish within the timeout.
+        """
+        if not self._slots.acquire(blocking=False):
+            logger.warning("Password hashing queue full (%d pending), rejecting request", self.max_pending)
+            raise HashPoolBusyError("Authentication is temporarily overloaded, please retry")
+
+        if self.workers <= 0:
+            try:
+                return pbkdf2(password, salt, iterations)
+            finally:
+                self._slots.release()
+
+        try:
+            future = self._get_executor().submit(pbkdf2, password, salt, iterations)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Free the slot only when the work itself is done, not when a caller gives up waiting
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            logger.warning("Password hash did not finish within %.1fs, rejecting request", self.timeout)
+            raise HashPoolBusyError("Authentication is temporarily overloaded, please retry")
+
+    def reset_after_fork(self) -> None:
+        """Drop the parent's executor; a forked server worker starts its own on first use."""
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes."""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                # Created lazily from a request thread: forking a multi-threaded server
+                # worker could copy locks held by other threads, so hashing processes
+                # come from a single-threaded fork server (which only imports this module)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context("forkserver"))
+                logger.info("Started password hashing pool with %d workers", self.workers)
+            return self._executor
+
+
+# Shared by every UserModel in the process
+hash_pool = HashPool(
+    workers=int(os.getenv("AUTH_HASH_WORKERS", 2)),
+    max_pending=int(os.getenv("AUTH_HASH_QUEUE", 0)) or None,
+    timeout=float(os.getenv("AUTH_HASH_TIMEOUT", 10))
+)
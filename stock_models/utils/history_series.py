@@ -0,0 +1,120 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+FIELDS = ("open", "high", "low", "close", "volume")
+
+# Bars converted to Python objects at a time when iterating
+ITER_BLOCK_SIZE = 1024
+
+
+class HistorySeries:
+    """
+    Daily OHLCV history held as contiguous NumPy columns, oldest bar first.
+
+    Slicing by date range or bar count returns views over the same arrays, so a
+    request only pays for converting the bars it actually returns.
+    """
+
+    def __init__(self, dates: np.ndarray, open: np.ndarray, high: np.ndarray, low: np.ndarray,
+                 close: np.ndarray, volume: np.ndarray):
+        self.dates = dates
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence[Any]]) -> "HistorySeries":
+        """
+        Build a series from (date, open, high, low, close, volume) rows sorted by date.
+
+        Args:
+            rows (Sequence): Rows as returned by the daily_bars range scan.
+
+        Returns:
+            HistorySeries: The columnar series.
+        """
+        if not rows:
+            return cls.empty()
+        dates, opens, highs, lows, closes, volumes = zip(*rows)
+        return cls(
+            np.array(dates, dtype="datetime64[D]"),
+            np.array(opens, dtype=np.float64),
+            np.array(highs, dtype=np.float64),
+            np.array(lows, dtype=np.float64),
+            np.array(closes, dtype=np.float64),
+            np.array(volumes, dtype=np.int64)
+        )
+
+    @classmethod
+    def empty(cls) -> "HistorySeries":
+        """Build a series with no bars."""
+        floats = np.empty(0, dtype=np.float64)
+        return cls(np.empty(0, dtype="datetime64[D]"), floats, floats, floats, floats,
+                   np.empty(0, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @property
+    def last_date(self) -> Optional[str]:
+        """Date (YYYY-MM-DD) of the newest bar, or None if the series is empty."""
+        return str(self.dates[-1]) if len(self.dates) else None
+
+    def slice(self, start: Optional[str] = None, end: Optional[str] = None,
+              limit: Optional[int] = None) -> "HistorySeries":
+        """
+        Select bars by inclusive date range and keep at most the newest `limit` of them.
+
+        Args:
+            start (str, optional): First date to include (YYYY-MM-DD).
+            end (str, optional): Last date to include (YYYY-MM-DD).
+            limit (int, optional): Maximum number of (most recent) bars to keep.
+
+        Returns:
+            HistorySeries: A series of views over this one's arrays.
+        """
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, "D"), side="left"))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, np.datetime64(end, "D"),
+                                                                     side="right"))
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        window = np.s_[lo:hi]
+        return HistorySeries(self.dates[window], self.open[window], self.high[window], self.low[window],
+                             self.close[window], self.volume[window])
+
+    def iter_items(self, fields: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Yield the (date, {field: value}) pairs of to_dict, newest first.
+
+        Bars are converted a block at a time, so memory use does not grow with
+        the length of the series.
+
+        Args:
+            fields (Iterable[str], optional): Fields to include. Defaults to all of FIELDS.
+
+        Yields:
+            Tuple of the date (YYYY-MM-DD) and its selected fields.
+        """
+        fields = list(FIELDS if fields is None else fields)
+        for hi in range(len(self.dates), 0, -ITER_BLOCK_SIZE):
+            lo = max(hi - ITER_BLOCK_SIZE, 0)
+            dates = np.datetime_as_string(self.dates[lo:hi][::-1]).tolist()
+            columns: List[list] = [getattr(self, field)[lo:hi][::-1].tolist() for field in fields]
+            for date, *values in zip(dates, *columns):
+                yield date, dict(zip(fields, values))
+
+    def to_dict(self, fields: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Convert to the date -> {field: value} mapping returned by the API, newest first.
+
+        Args:
+            fields (Iterable[str], optional): Fields to include. Defaults to all of FIELDS.
+
+        Returns:
+            Dict mapping each date to its selected fields.
+        """
+        return dict(self.iter_items(fields))
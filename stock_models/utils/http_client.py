@@ -0,0 +1,283 @@
+import json
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from music_collection.utils.logger import configure_logger
+from music_collection.utils.metrics import registry
+from music_collection.utils.profiling import phase
+from music_collection.utils.quota import BROWSE, QuotaExhaustedError, QuotaScheduler
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# Upstream statuses that are worth another attempt
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+UPSTREAM_SECONDS = registry.histogram(
+    "upstream_request_duration_seconds", "Time per upstream HTTP attempt, failed ones and retries included", ["function"]
+)
+UPSTREAM_ERRORS = registry.counter(
+    "upstream_errors_total", "Upstream calls that failed, after any retries", ["function", "reason"]
+)
+UPSTREAM_RETRIES = registry.counter("upstream_retries_total", "Upstream attempts retried", ["function"])
+
+
+def _error_reason(error: Exception) -> str:
+    """Short, bounded description of why an upstream call failed."""
+    if isinstance(error, QuotaExhaustedError):
+        return "quota"
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return f"http_{error.response.status_code}"
+    if isinstance(error, requests.exceptions.Timeout):
+        return "timeout"
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return "connection"
+    if isinstance(error, ValueError):
+        return "invalid_json"
+    return "other"
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of recent traffic.
+
+    Every first attempt deposits `ratio` tokens (up to `max_tokens`) and every
+    retry withdraws one, so a struggling upstream sees at most roughly
+    (1 + ratio) times the normal request rate instead of (1 + max_retries) times.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_tokens: float = 10.0, max_tokens: float = 100.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = min_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Take one retry token. Returns False when the budget is exhausted."""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            return self._tokens
+
+
+class UpstreamClient:
+    """
+    Keep-alive HTTP client for a JSON upstream.
+
+    Connections are pooled in a requests.Session, every attempt is bounded by
+    connect/read timeouts, and failed attempts are retried with full jitter
+    while the retry budget allows it. Each call's time to response headers and
+    time spent reading the body are recorded separately, split by whether the
+    call had to open a new connection, so handshake cost shows up as the gap
+    between the two groups. With a scheduler, every attempt (retries included)
+    first takes upstream quota at the caller's priority.
+    """
+
+    def __init__(self, base_url: str, pool_size: int = 10, connect_timeout: float = 3.05,
+                 read_timeout: float = 10.0, max_retries: int = 2, backoff_base: float = 0.25,
+                 backoff_cap: float = 2.0, retry_budget: Optional[RetryBudget] = None,
+                 scheduler: Optional[QuotaScheduler] = None):
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.retry_budget = retry_budget or RetryBudget()
+        self.scheduler = scheduler
+
+        self._adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "errors": 0,
+            "retries": 0,
+            "retries_denied": 0,
+            "new_connections": 0,
+            "new_connection_header_ms": 0.0,
+            "reused_connection_header_ms": 0.0,
+            "body_ms": 0.0
+        }
+        self.last_call: Dict[str, Any] = {}
+
+    def reset_after_fork(self) -> None:
+        """
+        Give a forked worker its own connection pool.
+
+        Pooled sockets inherited from the parent are shared with it, so they are
+        dropped (not closed, which could disturb the parent) and replaced.
+        """
+        self._adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+        self._stats_lock = threading.Lock()
+        if self.scheduler is not None:
+            self.scheduler.reset_after_fork()
+
+    def get_json(self, params: Dict[str, Any], priority: int = BROWSE) -> Dict[str, Any]:
+        """
+        GET the base URL with the given query parameters and decode the JSON body.
+
+        Args:
+            params (Dict[str, Any]): Query string parameters.
+            priority (int): Quota priority class (quota.TRADE, VALUATION or BROWSE).
+
+        Returns:
+            Dict: The decoded JSON response.
+
+        Raises:
+            requests.exceptions.RequestException: If every allowed attempt failed.
+            QuotaExhaustedError: If no upstream quota was available in time.
+            ValueError: If the response body is not valid JSON.
+        """
+        # Quota waits and retry back-off count as upstream time in a request profile
+        with phase("upstream"):
+            return self._get_json(params, priority)
+
+    def _get_json(self, params: Dict[str, Any], priority: int) -> Dict[str, Any]:
+        function = str(params.get("function"))
+        attempt = 0
+        while True:
+            try:
+                if self.scheduler is not None:
+                    self.scheduler.acquire(priority)
+                start = time.perf_counter()
+                try:
+                    data = self._attempt(params)
+                finally:
+                    UPSTREAM_SECONDS.observe(time.perf_counter() - start, (function,))
+                if attempt == 0:
+                    self.retry_budget.deposit()
+                return data
+            except requests.exceptions.RequestException as e:
+                if not self._should_retry(e, attempt):
+                    self._record_error()
+                    UPSTREAM_ERRORS.inc((function, _error_reason(e)))
+                    raise
+                UPSTREAM_RETRIES.inc((function,))
+                delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+                logger.warning("Upstream call failed (%s), retrying in %.2fs", e, delay)
+                time.sleep(delay)
+                attempt += 1
+            except ValueError as e:
+                self._record_error()
+                UPSTREAM_ERRORS.inc((function, _error_reason(e)))
+                raise
+            except QuotaExhaustedError as e:
+                # No call was made, so this is not one of the client's errors
+                UPSTREAM_ERRORS.inc((function, _error_reason(e)))
+                raise
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the upstream call counters and latency split.
+
+        Returns:
+            Dict with call/error/retry counts, average time to response headers on
+            new and reused connections, average body read time, the last call and,
+            with a scheduler, the remaining quota.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+            last_call = dict(self.last_call)
+
+        reused = stats["calls"] - stats["new_connections"]
+        return {
+            "calls": stats["calls"],
+            "errors": stats["errors"],
+            "retries": stats["retries"],
+            "retries_denied": stats["retries_denied"],
+            "retry_budget_tokens": self.retry_budget.tokens,
+            "new_connections": stats["new_connections"],
+            "avg_header_ms_new_connection": (stats["new_connection_header_ms"] / stats["new_connections"]
+                                             if stats["new_connections"] else None),
+            "avg_header_ms_reused_connection": (stats["reused_connection_header_ms"] / reused
+                                                if reused else None),
+            "avg_body_ms": stats["body_ms"] / stats["calls"] if stats["calls"] else None,
+            "last_call": last_call,
+            "quota": self.scheduler.stats() if self.scheduler is not None else None
+        }
+
+    def _attempt(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Make a single request, recording how its time was spent."""
+        start = time.perf_counter()
+        response = self.session.get(self.base_url, params=params, timeout=self.timeout, stream=True)
+        headers_at = time.perf_counter()
+
+        # Tag the underlying connection so later calls on it count as reused
+        connection = getattr(response.raw, "connection", None)
+        new_connection = connection is not None and not getattr(connection, "_upstream_seen", False)
+        if connection is not None:
+            connection._upstream_seen = True
+        try:
+            body = response.content
+        finally:
+            response.close()
+        done_at = time.perf_counter()
+
+        header_ms = (headers_at - start) * 1000
+        body_ms = (done_at - headers_at) * 1000
+        with self._stats_lock:
+            self._stats["calls"] += 1
+            self._stats["body_ms"] += body_ms
+            if new_connection:
+                self._stats["new_connections"] += 1
+                self._stats["new_connection_header_ms"] += header_ms
+            else:
+                self._stats["reused_connection_header_ms"] += header_ms
+            self.last_call = {
+                "function": params.get("function"),
+                "status": response.status_code,
+                "new_connection": new_connection,
+                "header_ms": header_ms,
+                "body_ms": body_ms,
+                "total_ms": header_ms + body_ms
+            }
+
+        if response.status_code in RETRYABLE_STATUSES:
+            raise requests.exceptions.HTTPError(f"Upstream returned {response.status_code}", response=response)
+        response.raise_for_status()
+        return json.loads(body)
+
+    def _should_retry(self, error: requests.exceptions.RequestException, attempt: int) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        if isinstance(error, requests.exceptions.HTTPError):
+            if error.response is None or error.response.status_code not in RETRYABLE_STATUSES:
+                return False
+        elif not isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return False
+        if not self.retry_budget.withdraw():
+            with self._stats_lock:
+                self._stats["retries_denied"] += 1
+            return False
+        with self._stats_lock:
+            self._stats["retries"] += 1
+        return True
+
+    def _record_error(self) -> None:
+        with self._stats_lock:
+            self._stats["errors"] += 1
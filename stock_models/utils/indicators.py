@@ -0,0 +1,104 @@
+from typing import Optional
+
+import numpy as np
+
+
+# Trading days per year, used to annualize volatility
+TRADING_DAYS = 252
+
+
+def ewm(values: np.ndarray, alpha: float, initial: Optional[float] = None) -> np.ndarray:
+    """
+    Exponentially weighted moving average, y[t] = (1 - alpha) * y[t-1] + alpha * x[t].
+
+    The recurrence is evaluated in closed form over blocks sized so the rescaling
+    factors stay within float64 range, so long series need only a handful of
+    vectorized passes.
+
+    Args:
+        values (np.ndarray): Input series.
+        alpha (float): Smoothing factor in (0, 1].
+        initial (float, optional): Value of y[-1]. If None, y[0] = x[0].
+
+    Returns:
+        np.ndarray: The smoothed series, same length as the input.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    out = np.empty_like(values)
+    if len(values) == 0:
+        return out
+
+    decay = 1.0 - alpha
+    if decay <= 0:
+        out[:] = values
+        return out
+
+    if initial is None:
+        out[0] = values[0]
+        previous = values[0]
+        begin = 1
+    else:
+        previous = initial
+        begin = 0
+
+    block = max(1, int(600 / -np.log(decay)))
+    for start in range(begin, len(values), block):
+        segment = values[start:start + block]
+        powers = np.arange(len(segment))
+        out[start:start + len(segment)] = decay ** powers * (
+            decay * previous + alpha * np.cumsum(segment * decay ** -powers))
+        previous = out[start + len(segment) - 1]
+    return out
+
+
+def sma(close: np.ndarray, window: int) -> np.ndarray:
+    """Simple moving average. The first window - 1 values are NaN."""
+    out = np.full(len(close), np.nan)
+    if len(close) >= window:
+        sums = np.cumsum(np.insert(close.astype(np.float64), 0, 0.0))
+        out[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return out
+
+
+def ema(close: np.ndarray, span: int) -> np.ndarray:
+    """Exponential moving average with alpha = 2 / (span + 1), seeded with the first close."""
+    return ewm(close, 2.0 / (span + 1))
+
+
+def volatility(close: np.ndarray, window: int) -> np.ndarray:
+    """Annualized rolling standard deviation of daily log returns. Leading values are NaN."""
+    out = np.full(len(close), np.nan)
+    if len(close) > window:
+        returns = np.diff(np.log(close))
+        windows = np.lib.stride_tricks.sliding_window_view(returns, window)
+        out[window:] = windows.std(axis=1, ddof=1) * np.sqrt(TRADING_DAYS)
+    return out
+
+
+def rsi(close: np.ndarray, period: int) -> np.ndarray:
+    """Wilder's relative strength index. The first `period` values are NaN."""
+    out = np.full(len(close), np.nan)
+    if len(close) <= period:
+        return out
+
+    changes = np.diff(close.astype(np.float64))
+    gains = np.clip(changes, 0, None)
+    losses = np.clip(-changes, 0, None)
+
+    # Seed with the simple average of the first period, then smooth with alpha = 1 / period
+    avg_gain = np.empty(len(changes) - period + 1)
+    avg_loss = np.empty_like(avg_gain)
+    avg_gain[0] = gains[:period].mean()
+    avg_loss[0] = losses[:period].mean()
+    avg_gain[1:] = ewm(gains[period:], 1.0 / period, initial=avg_gain[0])
+    avg_loss[1:] = ewm(losses[period:], 1.0 / period, initial=avg_loss[0])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[period:] = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+    return out
+
+
+def drawdown(close: np.ndarray) -> np.ndarray:
+    """Fractional decline of each close from the running maximum (0 at new highs)."""
+    close = close.astype(np.float64)
+    return close / np.maximum.accumulate(close) - 1.0
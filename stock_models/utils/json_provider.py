@@ -0,0 +1,168 @@
+import logging
+import os
+import time
+from typing import Any, Callable, Iterable, Iterator, Tuple
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from music_collection.utils.logger import configure_logger
+from music_collection.utils import profiling
+from music_collection.utils.profiling import record as record_phase
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# "auto" uses orjson when it is installed, "orjson" requires it, "stdlib" never uses it
+JSON_PROVIDER = os.getenv("JSON_PROVIDER", "auto")
+
+# Target size of each chunk written by the streaming encoders
+STREAM_CHUNK_SIZE = int(os.getenv("JSON_STREAM_CHUNK_SIZE", 65536))
+
+
+class StdlibProvider(DefaultJSONProvider):
+    """Flask's default provider, with response encoding timed in request profiles."""
+
+    def response(self, *args: Any, **kwargs: Any):
+        start = time.perf_counter()
+        try:
+            return super().response(*args, **kwargs)
+        finally:
+            record_phase("serialize", time.perf_counter() - start)
+
+
+class OrjsonProvider(StdlibProvider):
+    """
+    Flask JSON provider backed by orjson.
+
+    Responses are encoded straight to bytes. Keys are not sorted (object key
+    order carries no meaning), NumPy arrays and scalars are encoded natively,
+    and NaN becomes null. Types orjson does not know fall back to Flask's
+    default handling (Decimal, UUID, dataclasses and so on).
+    """
+
+    sort_keys = False
+
+    def _options(self, **kwargs: Any) -> int:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys or kwargs.get("sort_keys"):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, default=self.default, option=self._options(**kwargs)).decode("utf-8")
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        start = time.perf_counter()
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default,
+                            option=self._options(indent=indent) | orjson.OPT_APPEND_NEWLINE)
+        record_phase("serialize", time.perf_counter() - start)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def configure_json(app: Flask) -> None:
+    """
+    Install the JSON provider selected by JSON_PROVIDER on the app.
+
+    Raises:
+        ValueError: If JSON_PROVIDER is unknown, or "orjson" without orjson installed.
+    """
+    if JSON_PROVIDER not in ("auto", "orjson", "stdlib"):
+        raise ValueError(f"Unknown JSON_PROVIDER {JSON_PROVIDER}, expected auto, orjson or stdlib")
+    if JSON_PROVIDER == "orjson" and orjson is None:
+        raise ValueError("JSON_PROVIDER=orjson but orjson is not installed")
+
+    if JSON_PROVIDER != "stdlib" and orjson is not None:
+        app.json = OrjsonProvider(app)
+    else:
+        app.json = StdlibProvider(app)
+    logger.info("Using %s JSON provider", type(app.json).__name__)
+
+
+def _chunked(parts: Iterable[str]) -> Iterator[bytes]:
+    """Join encoded fragments into chunks of roughly STREAM_CHUNK_SIZE bytes."""
+    buffer, size = [], 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= STREAM_CHUNK_SIZE:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def _stream_dumps(app: Flask) -> Tuple[Callable[[Any], str], Callable[[], None]]:
+    """
+    The app's dumps for a streaming encoder, and a callable recording the time
+    spent in it as the "serialize" phase once the stream ends.
+
+    Encoding happens while the server reads the body, interleaved with fetching
+    the rows, so only the dumps calls themselves are timed, and only when the
+    request is profiled.
+    """
+    dumps = app.json.dumps
+    if profiling.current() is None:
+        return dumps, lambda: None
+
+    spent = 0.0
+
+    def timed_dumps(obj: Any) -> str:
+        nonlocal spent
+        start = time.perf_counter()
+        try:
+            return dumps(obj)
+        finally:
+            spent += time.perf_counter() - start
+
+    return timed_dumps, lambda: record_phase("serialize", spent)
+
+
+def stream_json_object(app: Flask, items: Iterable[Tuple[str, Any]]) -> Iterator[bytes]:
+    """
+    Encode (key, value) pairs as one JSON object, a chunk at a time.
+
+    Only one chunk is held in memory at once, however many pairs there are.
+    """
+    dumps, finish = _stream_dumps(app)
+
+    def parts():
+        try:
+            yield "{"
+            for index, (key, value) in enumerate(items):
+                yield f'{"," if index else ""}{dumps(key)}:{dumps(value)}'
+            yield "}\n"
+        finally:
+            finish()
+
+    return _chunked(parts())
+
+
+def stream_json_array(app: Flask, items: Iterable[Any]) -> Iterator[bytes]:
+    """Encode items as one JSON array, a chunk at a time."""
+    dumps, finish = _stream_dumps(app)
+
+    def parts():
+        try:
+            yield "["
+            for index, item in enumerate(items):
+                yield f'{"," if index else ""}{dumps(item)}'
+            yield "]\n"
+        finally:
+            finish()
+
+    return _chunked(parts())
@@ -0,0 +1,375 @@
+import bisect
+import fcntl
+import glob
+import json
+import logging
+import math
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from music_collection.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# Shared by every process of a server when set: each writes its values here
+# and /metrics merges them, see MetricsRegistry.write_snapshot
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 10))
+
+# Snapshot in METRICS_DIR holding the counters of processes that have exited
+AGGREGATE_SNAPSHOT = "aggregate.json"
+
+# Seconds; covers a cached lookup (~1ms) up to an upstream call hitting its read timeout
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+
+
+class _Metric:
+    """Base for metrics: a name, help text and values keyed by label values."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Labels, Any] = {}
+
+    def reset_after_fork(self) -> None:
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable copy of the metric, as merged and rendered by the registry."""
+        with self._lock:
+            values = [[list(labels), _copy(value)] for labels, value in self._values.items()]
+        return {"type": self.type, "help": self.documentation, "labelnames": list(self.labelnames),
+                "values": values}
+
+
+def _copy(value: Any) -> Any:
+    return list(value) if isinstance(value, list) else value
+
+
+class Counter(_Metric):
+    """A value that only goes up, e.g. requests served."""
+
+    type = "counter"
+
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, e.g. requests in flight."""
+
+    type = "gauge"
+
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, labels: Labels = (), amount: float = 1.0) -> None:
+        self.inc(labels, -amount)
+
+    def set(self, value: float, labels: Labels = ()) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    """
+    Observations counted into fixed buckets, with their sum and count.
+
+    Each label set holds one count per bucket (plus +Inf) and the sum, so an
+    observation is a bisect and two additions under the lock.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                counts = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = super().snapshot()
+        snapshot["buckets"] = list(self.buckets)
+        return snapshot
+
+
+class CallbackMetric(_Metric):
+    """
+    A counter or gauge read from existing state when collected, e.g. the hit
+    counters a cache already keeps, so the hot path pays nothing extra.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], type: str,
+                 callback: Callable[[], Dict[Labels, float]]):
+        super().__init__(name, documentation, labelnames)
+        self.type = type
+        self.callback = callback
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._values = dict(self.callback())
+        return super().snapshot()
+
+
+class MetricsRegistry:
+    """
+    The metrics of one process, rendered in the Prometheus text format.
+
+    With several server worker processes each one writes a snapshot of its
+    values to a shared directory, and whichever worker serves /metrics merges
+    all of them: counters, histograms and gauges are summed. When a worker
+    exits, its counters and histograms are folded into an aggregate snapshot
+    (see fold_snapshot), so totals never go backwards and the directory does
+    not grow with recycled workers. Derived gauges such as hit ratios are
+    computed after merging.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._derived: List[Tuple[str, str, Sequence[str], Callable[[Dict[str, Any]], Dict[Labels, float]]]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, labelnames: Sequence[str], type: str,
+                 callback: Callable[[], Dict[Labels, float]]) -> CallbackMetric:
+        return self._register(CallbackMetric(name, documentation, labelnames, type, callback))
+
+    def derived(self, name: str, documentation: str, labelnames: Sequence[str],
+                compute: Callable[[Dict[str, Any]], Dict[Labels, float]]) -> None:
+        """Add a gauge computed from the merged snapshot (metric name -> {labels: value})."""
+        self._derived.append((name, documentation, labelnames, compute))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Current values of every metric in this process."""
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def reset_after_fork(self) -> None:
+        """
+        Give a forked worker fresh locks, no flusher thread and zeroed values,
+        so what the master recorded before forking (migrations, cache warm-up)
+        is not counted again by every worker. Callback metrics are re-read from
+        their source when collected.
+        """
+        for metric in self._metrics.values():
+            metric.reset_after_fork()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def write_snapshot(self, directory: str) -> None:
+        """Write this process's values to <directory>/<pid>.json, replacing the previous ones."""
+        _write_json(os.path.join(directory, f"{os.getpid()}.json"), self.snapshot())
+
+    def start_flushing(self, directory: str, interval: float = 10.0) -> None:
+        """Write a snapshot to `directory` every `interval` seconds on a background thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.write_snapshot(directory)
+                except OSError as e:
+                    logger.error("Failed to write metrics snapshot: %s", e)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name='metrics-flush', daemon=True)
+        self._thread.start()
+
+    def stop_flushing(self, directory: str) -> None:
+        """Stop the flusher and write a final snapshot."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.write_snapshot(directory)
+
+    def render(self, directory: Optional[str] = None) -> str:
+        """
+        Render the metrics in the Prometheus text exposition format.
+
+        Args:
+            directory (str, optional): Shared snapshot directory. When given,
+                this process's snapshot is written first and every process's
+                snapshot in it is merged.
+
+        Returns:
+            str: The exposition text.
+        """
+        if directory is None:
+            merged = self.snapshot()
+        else:
+            self.write_snapshot(directory)
+            merged = merge_snapshots(read_snapshots(directory))
+
+        values = {name: {tuple(labels): value for labels, value in metric["values"]}
+                  for name, metric in merged.items()}
+        for name, documentation, labelnames, compute in self._derived:
+            merged[name] = {"type": "gauge", "help": documentation, "labelnames": list(labelnames),
+                            "values": [[list(labels), value] for labels, value in compute(values).items()]}
+
+        lines = []
+        for name, metric in merged.items():
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            labelnames = metric["labelnames"]
+            for labels, value in metric["values"]:
+                if metric["type"] != "histogram":
+                    lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric["buckets"] + [math.inf], value[:-1]):
+                    cumulative += count
+                    le = _format_labels(labelnames + ["le"], labels + [_format_value(bound)])
+                    lines.append(f"{name}_bucket{le} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{_format_labels(labelnames, labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric: _Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+
+def read_snapshots(directory: str) -> List[Dict[str, Dict[str, Any]]]:
+    """Load every process snapshot in `directory` and the aggregate, skipping unreadable ones."""
+    snapshots = []
+    with _directory_lock(directory, fcntl.LOCK_SH):
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            snapshot = _read_json(path)
+            if snapshot is not None:
+                snapshots.append(snapshot)
+    return snapshots
+
+
+def fold_snapshot(directory: str, pid: int) -> None:
+    """
+    Fold the snapshot of an exited process into the aggregate and remove it.
+
+    Counters and histograms are added to the aggregate so totals do not drop;
+    gauges are discarded, as they described a process that no longer exists.
+    Called by the server master once a worker is gone.
+    """
+    path = os.path.join(directory, f"{pid}.json")
+    aggregate_path = os.path.join(directory, AGGREGATE_SNAPSHOT)
+    try:
+        # Readers take the lock shared, so they see the counts before or after the fold, never twice
+        with _directory_lock(directory, fcntl.LOCK_EX):
+            snapshot = _read_json(path)
+            if snapshot is None:
+                return
+            kept = {name: metric for name, metric in snapshot.items() if metric["type"] != "gauge"}
+            _write_json(aggregate_path, merge_snapshots([_read_json(aggregate_path) or {}, kept]))
+            os.remove(path)
+    except OSError as e:
+        logger.error("Failed to fold metrics snapshot of process %d: %s", pid, e)
+
+
+def merge_snapshots(snapshots: Iterable[Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """Sum the values of several process snapshots, label set by label set."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    totals: Dict[str, Dict[Labels, Any]] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            if name not in merged:
+                merged[name] = {key: value for key, value in metric.items() if key != "values"}
+                totals[name] = {}
+            for labels, value in metric["values"]:
+                key = tuple(labels)
+                current = totals[name].get(key)
+                if current is None:
+                    totals[name][key] = _copy(value)
+                elif isinstance(value, list):
+                    totals[name][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    totals[name][key] = current + value
+    for name, metric in merged.items():
+        metric["values"] = [[list(labels), value] for labels, value in totals[name].items()]
+    return merged
+
+
+def clear_snapshots(directory: str) -> None:
+    """Remove snapshots left by a previous server run; called once before workers start."""
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        os.remove(path)
+
+
+@contextmanager
+def _directory_lock(directory: str, operation: int) -> Iterator[None]:
+    with open(os.path.join(directory, ".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, operation)
+        yield
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Skipping metrics snapshot %s: %s", path, e)
+        return None
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+
+def _format_labels(labelnames: Sequence[str], labels: Sequence[str]) -> str:
+    if not labelnames:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(labelnames, labels))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# Shared by every module in the process
+registry = MetricsRegistry()
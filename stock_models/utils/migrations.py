@@ -0,0 +1,110 @@
+import logging
+import os
+import re
+import sqlite3
+from typing import List, Sequence, Tuple
+
+from music_collection.utils.logger import configure_logger
+from music_collection.utils.sql_utils import get_db_connection
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# Numbered migration scripts, e.g. sql/migrations/0002_hot_path_indexes.sql
+MIGRATIONS_PATH = os.getenv(
+    "SQL_MIGRATIONS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "sql", "migrations")
+)
+
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+# EXPLAIN QUERY PLAN rows that read a whole table or index
+TABLE_SCAN = re.compile(r"^SCAN (?!\(subquery|CONSTANT ROW)")
+
+
+def list_migrations() -> List[Tuple[int, str, str]]:
+    """List the migration scripts in version order.
+
+    Returns:
+        List of (version, name, path) tuples.
+
+    Raises:
+        ValueError: If two scripts share a version number.
+    """
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_PATH):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_PATH, filename)))
+    migrations.sort()
+
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {MIGRATIONS_PATH}")
+    return migrations
+
+def run_migrations() -> List[int]:
+    """Apply every migration that has not been recorded in schema_migrations.
+
+    Each script runs in its own transaction together with its bookkeeping row,
+    so a failed migration leaves the database at the previous version. Scripts
+    must be idempotent (CREATE ... IF NOT EXISTS and the like), since two
+    processes starting at once may both apply the same one.
+
+    Returns:
+        List of the versions applied by this call.
+
+    Raises:
+        sqlite3.Error: If a migration fails.
+    """
+    applied = []
+    with get_db_connection() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.commit()
+        done = {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+
+        for version, name, path in list_migrations():
+            if version in done:
+                continue
+            with open(path) as f:
+                script = f.read()
+
+            logger.info("Applying migration %04d_%s", version, name)
+            try:
+                conn.executescript(
+                    "BEGIN IMMEDIATE;\n"
+                    f"{script}\n;\n"
+                    f"INSERT OR IGNORE INTO schema_migrations (version, name) VALUES ({version}, '{name}');\n"
+                    "COMMIT;"
+                )
+            except sqlite3.Error as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                logger.error("Migration %04d_%s failed: %s", version, name, e)
+                raise
+            applied.append(version)
+
+    return applied
+
+def find_table_scans(query: str, params: Sequence = ()) -> List[str]:
+    """Explain a query and report any full table or index scans in its plan.
+
+    Args:
+        query (str): The SQL to explain.
+        params (Sequence): Parameters to bind when explaining.
+
+    Returns:
+        List of plan details that scan a table or index (empty if the query only
+        searches). Scans of subquery results are not counted.
+    """
+    with get_db_connection() as conn:
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    return [detail for _, _, _, detail in plan if TABLE_SCAN.match(detail)]
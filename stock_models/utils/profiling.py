@@ -0,0 +1,366 @@
+import contextvars
+import cProfile
+import glob
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import secrets
+import threading
+import time
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from music_collection.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# Profiling is only possible when a token is configured; requests carrying it
+# in the X-Profile-Token header are profiled, and it guards the admin routes
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+# Share of all requests profiled without the header; changeable at runtime
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+# Shared by the server's worker processes, so any of them can serve a dump
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/stock-trading-profiles")
+# Newest dumps kept; older ones are deleted as new ones are written
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 100))
+# Functions listed in a profile's summary
+PROFILE_TOP_FUNCTIONS = 30
+
+# How often a worker re-reads a sample rate set through the admin route
+SAMPLE_RATE_CHECK_INTERVAL = 5.0
+
+PHASES = ("upstream", "db", "serialize")
+
+_current: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar("profile", default=None)
+
+
+class RequestProfile:
+    """
+    Timings and a cProfile capture for one request.
+
+    Time the request thread spends in upstream calls, SQL statements and JSON
+    encoding is added to `phases`; whatever is left of the wall time is
+    compute. Work done for the request on pool threads (which receive the
+    profile through their copied context) is added to `parallel` instead, as
+    it overlaps the request thread's own time.
+    """
+
+    def __init__(self, method: str, path: str):
+        self.id = f"{time.strftime('%Y%m%dT%H%M%S')}-{secrets.token_hex(4)}"
+        self.method = method
+        self.path = path
+        self.thread_id = threading.get_ident()
+        self.phases = {phase: 0.0 for phase in PHASES}
+        self.parallel = {phase: 0.0 for phase in PHASES}
+        self.calls = {phase: 0 for phase in PHASES}
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+
+    def add(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            if threading.get_ident() == self.thread_id:
+                self.phases[phase] += seconds
+            else:
+                self.parallel[phase] += seconds
+            self.calls[phase] += 1
+
+    def finish(self, status: int) -> Dict[str, Any]:
+        """
+        Stop profiling and build the summary.
+
+        Returns:
+            Dict with the request, wall time, per-phase milliseconds and the
+            functions with the most cumulative time.
+        """
+        self._profiler.disable()
+        wall = time.perf_counter() - self._start
+        with self._lock:
+            phases = dict(self.phases)
+            parallel = dict(self.parallel)
+            calls = dict(self.calls)
+        phases["compute"] = max(0.0, wall - sum(phases.values()))
+
+        stats = pstats.Stats(self._profiler)
+        functions = []
+        for (filename, line, name), (_, calls_made, own, cumulative, _) in stats.stats.items():
+            functions.append({
+                "function": f"{filename}:{line}({name})",
+                "calls": calls_made,
+                "own_ms": own * 1000,
+                "cumulative_ms": cumulative * 1000
+            })
+        functions.sort(key=lambda function: function["cumulative_ms"], reverse=True)
+
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "wall_ms": wall * 1000,
+            "phases_ms": {phase: seconds * 1000 for phase, seconds in phases.items()},
+            "parallel_ms": {phase: seconds * 1000 for phase, seconds in parallel.items()},
+            "phase_calls": calls,
+            "top_functions": functions[:PROFILE_TOP_FUNCTIONS]
+        }
+
+    def dump_stats(self, path: str) -> None:
+        """Write the raw capture in pstats format (for snakeviz, pstats, gprof2dot...)."""
+        self._profiler.dump_stats(path)
+
+
+def current() -> Optional[RequestProfile]:
+    """The profile of the current request, or None when it is not profiled."""
+    return _current.get()
+
+
+def record(phase: str, seconds: float) -> None:
+    """Add time to a phase of the current request's profile; a no-op when none is active."""
+    profile = _current.get()
+    if profile is not None:
+        profile.add(phase, seconds)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time a block as one phase of the current request's profile, if any."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - start)
+
+
+def submit(executor: Executor, fn: Callable, *args: Any) -> Future:
+    """
+    Submit work done on behalf of the current request to a thread pool.
+
+    Pool threads do not inherit context variables, so while a profile is
+    active the call runs in a copy of the caller's context and its phases are
+    attributed to the request.
+    """
+    if _current.get() is None:
+        return executor.submit(fn, *args)
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+class Profiler:
+    """
+    Decides which requests to profile and keeps their dumps.
+
+    A request is profiled when it carries the configured token or is picked
+    by the sample rate, one request at a time per process. Everything here is
+    skipped unless a token is configured, and with no header and a zero
+    sample rate a request costs one dictionary lookup and a comparison.
+    """
+
+    def __init__(self, token: Optional[str] = PROFILE_TOKEN, sample_rate: float = PROFILE_SAMPLE_RATE,
+                 directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        self.token = token
+        self.default_sample_rate = sample_rate
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.keep = keep
+        self._busy = threading.Lock()
+        self._sample_rate_checked = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token)
+
+    def check_token(self, token: Optional[str]) -> bool:
+        return self.enabled and token is not None and secrets.compare_digest(token, self.token)
+
+    def start(self, method: str, path: str, token: Optional[str]) -> Optional[contextvars.Token]:
+        """
+        Start profiling the current request if it asked for it or was sampled.
+
+        Returns:
+            A token for finish(), or None if the request is not profiled.
+        """
+        if not self.enabled:
+            return None
+        if token is None and not self._sampled():
+            return None
+        if token is not None and not self.check_token(token):
+            return None
+        # cProfile captures are expensive and, on Python 3.12+, exclusive
+        if not self._busy.acquire(blocking=False):
+            return None
+        try:
+            return _current.set(RequestProfile(method, path))
+        except BaseException:
+            self._busy.release()
+            raise
+
+    def finish(self, context_token: contextvars.Token, status: int) -> Optional[str]:
+        """
+        Stop the current request's profile and write its dumps.
+
+        Returns:
+            str: The profile id, or None if it could not be saved.
+        """
+        profile = _current.get()
+        _current.reset(context_token)
+        try:
+            summary = profile.finish(status)
+            os.makedirs(self.directory, exist_ok=True)
+            profile.dump_stats(os.path.join(self.directory, f"{profile.id}.prof"))
+            with open(os.path.join(self.directory, f"{profile.id}.json"), "w") as f:
+                json.dump(summary, f)
+            self._prune()
+            logger.info("Profiled %s %s in %.1fms as %s", profile.method, profile.path,
+                        summary["wall_ms"], profile.id)
+            return profile.id
+        except OSError as e:
+            logger.error("Failed to save profile %s: %s", profile.id, e)
+            return None
+        finally:
+            self._busy.release()
+
+    def finish_response(self, context_token: contextvars.Token, response: Any) -> None:
+        """
+        Finish the current request's profile once `response` is complete and
+        point the client at it with an X-Profile-Id header.
+
+        A streamed body is produced (and compressed) as the server sends it,
+        so its profile is finished when the response closes. Event streams
+        stay open for as long as the client listens, and would hold the
+        profiler for that long; their profile ends here and covers only
+        setting the stream up.
+
+        Args:
+            context_token: The token returned by start().
+            response: The Flask/Werkzeug response about to be sent.
+        """
+        if response.is_streamed and response.mimetype != "text/event-stream":
+            response.headers["X-Profile-Id"] = _current.get().id
+            response.call_on_close(lambda: self.finish(context_token, response.status_code))
+            return
+        profile_id = self.finish(context_token, response.status_code)
+        if profile_id is not None:
+            response.headers["X-Profile-Id"] = profile_id
+
+    def set_sample_rate(self, sample_rate: float, duration: float) -> None:
+        """
+        Profile a share of all requests for `duration` seconds, in every worker
+        process sharing the profile directory, then go back to the configured rate.
+
+        Raises:
+            ValueError: If sample_rate is not between 0 and 1 or duration is not positive.
+        """
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+        if duration <= 0:
+            raise ValueError("duration must be positive")
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, "sample_rate")
+        with open(path + ".tmp", "w") as f:
+            json.dump({"sample_rate": sample_rate, "until": time.time() + duration}, f)
+        os.replace(path + ".tmp", path)
+        self.sample_rate = sample_rate
+        self._sample_rate_checked = time.monotonic()
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Summaries of the stored profiles, newest first, without their function lists."""
+        profiles = []
+        for path in self._summary_paths():
+            summary = self._read_summary(path)
+            if summary is not None:
+                summary.pop("top_functions", None)
+                profiles.append(summary)
+        return profiles
+
+    def get_profile(self, profile_id: str) -> Dict[str, Any]:
+        """
+        Load a stored profile's summary.
+
+        Raises:
+            ValueError: If there is no such profile.
+        """
+        summary = self._read_summary(self._path(profile_id, ".json"))
+        if summary is None:
+            raise ValueError(f"Profile {profile_id} not found")
+        return summary
+
+    def stats_path(self, profile_id: str) -> str:
+        """
+        Path of a stored profile's pstats dump.
+
+        Raises:
+            ValueError: If the id is malformed.
+        """
+        return self._path(profile_id, ".prof")
+
+    def format_stats(self, profile_id: str, sort: str = "cumulative", limit: int = 50) -> str:
+        """
+        Render a stored capture as pstats text.
+
+        Raises:
+            ValueError: If there is no such profile or the sort key is unknown.
+        """
+        path = self.stats_path(profile_id)
+        if not os.path.exists(path):
+            raise ValueError(f"Profile {profile_id} not found")
+        if sort not in pstats.Stats.sort_arg_dict_default:
+            raise ValueError(f"Unknown sort key {sort}")
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def reset_after_fork(self) -> None:
+        self._busy = threading.Lock()
+
+    def _sampled(self) -> bool:
+        now = time.monotonic()
+        if now - self._sample_rate_checked >= SAMPLE_RATE_CHECK_INTERVAL:
+            self._sample_rate_checked = now
+            self._load_sample_rate()
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _load_sample_rate(self) -> None:
+        try:
+            with open(os.path.join(self.directory, "sample_rate")) as f:
+                setting = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.sample_rate = setting["sample_rate"] if setting["until"] > time.time() else self.default_sample_rate
+
+    def _path(self, profile_id: str, suffix: str) -> str:
+        # Ids are generated as "<timestamp>-<hex>"; anything else could escape the directory
+        if not profile_id.replace("-", "").isalnum():
+            raise ValueError(f"Profile {profile_id} not found")
+        return os.path.join(self.directory, profile_id + suffix)
+
+    def _summary_paths(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, "*.json")), reverse=True)
+
+    def _read_summary(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _prune(self) -> None:
+        for path in self._summary_paths()[self.keep:]:
+            for stale in (path, path[:-len(".json")] + ".prof"):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
@@ -0,0 +1,224 @@
+import fcntl
+import heapq
+import itertools
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from music_collection.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# Priority classes, most important first
+TRADE = 0
+VALUATION = 1
+BROWSE = 2
+# Work nobody is waiting for, such as the price refresher
+BACKGROUND = 3
+
+PRIORITY_NAMES = {TRADE: "trade", VALUATION: "valuation", BROWSE: "browse", BACKGROUND: "background"}
+
+
+class QuotaExhaustedError(RuntimeError):
+    """Raised when an upstream call cannot get quota before its deadline."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    A bucket of `capacity` calls refilled continuously over `period` seconds.
+
+    Not thread-safe on its own; QuotaScheduler serializes access.
+    """
+
+    def __init__(self, name: str, capacity: float, period: float):
+        self.name = name
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def tokens(self, now: float) -> float:
+        """Tokens available at `now` (a time.monotonic() value)."""
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return self._tokens
+
+    def wait_time(self, now: float, floor: float) -> float:
+        """Seconds until the bucket holds at least 1 + floor tokens."""
+        needed = 1 + floor - self.tokens(now)
+        return max(0.0, needed / self.rate)
+
+    def take(self) -> None:
+        self._tokens -= 1
+
+
+class QuotaScheduler:
+    """
+    Hands out upstream call quota by priority.
+
+    Each call takes one token from every bucket (e.g. per minute and per day).
+    Lower priority classes may not spend the last `reserve` share of a bucket,
+    so browsing cannot use up the calls a trade needs. Callers that have to
+    wait queue in priority order until their deadline; a caller whose deadline
+    cannot be met fails straight away with QuotaExhaustedError.
+
+    The buckets live in this process unless share() keeps them in a file, so
+    that several processes spend from one budget.
+    """
+
+    def __init__(self, per_minute: float = 5, per_day: float = 25,
+                 reserve: Optional[Dict[int, float]] = None,
+                 deadlines: Optional[Dict[int, float]] = None):
+        self.buckets: List[TokenBucket] = []
+        if per_minute > 0:
+            self.buckets.append(TokenBucket("minute", per_minute, 60.0))
+        if per_day > 0:
+            self.buckets.append(TokenBucket("day", per_day, 86400.0))
+
+        # Share of each bucket a class must leave for the classes above it
+        self.reserve = reserve or {TRADE: 0.0, VALUATION: 0.1, BROWSE: 0.3, BACKGROUND: 0.5}
+        # Default seconds a class may wait for quota
+        self.deadlines = deadlines or {TRADE: 10.0, VALUATION: 5.0, BROWSE: 2.0, BACKGROUND: 0.0}
+
+        self._state_path: Optional[str] = None
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._stats = {priority: {"granted": 0, "rejected": 0, "wait_ms": 0.0}
+                       for priority in PRIORITY_NAMES}
+
+    def acquire(self, priority: int = BROWSE, timeout: Optional[float] = None) -> None:
+        """
+        Take quota for one upstream call, waiting up to the deadline.
+
+        Args:
+            priority (int): TRADE, VALUATION or BROWSE.
+            timeout (float, optional): Seconds to wait. Defaults to the class deadline.
+
+        Raises:
+            QuotaExhaustedError: If quota will not be available before the deadline.
+        """
+        if not self.buckets:
+            return
+
+        start = time.monotonic()
+        deadline = start + (self.deadlines[priority] if timeout is None else timeout)
+        entry = (priority, next(self._sequence))
+
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    with self._synced():
+                        now = time.monotonic()
+                        wait = self._wait_time(priority, now)
+                        if self._waiters[0] == entry and wait == 0:
+                            for bucket in self.buckets:
+                                bucket.take()
+                            self._record(priority, "granted", (now - start) * 1000)
+                            return
+
+                    # Even if nothing were queued ahead, quota would come too late
+                    if now + wait > deadline:
+                        self._record(priority, "rejected", (now - start) * 1000)
+                        logger.warning("Upstream quota exhausted for %s call, next slot in %.1fs",
+                                       PRIORITY_NAMES[priority], wait)
+                        raise QuotaExhaustedError(
+                            "Market data quota exhausted, please retry later",
+                            retry_after=math.ceil(wait) if wait else 1
+                        )
+                    self._cond.wait(timeout=min(deadline - now, wait) if wait else deadline - now)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def share(self, path: str) -> None:
+        """
+        Keep the bucket levels in `path`, so every process sharing the file
+        (e.g. all gunicorn workers) spends from the same budget.
+
+        Priority order and waiting still only apply within a process; across
+        processes, quota goes to whichever caller finds it first.
+        """
+        with self._cond:
+            self._state_path = path
+
+    def reset_after_fork(self) -> None:
+        """Replace the condition and forget waiters inherited from the parent."""
+        self._cond = threading.Condition()
+        self._waiters = []
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the remaining budget and per-class outcomes.
+
+        Returns:
+            Dict with each bucket's remaining tokens and capacity, the number of
+            queued callers, and granted/rejected counts and average wait per class.
+        """
+        with self._cond, self._synced():
+            now = time.monotonic()
+            return {
+                "buckets": {bucket.name: {"remaining": bucket.tokens(now), "capacity": bucket.capacity}
+                            for bucket in self.buckets},
+                "waiting": len(self._waiters),
+                "classes": {
+                    PRIORITY_NAMES[priority]: {
+                        "granted": stats["granted"],
+                        "rejected": stats["rejected"],
+                        "avg_wait_ms": stats["wait_ms"] / stats["granted"] if stats["granted"] else None
+                    }
+                    for priority, stats in self._stats.items()
+                }
+            }
+
+    @contextmanager
+    def _synced(self) -> Iterator[None]:
+        """Load the shared bucket levels, and store them back afterwards, under a file lock."""
+        if self._state_path is None:
+            yield
+            return
+        with open(self._state_path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            try:
+                state = json.loads(f.read() or "{}")
+            except ValueError as e:
+                logger.warning("Ignoring unreadable quota state %s: %s", self._state_path, e)
+                state = {}
+            # Levels are stored with wall-clock times, which every process agrees on
+            now, wall = time.monotonic(), time.time()
+            for bucket in self.buckets:
+                if bucket.name in state:
+                    tokens, updated = state[bucket.name]
+                    bucket._tokens = min(bucket.capacity, tokens)
+                    bucket._updated = now - max(0.0, wall - updated)
+            try:
+                yield
+            finally:
+                now, wall = time.monotonic(), time.time()
+                state = {bucket.name: [bucket.tokens(now), wall] for bucket in self.buckets}
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+
+    def _wait_time(self, priority: int, now: float) -> float:
+        return max(bucket.wait_time(now, self.reserve[priority] * bucket.capacity) for bucket in self.buckets)
+
+    def _record(self, priority: int, outcome: str, wait_ms: float) -> None:
+        self._stats[priority][outcome] += 1
+        if outcome == "granted":
+            self._stats[priority]["wait_ms"] += wait_ms
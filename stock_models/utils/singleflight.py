@@ -0,0 +1,91 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from music_collection.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+class _Call:
+    """An in-flight call that followers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into a single execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running block until it finishes and receive the same result or exception.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._executions = 0
+        self._coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) unless a call for the same key is already in flight.
+
+        Args:
+            key (Hashable): Identifies calls that may share a result.
+            fn (Callable): The function to run.
+
+        Returns:
+            The return value of the (possibly shared) call.
+
+        Raises:
+            Exception: Whatever the shared call raised.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._executions += 1
+                leader = True
+
+        if not leader:
+            logger.debug("Waiting on in-flight call for %s", key)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Snapshot of the coalescing counters.
+
+        Returns:
+            Dict with executions (upstream calls made), coalesced (calls that shared
+            another caller's result) and in_flight.
+        """
+        with self._lock:
+            return {
+                "executions": self._executions,
+                "coalesced": self._coalesced,
+                "in_flight": len(self._calls)
+            }
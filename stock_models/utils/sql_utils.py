@@ -2,8 +2,12 @@ from contextlib import contextmanager
 import logging
 import os
 import sqlite3
+import threading
+import time
 
 from music_collection.utils.logger import configure_logger
+from music_collection.utils.metrics import registry
+from music_collection.utils.profiling import record as record_phase
 
 
 logger = logging.getLogger(__name__)
@@ -13,6 +17,22 @@ configure_logger(logger)
 # load the db path from the environment with a default value
 DB_PATH = os.getenv("DB_PATH", "/app/db/stocks.db")
 
+# Connection tuning, see _open_connection
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", 5000))
+CACHE_SIZE_KIB = int(os.getenv("DB_CACHE_SIZE_KIB", 16384))
+STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 256))
+
+DB_QUERY_SECONDS = registry.histogram(
+    "db_query_duration_seconds", "Time spent executing SQLite statements", ["statement"]
+)
+# Distinct statement labels kept; anything beyond is reported as "other"
+MAX_STATEMENT_LABELS = 256
+_statement_labels = {}
+
+# Each thread keeps one open connection per database path
+_local = threading.local()
+_owner_pid = os.getpid()
+
 
 def check_database_connection():
     """Check the database connection
@@ -21,11 +41,10 @@ def check_database_connection():
         Exception: If the database connection is not OK
     """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        # This ensures the connection is actually active
-        cursor.execute("SELECT 1;")
-        conn.close()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            # This ensures the connection is actually active
+            cursor.execute("SELECT 1;")
     except sqlite3.Error as e:
         error_message = f"Database connection error: {DB_PATH}"
         logger.error(error_message)
@@ -41,10 +60,9 @@ def check_table_exists(tablename: str):
         Exception: If the table does not exist
     """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute(f"SELECT 1 FROM {tablename} LIMIT 1;")
-        conn.close()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT 1 FROM {tablename} LIMIT 1;")
     except sqlite3.Error as e:
         error_message = f"Table check error: {e}"
         logger.error(error_message)
@@ -53,19 +71,119 @@ def check_table_exists(tablename: str):
 @contextmanager
 def get_db_connection():
     """
-    Context manager for SQLite database connection.
+    Context manager for the calling thread's SQLite connection.
+
+    The connection is opened on first use and reused by every later call on the
+    same thread. Anything the caller did not commit is rolled back on exit, so
+    each block behaves as if it had its own connection.
 
     Yields:
         sqlite3.Connection: The SQLite connection object.
     """
-    conn = None
+    conn = _get_thread_connection(DB_PATH)
     try:
-        conn = sqlite3.connect(DB_PATH)
         yield conn
     except sqlite3.Error as e:
         logger.error("Database connection error: %s", str(e))
         raise e
     finally:
-        if conn:
-            conn.close()
-            logger.info("Database connection closed.")
+        if conn.in_transaction:
+            conn.rollback()
+
+def close_db_connections():
+    """Close every connection held by the calling thread."""
+    connections = getattr(_local, "connections", {})
+    while connections:
+        _, conn = connections.popitem()
+        conn.close()
+    logger.debug("Database connections closed.")
+
+def reset_db_connections_after_fork():
+    """
+    Forget connections inherited from a parent process.
+
+    SQLite connections must not be used across fork(), so a forked worker
+    starts with an empty set and opens its own on first use. The inherited
+    handles are deliberately not closed, since that could disturb the parent.
+    """
+    global _local, _owner_pid
+    _local = threading.local()
+    _owner_pid = os.getpid()
+
+def _get_thread_connection(db_path: str) -> sqlite3.Connection:
+    if os.getpid() != _owner_pid:
+        reset_db_connections_after_fork()
+
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = connections[db_path] = _open_connection(db_path)
+    return conn
+
+def _statement_label(sql: str) -> str:
+    """The statement with whitespace collapsed, cut to a readable length."""
+    label = _statement_labels.get(sql)
+    if label is None:
+        if len(_statement_labels) >= MAX_STATEMENT_LABELS:
+            return "other"
+        label = _statement_labels[sql] = " ".join(sql.split())[:120]
+    return label
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that records how long each execute takes, by statement and in the request's profile."""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            elapsed = time.perf_counter() - start
+            DB_QUERY_SECONDS.observe(elapsed, (_statement_label(sql),))
+            record_phase("db", elapsed)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            elapsed = time.perf_counter() - start
+            DB_QUERY_SECONDS.observe(elapsed, (_statement_label(sql),))
+            record_phase("db", elapsed)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors, including those behind conn.execute, are instrumented."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _open_connection(db_path: str) -> sqlite3.Connection:
+    """
+    Open a connection tuned for many concurrent readers and a single writer.
+
+    WAL lets readers proceed while a write is in progress, synchronous=NORMAL
+    skips the fsync on every commit (still durable at checkpoints in WAL mode),
+    and busy_timeout makes writers wait for the lock instead of failing.
+    Statements are timed through InstrumentedConnection.
+    """
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000,
+                           cached_statements=STATEMENT_CACHE_SIZE, factory=InstrumentedConnection)
+    if db_path != ":memory:":
+        conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    logger.debug("Database connection opened: %s", db_path)
+    return conn
@@ -0,0 +1,155 @@
+import pytest
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from music_collection.utils.cache import TTLCache, FRESH, STALE
+from music_collection.models.stock_model import StockModel
+from music_collection.utils.migrations import run_migrations
+from music_collection.utils.sql_utils import close_db_connections
+
+@pytest.fixture
+def mock_stock_info():
+    """Mock stock information response"""
+    return {
+        "symbol": "AAPL",
+        "price": 150.00,
+        "volume": 1000000,
+        "change": 2.50,
+        "change_percent": "1.5%"
+    }
+
+def test_cache_hit_and_miss():
+    """Test that stored entries are returned fresh and unknown keys miss"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("AAPL", 1)
+
+    assert cache.get("AAPL") == (1, FRESH)
+    assert cache.get("MSFT") == (None, None)
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+def test_cache_evicts_least_recently_used():
+    """Test that the least recently used entry is evicted when full"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("AAPL", 1)
+    cache.set("MSFT", 2)
+    cache.get("AAPL")
+    cache.set("GOOGL", 3)
+
+    assert cache.get("MSFT") == (None, None)
+    assert cache.get("AAPL") == (1, FRESH)
+    assert cache.stats()["evictions"] == 1
+
+def test_cache_stale_then_expired():
+    """Test that entries go stale after the TTL and expire after the stale window"""
+    cache = TTLCache(maxsize=2, ttl=10, stale_ttl=10)
+    with patch("music_collection.utils.cache.time.monotonic", return_value=100.0):
+        cache.set("AAPL", 1)
+    with patch("music_collection.utils.cache.time.monotonic", return_value=115.0):
+        assert cache.get("AAPL") == (1, STALE)
+    with patch("music_collection.utils.cache.time.monotonic", return_value=125.0):
+        assert cache.get("AAPL") == (None, None)
+    assert cache.stats()["expirations"] == 1
+
+def test_get_stock_info_uses_cache(mock_stock_info):
+    """Test that repeated quote lookups only go upstream once"""
+    model = StockModel()
+    with patch.object(model, '_fetch_stock_info', return_value=mock_stock_info) as fetch:
+        first = model.get_stock_info("AAPL")
+        second = model.get_stock_info("aapl")
+
+    assert first == second == mock_stock_info
+    fetch.assert_called_once()
+    assert model.get_cache_stats()["hits"] == 1
+
+def test_concurrent_misses_share_one_upstream_call(mock_stock_info):
+    """Test that concurrent lookups of the same symbol are coalesced"""
+    model = StockModel()
+    release = threading.Event()
+    calls = []
+
+    def fetch(symbol, priority=None):
+        calls.append(symbol)
+        release.wait(timeout=5)
+        return mock_stock_info
+
+    with patch.object(model, '_fetch_stock_info', side_effect=fetch):
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            futures = [executor.submit(model.get_stock_info, "AAPL") for _ in range(5)]
+            while model.get_coalescing_stats()["coalesced"] < 4:
+                time.sleep(0.01)
+            release.set()
+            results = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert all(result == mock_stock_info for result in results)
+
+def test_reset_after_fork_keeps_cached_quotes(mock_stock_info):
+    """Test that a forked worker gets fresh pools and connections but keeps warm quotes"""
+    model = StockModel()
+    model.quote_cache.set("AAPL", mock_stock_info)
+    session, executor = model.client.session, model._refresh_executor
+
+    model.reset_after_fork()
+
+    assert model.client.session is not session
+    assert model._refresh_executor is not executor
+    with patch.object(model, '_fetch_stock_info') as fetch:
+        assert model.get_stock_info("AAPL") == mock_stock_info
+    fetch.assert_not_called()
+
+def test_cold_model_warms_from_persistent_store(tmp_path, monkeypatch, mock_stock_info):
+    """Test that a new process serves quotes stored by a previous one without going upstream"""
+    monkeypatch.setattr("music_collection.utils.sql_utils.DB_PATH", str(tmp_path / "stocks.db"))
+    run_migrations()
+    try:
+        with patch.object(StockModel, '_fetch_stock_info', return_value=mock_stock_info) as fetch:
+            StockModel().get_stock_info("AAPL")
+            StockModel().get_stock_info("AAPL")
+
+            model = StockModel()
+            assert model.warm_quote_cache() == 1
+            assert model.get_stock_info("AAPL") == mock_stock_info
+        fetch.assert_called_once()
+
+        # Entries past their TTL in the store are fetched again
+        model = StockModel()
+        model.quote_store.save_quote("MSFT", mock_stock_info, fetched_at=time.time() - 3600)
+        assert model.warm_quote_cache() == 1
+        with patch.object(model, '_fetch_stock_info', return_value=mock_stock_info) as fetch:
+            model.get_stock_info("MSFT")
+        fetch.assert_called_once()
+    finally:
+        close_db_connections()
+
+@pytest.mark.parametrize("refresh_first", [True, False])
+def test_refresh_concurrent_with_read(mock_stock_info, refresh_first):
+    """Test that a forced refresh and a read of the same symbol in flight together both succeed"""
+    model = StockModel()
+    release = threading.Event()
+    calls = []
+
+    def fetch(symbol, priority=None):
+        calls.append(symbol)
+        release.wait(timeout=5)
+        return mock_stock_info
+
+    with patch.object(model, '_fetch_stock_info', side_effect=fetch), \
+            patch.object(model.quote_store, 'get_quote', return_value=None), \
+            patch.object(model.quote_store, 'save_quote'):
+        calls_in_order = [model.refresh_quote, model.get_stock_info]
+        if not refresh_first:
+            calls_in_order.reverse()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(calls_in_order[0], "AAPL")
+            while not calls:
+                time.sleep(0.01)
+            second = executor.submit(calls_in_order[1], "AAPL")
+            time.sleep(0.05)
+            release.set()
+            results = [first.result(timeout=5), second.result(timeout=5)]
+
+    assert results == [mock_stock_info, mock_stock_info]
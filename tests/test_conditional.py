@@ -0,0 +1,84 @@
+import gzip
+import numpy as np
+import pytest
+import time
+from flask import Flask, Response
+from unittest.mock import patch
+from werkzeug.datastructures import Accept
+from music_collection.models.portfolio_model import PortfolioModel
+from music_collection.utils.compression import compress_response
+from music_collection.utils.json_provider import configure_json
+from music_collection.utils.migrations import run_migrations
+from music_collection.utils.sql_utils import close_db_connections
+
+@pytest.fixture
+def portfolio_model(tmp_path, monkeypatch):
+    """Create a portfolio model over a migrated test database"""
+    monkeypatch.setattr("music_collection.utils.sql_utils.DB_PATH", str(tmp_path / "stocks.db"))
+    run_migrations()
+    yield PortfolioModel()
+    close_db_connections()
+
+@pytest.fixture
+def mock_stock_info():
+    """Mock stock information response"""
+    return {"symbol": "AAPL", "price": 150.00, "volume": 1000000, "change": 2.50, "change_percent": "1.5%"}
+
+def test_portfolio_version_follows_lots_and_prices(portfolio_model, mock_stock_info):
+    """Test that the data version changes with trades and prices, and is unknown for stale prices"""
+    empty = portfolio_model.get_data_version()
+    with patch.object(portfolio_model.stock_model, 'get_stock_info', return_value=mock_stock_info):
+        portfolio_model.buy_stock("AAPL", 10)
+    assert portfolio_model.get_data_version() is None
+
+    portfolio_model.prices.save_prices({"AAPL": 150.0})
+    bought = portfolio_model.get_data_version()
+    assert bought not in (None, empty)
+    assert portfolio_model.get_data_version() == bought
+
+    with patch.object(portfolio_model.stock_model, 'get_stock_info', return_value=mock_stock_info):
+        portfolio_model.sell_stock("AAPL", 4)
+    assert portfolio_model.get_data_version() != bought
+
+    portfolio_model.prices.save_prices({"AAPL": 150.0}, time.time() - 3600)
+    assert portfolio_model.get_data_version() is None
+
+def test_history_version_is_last_bar_date_once_synced(portfolio_model):
+    """Test that the history version is only known while no sync is due"""
+    stock_model = portfolio_model.stock_model
+    assert stock_model.get_history_version("AAPL") is None
+    stock_model.history.save_bars("AAPL", {"2024-01-02": {"open": 1, "high": 2, "low": 0.5, "close": 1.5, "volume": 10}})
+    assert stock_model.get_history_version("aapl") == "2024-01-02"
+
+def test_compress_response_negotiates_encoding():
+    """Test that large JSON is gzipped when accepted, with the encoding added to its ETag"""
+    body = b'{"values": [' + b",".join(b"1.5" for _ in range(1000)) + b"]}"
+    response = Response(body, mimetype="application/json")
+    response.set_etag("abc")
+    compress_response(response, Accept([("gzip", 1), ("br", 0)]))
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.get_etag() == ("abc-gzip", False)
+    assert gzip.decompress(response.get_data()) == body
+
+    small = compress_response(Response(b"{}", mimetype="application/json"), Accept([("gzip", 1)]))
+    assert "Content-Encoding" not in small.headers
+    refused = compress_response(Response(body, mimetype="application/json"), Accept([("gzip", 0)]))
+    assert "Content-Encoding" not in refused.headers
+
+def test_compress_response_streams_json():
+    """Test that streamed JSON is gzipped chunk by chunk without a Content-Length"""
+    chunks = [b"[", b",".join(b"1.5" for _ in range(1000)), b"]"]
+    response = Response(iter(chunks), mimetype="application/json")
+    compress_response(response, Accept([("gzip", 1), ("br", 0)]))
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+    assert gzip.decompress(b"".join(response.response)) == b"".join(chunks)
+
+def test_json_provider_encodes_numpy():
+    """Test that the configured provider handles NumPy values and round-trips responses"""
+    app = Flask(__name__)
+    configure_json(app)
+    data = {"closes": np.array([1.5, 2.0]), "volume": np.int64(7), "symbol": "AAPL"}
+    with app.app_context():
+        response = app.json.response(data)
+    assert app.json.loads(response.get_data()) == {"closes": [1.5, 2.0], "volume": 7, "symbol": "AAPL"}
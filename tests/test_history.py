@@ -0,0 +1,83 @@
+import json
+import pytest
+from flask import Flask
+from unittest.mock import patch
+from music_collection.models.stock_model import StockModel
+from music_collection.utils import history_series
+from music_collection.utils.json_provider import configure_json, stream_json_object
+from music_collection.utils.migrations import run_migrations
+from music_collection.utils.sql_utils import close_db_connections
+
+@pytest.fixture
+def stock_model(tmp_path, monkeypatch):
+    """Create a stock model backed by an empty file database"""
+    monkeypatch.setattr("music_collection.utils.sql_utils.DB_PATH", str(tmp_path / "stocks.db"))
+    run_migrations()
+    yield StockModel()
+    close_db_connections()
+
+def make_bars(*dates):
+    """Build upstream-style parsed bars for the given dates"""
+    return {date: {"open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5, "volume": 100} for date in dates}
+
+def test_history_served_from_store_after_first_sync(stock_model):
+    """Test that a repeat history request does no upstream call"""
+    with patch.object(stock_model, '_fetch_historical_data',
+                      return_value=make_bars("2024-01-03", "2024-01-02")) as fetch:
+        first = stock_model.get_historical_data("AAPL")
+        second = stock_model.get_historical_data("AAPL")
+
+    fetch.assert_called_once()
+    assert list(first) == ["2024-01-03", "2024-01-02"]
+    assert first == second
+
+def test_history_sync_only_adds_newer_bars(stock_model):
+    """Test that a refresh stores only bars after the last stored date"""
+    stock_model.history.save_bars("AAPL", make_bars("2024-01-02"))
+    stock_model.history.refresh_interval = 0
+
+    newer = make_bars("2024-01-03", "2024-01-02")
+    newer["2024-01-02"]["close"] = 99.0
+    with patch.object(stock_model, '_fetch_historical_data', return_value=newer):
+        history = stock_model.get_historical_data("aapl")
+
+    assert list(history) == ["2024-01-03", "2024-01-02"]
+    assert history["2024-01-02"]["close"] == 1.5
+
+def test_history_falls_back_to_store_when_upstream_fails(stock_model):
+    """Test that stored bars are served if the upstream sync fails"""
+    stock_model.history.save_bars("AAPL", make_bars("2024-01-02"))
+    stock_model.history.refresh_interval = 0
+
+    with patch.object(stock_model, '_fetch_historical_data', side_effect=ValueError("upstream down")):
+        assert list(stock_model.get_historical_data("AAPL")) == ["2024-01-02"]
+        with pytest.raises(ValueError):
+            stock_model.get_historical_data("MSFT")
+
+def test_series_slice_and_field_selection(stock_model):
+    """Test that range, limit and field selection apply to the columnar series"""
+    stock_model.history.save_bars("AAPL", make_bars("2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"))
+
+    series = stock_model.get_history_series("AAPL")
+    assert series.last_date == "2024-01-05"
+
+    window = series.slice(start="2024-01-03", end="2024-01-05", limit=2).to_dict(["close", "volume"])
+    assert window == {
+        "2024-01-05": {"close": 1.5, "volume": 100},
+        "2024-01-04": {"close": 1.5, "volume": 100}
+    }
+    assert len(series.slice(start="2024-02-01")) == 0
+
+def test_streamed_history_matches_to_dict(stock_model, monkeypatch):
+    """Test that the streamed encoding parses to the same mapping across blocks and chunks"""
+    monkeypatch.setattr(history_series, "ITER_BLOCK_SIZE", 3)
+    monkeypatch.setattr("music_collection.utils.json_provider.STREAM_CHUNK_SIZE", 100)
+    stock_model.history.save_bars("AAPL", make_bars(*(f"2024-01-{day:02d}" for day in range(2, 12))))
+    series = stock_model.get_history_series("AAPL")
+
+    app = Flask(__name__)
+    configure_json(app)
+    chunks = list(stream_json_object(app, series.iter_items(["close", "volume"])))
+    assert len(chunks) > 1
+    assert json.loads(b"".join(chunks)) == series.to_dict(["close", "volume"])
+    assert list(series.to_dict()) == [f"2024-01-{day:02d}" for day in range(11, 1, -1)]
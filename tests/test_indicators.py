@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from unittest.mock import Mock
+from music_collection.utils import indicators
+from music_collection.utils.history_series import HistorySeries
+from music_collection.models.indicator_model import IndicatorModel
+
+def reference_ewm(values, alpha, initial=None):
+    """Straightforward loop implementation of the EWM recurrence"""
+    out = []
+    previous = initial
+    for value in values:
+        previous = value if previous is None else (1 - alpha) * previous + alpha * value
+        out.append(previous)
+    return np.array(out)
+
+def test_ewm_matches_recurrence_across_blocks():
+    """Test that the blockwise EWM matches the plain recurrence on a long series"""
+    values = np.random.default_rng(0).uniform(50, 150, 5000)
+    np.testing.assert_allclose(indicators.ewm(values, 0.5), reference_ewm(values, 0.5))
+    np.testing.assert_allclose(indicators.ewm(values, 0.1, initial=100.0),
+                               reference_ewm(values, 0.1, initial=100.0))
+
+def test_sma_and_drawdown():
+    """Test simple moving average and drawdown on a small series"""
+    close = np.array([10.0, 12.0, 9.0, 12.0, 15.0])
+    np.testing.assert_allclose(indicators.sma(close, 2), [np.nan, 11.0, 10.5, 10.5, 13.5])
+    np.testing.assert_allclose(indicators.drawdown(close), [0.0, 0.0, -0.25, 0.0, 0.0])
+
+def test_rsi_bounds():
+    """Test that RSI is 100 for a rising series and within [0, 100] otherwise"""
+    assert indicators.rsi(np.arange(1.0, 30.0), 14)[-1] == 100.0
+    values = indicators.rsi(np.random.default_rng(1).uniform(50, 150, 200), 14)
+    assert np.isnan(values[:14]).all()
+    assert ((values[14:] >= 0) & (values[14:] <= 100)).all()
+
+@pytest.fixture
+def series():
+    """Ten days of steadily rising closes"""
+    rows = [(f"2024-01-{day:02d}", 1.0, 1.0, 1.0, float(day), 100) for day in range(1, 11)]
+    return HistorySeries.from_rows(rows)
+
+@pytest.fixture
+def indicator_model(series):
+    """Indicator model over a stubbed stock model"""
+    stock_model = Mock()
+    stock_model.get_history_series.return_value = series
+    return IndicatorModel(stock_model)
+
+def test_parse_specs(indicator_model):
+    """Test indicator spec parsing with defaults and validation"""
+    assert indicator_model.parse_specs("sma:5, ema ,drawdown") == [("sma", 5), ("ema", 20), ("drawdown", None)]
+    with pytest.raises(ValueError):
+        indicator_model.parse_specs("macd")
+    with pytest.raises(ValueError):
+        indicator_model.parse_specs("sma:0")
+    with pytest.raises(ValueError, match="at least 2"):
+        indicator_model.parse_specs("volatility:1")
+    assert indicator_model.parse_specs("volatility:2") == [("volatility", 2)]
+
+def test_indicators_memoized_per_last_bar(indicator_model):
+    """Test that repeat requests reuse results until a new bar arrives"""
+    first = indicator_model.get_indicators("AAPL", [("sma", 3)], limit=2)
+    second = indicator_model.get_indicators("aapl", [("sma", 3)])
+
+    assert first["dates"] == ["2024-01-09", "2024-01-10"]
+    assert first["indicators"]["sma_3"] == [8.0, 9.0]
+    assert second["indicators"]["sma_3"][:2] == [None, None]
+    assert indicator_model.get_cache_stats()["hits"] == 1
+    assert indicator_model.get_cache_stats()["misses"] == 1
@@ -0,0 +1,96 @@
+import json
+from unittest.mock import MagicMock, patch
+import pytest
+from music_collection.utils.http_client import UPSTREAM_ERRORS, UpstreamClient
+from music_collection.utils.metrics import MetricsRegistry, fold_snapshot, merge_snapshots, read_snapshots
+from music_collection.utils.sql_utils import DB_QUERY_SECONDS, close_db_connections, get_db_connection
+
+def test_histogram_renders_cumulative_buckets():
+    """Test that observations land in cumulative buckets with sum and count"""
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency", ["route"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, ("/a",))
+
+    text = registry.render()
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="1"} 3' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{route="/a"} 4' in text
+    assert "# TYPE latency_seconds histogram" in text
+
+def test_snapshots_from_several_processes_are_summed(tmp_path):
+    """Test that worker snapshots merge into one set of totals and derived ratios"""
+    first, second = MetricsRegistry(), MetricsRegistry()
+    for registry, hits, misses in ((first, 3, 0), (second, 1, 4)):
+        lookups = registry.counter("lookups_total", "Lookups", ["result"])
+        lookups.inc(("hit",), hits)
+        if misses:
+            lookups.inc(("miss",), misses)
+        registry.histogram("latency_seconds", "Latency", buckets=(1.0,)).observe(0.5)
+
+    merged = {name: dict((tuple(labels), value) for labels, value in metric["values"])
+              for name, metric in merge_snapshots([first.snapshot(), second.snapshot()]).items()}
+    assert merged["lookups_total"] == {("hit",): 4, ("miss",): 4}
+    assert merged["latency_seconds"][()] == [2, 0, 1.0]
+
+    first.write_snapshot(str(tmp_path))
+    first.derived("hit_ratio", "Hit ratio", [], lambda values: {(): values["lookups_total"][("hit",)] / 4})
+    assert "hit_ratio 0.75" in first.render(str(tmp_path))
+
+def test_forked_worker_starts_from_zero():
+    """Test that values recorded before the fork are not repeated by every worker"""
+    registry = MetricsRegistry()
+    queries = registry.counter("queries_total", "Queries")
+    queries.inc(amount=5)
+
+    registry.reset_after_fork()
+    queries.inc()
+    assert registry.snapshot()["queries_total"]["values"] == [[[], 1.0]]
+
+def test_exited_workers_fold_into_aggregate(tmp_path):
+    """Test that an exited worker's counters stay in the totals while its gauges and file go away"""
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests").inc(amount=3)
+    registry.gauge("in_flight", "In flight").inc(amount=2)
+    for pid in (101, 102):
+        with open(tmp_path / f"{pid}.json", "w") as f:
+            json.dump(registry.snapshot(), f)
+
+    fold_snapshot(str(tmp_path), 101)
+    fold_snapshot(str(tmp_path), 102)
+    fold_snapshot(str(tmp_path), 103)
+
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == ["aggregate.json"]
+    merged = merge_snapshots(read_snapshots(str(tmp_path)))
+    assert merged["requests_total"]["values"] == [[[], 6.0]]
+    assert "in_flight" not in merged
+
+def test_sqlite_statements_are_timed(tmp_path, monkeypatch):
+    """Test that statements run through the thread connection are recorded by statement"""
+    monkeypatch.setattr("music_collection.utils.sql_utils.DB_PATH", str(tmp_path / "stocks.db"))
+    try:
+        with get_db_connection() as conn:
+            conn.execute("CREATE TABLE t (x INTEGER)")
+            conn.cursor().executemany("INSERT INTO t VALUES (?)", [(1,), (2,)])
+            conn.execute("SELECT   x\n  FROM t").fetchall()
+    finally:
+        close_db_connections()
+
+    labels = {tuple(labels)[0] for labels, _ in DB_QUERY_SECONDS.snapshot()["values"]}
+    assert {"INSERT INTO t VALUES (?)", "SELECT x FROM t"} <= labels
+
+def test_invalid_json_is_an_upstream_error():
+    """Test that an undecodable body counts as an error in the client stats and in the metric"""
+    client = UpstreamClient("https://upstream.test/query", max_retries=0)
+    response = MagicMock(status_code=200, content=b"<html>rate limited</html>")
+    before = dict((tuple(labels), value) for labels, value in
+                  UPSTREAM_ERRORS.snapshot()["values"]).get(("GLOBAL_QUOTE", "invalid_json"), 0)
+
+    with patch.object(client.session, "get", return_value=response):
+        with pytest.raises(ValueError):
+            client.get_json({"function": "GLOBAL_QUOTE"})
+
+    after = dict((tuple(labels), value) for labels, value in UPSTREAM_ERRORS.snapshot()["values"])
+    assert after[("GLOBAL_QUOTE", "invalid_json")] == before + 1
+    assert client.stats()["errors"] == 1
@@ -0,0 +1,60 @@
+import os
+import pytest
+import sqlite3
+from music_collection.models.portfolio_model import SELECT_LOTS, SELECT_LOTS_TO_CONSUME
+from music_collection.utils.migrations import find_table_scans, list_migrations, run_migrations
+from music_collection.utils.sql_utils import close_db_connections
+
+# Queries on the request path, with representative parameters. None of them
+# may scan a whole table as the data grows.
+HOT_QUERIES = [
+    (SELECT_LOTS_TO_CONSUME, ("AAPL",)),
+    (SELECT_LOTS.format(where="WHERE symbol = ?"), ("AAPL",)),
+    ("SELECT total_shares FROM positions WHERE symbol = ?", ("AAPL",)),
+    ("SELECT date, open, high, low, close, volume FROM daily_bars WHERE symbol = ? ORDER BY date", ("AAPL",)),
+    ("SELECT MAX(date) FROM daily_bars WHERE symbol = ?", ("AAPL",)),
+    ("SELECT last_checked FROM history_sync WHERE symbol = ?", ("AAPL",)),
+    ("SELECT payload, fetched_at FROM quotes WHERE symbol = ?", ("AAPL",)),
+    ("SELECT id, salt, hashed_password FROM users WHERE username = ?", ("testuser",)),
+    ("SELECT user_id, username, expires_at FROM sessions WHERE token_id = ?", ("abc",)),
+    ("SELECT token_id FROM sessions WHERE user_id = ?", (1,)),
+    ("DELETE FROM sessions WHERE expires_at < ?", (0,)),
+]
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Point the connection manager at an empty test database"""
+    path = str(tmp_path / "stocks.db")
+    monkeypatch.setattr("music_collection.utils.sql_utils.DB_PATH", path)
+    yield path
+    close_db_connections()
+
+def test_migrations_apply_once(db_path):
+    """Test that migrations are applied in order and recorded"""
+    versions = [version for version, _, _ in list_migrations()]
+    assert run_migrations() == versions
+    assert run_migrations() == []
+
+def test_migrations_keep_existing_data(db_path):
+    """Test that migrating a database created by the old schema script keeps its lots"""
+    conn = sqlite3.connect(db_path)
+    with open(os.path.join(os.path.dirname(__file__), "..", "sql", "create_portfolio_table.sql")) as f:
+        conn.executescript(f.read())
+    conn.execute("DROP TABLE positions")
+    conn.execute("INSERT INTO portfolio (symbol, shares, purchase_price, purchase_date) "
+                 "VALUES ('AAPL', 10, 100.0, '2024-01-02')")
+    conn.commit()
+    conn.close()
+
+    run_migrations()
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT symbol, shares FROM portfolio").fetchall() == [("AAPL", 10)]
+    assert conn.execute("SELECT * FROM positions").fetchall() == [("AAPL", 10, 1000.0)]
+    conn.close()
+
+@pytest.mark.parametrize("query,params", HOT_QUERIES)
+def test_hot_queries_do_not_scan(db_path, query, params):
+    """Test that every hot query is served by an index"""
+    run_migrations()
+    assert find_table_scans(query, params) == []
@@ -3,12 +3,14 @@ import sqlite3
 from datetime import datetime
 from unittest.mock import Mock, patch
 from music_collection.models.portfolio_model import PortfolioModel
+from music_collection.utils.migrations import run_migrations
+from music_collection.utils.sql_utils import close_db_connections
 
 @pytest.fixture
-def portfolio_model():
-    """Create a test portfolio model with in-memory database"""
-    # Create shared database connection
-    conn = sqlite3.connect(":memory:")
+def portfolio_model(tmp_path, monkeypatch):
+    """Create a test portfolio model with a file-backed test database"""
+    db_path = str(tmp_path / "stocks.db")
+    conn = sqlite3.connect(db_path)
     
     # Create the portfolio table
     conn.execute("""
@@ -21,16 +23,17 @@ def portfolio_model():
         )
     """)
     conn.commit()
+    conn.close()
     
-    # Create model and set connection
+    # Point the shared connection manager at the test database
+    monkeypatch.setattr("music_collection.utils.sql_utils.DB_PATH", db_path)
+    run_migrations()
     model = PortfolioModel()
-    model.db_path = ":memory:"
-    model._conn = conn  # Store connection on model instance
     
     yield model
     
     # Cleanup
-    conn.close()
+    close_db_connections()
 
 @pytest.fixture
 def mock_stock_info():
@@ -78,8 +81,172 @@ def test_sell_stock_success(portfolio_model, mock_stock_info):
 
 def test_sell_stock_not_enough_shares(portfolio_model, mock_stock_info):
     """Test selling more shares than owned"""
-    with patch.object(portfolio_model.stock_model, 'get_stock_info', return_value=mock_stock_info):
+    with patch.object(portfolio_model.stock_model, 'get_stock_info', return_value=mock_stock_info) as quote:
         portfolio_model.buy_stock("AAPL", 5)
         
         with pytest.raises(ValueError, match="Not enough shares to sell"):
-            portfolio_model.sell_stock("AAPL", 10)
\ No newline at end of file
+            portfolio_model.sell_stock("AAPL", 10)
+
+    # The oversell is rejected before it is quoted, so it spends no upstream quota
+    quote.assert_called_once()
+
+@pytest.fixture
+def portfolio_db(tmp_path, monkeypatch):
+    """Point the models at a file-backed test database with the portfolio table"""
+    db_path = str(tmp_path / "stocks.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE portfolio (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            symbol TEXT NOT NULL,
+            shares INTEGER NOT NULL,
+            purchase_price REAL NOT NULL,
+            purchase_date TIMESTAMP NOT NULL
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO portfolio (symbol, shares, purchase_price, purchase_date) VALUES (?, ?, ?, ?)",
+        [("AAPL", 10, 100.0, datetime(2024, 1, 2)), ("MSFT", 5, 300.0, datetime(2024, 1, 3))]
+    )
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr("music_collection.utils.sql_utils.DB_PATH", db_path)
+    run_migrations()
+    yield db_path
+    close_db_connections()
+
+def test_get_portfolio_flags_failed_quotes(portfolio_db, mock_stock_info):
+    """Test that a failed quote marks only that holding as partial"""
+    model = PortfolioModel()
+
+    def get_stock_info(symbol, priority=None):
+        if symbol == "MSFT":
+            raise ValueError("Could not fetch data for symbol MSFT")
+        return mock_stock_info
+
+    with patch.object(model.stock_model, 'get_stock_info', side_effect=get_stock_info):
+        holdings = {holding["symbol"]: holding for holding in model.get_portfolio()}
+        value = model.get_portfolio_value()
+
+    assert holdings["AAPL"]["partial"] is False
+    assert holdings["AAPL"]["current_value"] == 1500.00
+    assert holdings["MSFT"]["partial"] is True
+    assert holdings["MSFT"]["current_price"] is None
+    assert value["partial"] is True
+    assert value["missing_symbols"] == ["MSFT"]
+    assert value["total_value"] == 1500.00
+
+def test_positions_follow_buys_and_sells(portfolio_db, mock_stock_info):
+    """Test that the positions table tracks shares and FIFO cost basis"""
+    model = PortfolioModel()
+    with patch.object(model.stock_model, 'get_stock_info', return_value=mock_stock_info):
+        model.buy_stock("AAPL", 10)
+        model.sell_stock("AAPL", 15)
+        holdings = {holding["symbol"]: holding for holding in model.get_portfolio()}
+
+    # 10 @ 100 was consumed first, leaving 5 of the 150.00 lot
+    assert holdings["AAPL"]["shares"] == 5
+    assert holdings["AAPL"]["avg_purchase_price"] == 150.00
+
+    conn = sqlite3.connect(portfolio_db)
+    maintained = conn.execute("SELECT * FROM positions ORDER BY symbol").fetchall()
+    conn.close()
+    assert model.rebuild_positions() == 2
+    conn = sqlite3.connect(portfolio_db)
+    assert conn.execute("SELECT * FROM positions ORDER BY symbol").fetchall() == maintained
+    conn.close()
+
+def test_sell_consumes_lots_fifo(portfolio_db, mock_stock_info):
+    """Test that a sale deletes fully consumed lots and trims the next one"""
+    model = PortfolioModel()
+    with patch.object(model.stock_model, 'get_stock_info', return_value=mock_stock_info):
+        for _ in range(3):
+            model.buy_stock("MSFT", 2)
+        model.sell_stock("MSFT", 8)
+
+        with pytest.raises(ValueError, match="Not enough shares to sell"):
+            model.sell_stock("MSFT", 4)
+
+    conn = sqlite3.connect(portfolio_db)
+    lots = conn.execute("SELECT shares, purchase_price FROM portfolio WHERE symbol = 'MSFT'").fetchall()
+    position = conn.execute("SELECT total_shares, total_cost FROM positions WHERE symbol = 'MSFT'").fetchone()
+    conn.close()
+
+    # The 5 @ 300 lot and the first 2 @ 150 lot are gone, one share of the second remains
+    assert lots == [(1, 150.0), (2, 150.0)]
+    assert position == (3, 450.0)
+
+def test_sell_spans_read_and_delete_batches(portfolio_db, mock_stock_info, monkeypatch):
+    """Test that a sale covering lots across several fetch and delete batches removes the right ones"""
+    monkeypatch.setattr("music_collection.models.portfolio_model.CONSUME_BATCH_SIZE", 2)
+    monkeypatch.setattr("music_collection.models.portfolio_model.DELETE_BATCH_SIZE", 3)
+    model = PortfolioModel()
+    with patch.object(model.stock_model, 'get_stock_info', return_value=mock_stock_info):
+        for _ in range(8):
+            model.buy_stock("MSFT", 2)
+        model.sell_stock("MSFT", 16)
+
+    conn = sqlite3.connect(portfolio_db)
+    lots = conn.execute("SELECT shares FROM portfolio WHERE symbol = 'MSFT' ORDER BY id").fetchall()
+    position = conn.execute("SELECT total_shares, total_cost FROM positions WHERE symbol = 'MSFT'").fetchone()
+    conn.close()
+
+    # 5 @ 300 and the first five 2 @ 150 lots are gone, one share of the sixth remains
+    assert lots == [(1,), (2,), (2,)]
+    assert position == (5, 750.0)
+
+def test_execute_orders_in_one_batch(portfolio_db, mock_stock_info):
+    """Test that a batch fills valid orders, rejects the rest and quotes each symbol once"""
+    model = PortfolioModel()
+    orders = [
+        {"side": "buy", "symbol": "AAPL", "shares": 5},
+        {"side": "sell", "symbol": "AAPL", "shares": 12},
+        {"side": "sell", "symbol": "MSFT", "shares": 6},
+        {"side": "hold", "symbol": "AAPL", "shares": 1},
+        {"side": "buy", "symbol": "AAPL", "shares": 1},
+    ]
+    with patch.object(model.stock_model, 'get_stock_info', return_value=mock_stock_info) as quote:
+        results = model.execute_orders(orders)
+
+    # The MSFT oversell is rejected before quoting, so only AAPL is quoted
+    assert quote.call_count == 1
+    assert [result["status"] for result in results] == ["filled", "filled", "rejected", "rejected", "filled"]
+    assert "Not enough shares" in results[2]["error"]
+    assert results[1]["total"] == 1800.00
+
+    conn = sqlite3.connect(portfolio_db)
+    positions = dict(conn.execute("SELECT symbol, total_shares FROM positions").fetchall())
+    conn.close()
+    assert positions == {"AAPL": 4, "MSFT": 5}
+
+def test_execute_orders_oversells_spend_no_quota(portfolio_db, mock_stock_info):
+    """Test that a batch of sells the holdings cannot cover is rejected without quoting"""
+    model = PortfolioModel()
+    orders = [
+        {"side": "sell", "symbol": "MSFT", "shares": 6},
+        {"side": "sell", "symbol": "MSFT", "shares": 6},
+        {"side": "sell", "symbol": "GOOGL", "shares": 1},
+    ]
+    with patch.object(model.stock_model, 'get_stock_info', return_value=mock_stock_info) as quote:
+        results = model.execute_orders(orders)
+
+    quote.assert_not_called()
+    assert [result["status"] for result in results] == ["rejected", "rejected", "rejected"]
+    assert "You own 5 shares of MSFT" in results[0]["error"]
+    # The first sell is rejected on its own, so the second is checked against the full holding
+    assert "You own 5 shares of MSFT" in results[1]["error"]
+
+def test_iter_lots_in_batches(portfolio_db, mock_stock_info):
+    """Test that lots are listed per symbol in purchase order across fetch batches"""
+    model = PortfolioModel()
+    with patch.object(model.stock_model, 'get_stock_info', return_value=mock_stock_info):
+        model.buy_stock("AAPL", 3)
+        model.buy_stock("aapl", 1)
+
+    lots = list(model.iter_lots(batch_size=1))
+    assert [(lot["symbol"], lot["shares"], lot["purchase_price"]) for lot in lots] == [
+        ("AAPL", 10, 100.0), ("AAPL", 3, 150.0), ("MSFT", 5, 300.0), ("aapl", 1, 150.0)
+    ]
+    assert [lot["symbol"] for lot in model.iter_lots("MSFT")] == ["MSFT"]
+    # Symbols are matched as stored, like buy_stock and sell_stock do
+    assert [lot["shares"] for lot in model.iter_lots("aapl")] == [1]
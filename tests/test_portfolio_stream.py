@@ -0,0 +1,60 @@
+import pytest
+from unittest.mock import patch
+from music_collection.models.portfolio_model import PortfolioModel
+from music_collection.models.portfolio_stream import PortfolioStream, diff_snapshots
+from music_collection.utils.migrations import run_migrations
+from music_collection.utils.sql_utils import close_db_connections
+
+@pytest.fixture
+def portfolio_model(tmp_path, monkeypatch):
+    """Create a portfolio model over a migrated test database"""
+    monkeypatch.setattr("music_collection.utils.sql_utils.DB_PATH", str(tmp_path / "stocks.db"))
+    run_migrations()
+    yield PortfolioModel()
+    close_db_connections()
+
+@pytest.fixture
+def mock_stock_info():
+    """Mock stock information response"""
+    return {"symbol": "AAPL", "price": 150.00, "volume": 1000000, "change": 2.50, "change_percent": "1.5%"}
+
+def test_diff_snapshots_reports_only_changes():
+    """Test that a delta holds changed fields, removed holdings and changed totals only"""
+    old = {"holdings": {"AAPL": {"shares": 10, "current_price": 150.0}, "MSFT": {"shares": 5}},
+           "totals": {"total_value": 2000.0, "partial": False}}
+    new = {"holdings": {"AAPL": {"shares": 10, "current_price": 151.0}},
+           "totals": {"total_value": 1510.0, "partial": False}}
+
+    assert diff_snapshots(old, new) == {
+        "holdings": {"AAPL": {"current_price": 151.0}, "MSFT": None},
+        "totals": {"total_value": 1510.0}
+    }
+    assert diff_snapshots(new, new) == {}
+
+def test_subscribers_share_one_computation(portfolio_model, mock_stock_info):
+    """Test that subscribers get a snapshot, then a delta after a trade, from shared updates"""
+    stream = PortfolioStream(portfolio_model, interval=60)
+    with patch.object(portfolio_model.stock_model, 'get_stock_info', return_value=mock_stock_info):
+        portfolio_model.buy_stock("AAPL", 10)
+
+        first = stream.subscribe()
+        event, snapshot = first.get(timeout=5)
+        assert event == "snapshot"
+        assert snapshot["holdings"]["AAPL"]["shares"] == 10
+        assert snapshot["totals"]["total_value"] == 1500.0
+
+        second = stream.subscribe()
+        assert second.get(timeout=5)[0] == "snapshot"
+
+        with patch.object(portfolio_model, 'get_portfolio', wraps=portfolio_model.get_portfolio) as compute:
+            portfolio_model.buy_stock("AAPL", 5)
+            for subscriber in (first, second):
+                event, delta = subscriber.get(timeout=5)
+                assert event == "delta"
+                assert delta["holdings"]["AAPL"]["shares"] == 15
+                assert delta["totals"]["total_value"] == 2250.0
+        assert compute.call_count == 1
+
+    stream.unsubscribe(first)
+    stream.unsubscribe(second)
+    assert stream.subscriber_count() == 0
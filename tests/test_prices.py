@@ -0,0 +1,85 @@
+import pytest
+import sqlite3
+import time
+from datetime import datetime
+from unittest.mock import patch
+from music_collection.models.portfolio_model import PortfolioModel
+from music_collection.models.price_refresher import PriceRefresher
+from music_collection.utils.migrations import run_migrations
+from music_collection.utils.quota import BACKGROUND, QuotaExhaustedError
+from music_collection.utils.sql_utils import close_db_connections
+
+@pytest.fixture
+def portfolio_model(tmp_path, monkeypatch):
+    """Create a portfolio model holding AAPL and MSFT in a migrated test database"""
+    db_path = str(tmp_path / "stocks.db")
+    monkeypatch.setattr("music_collection.utils.sql_utils.DB_PATH", db_path)
+    run_migrations()
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO portfolio (symbol, shares, purchase_price, purchase_date) VALUES (?, ?, ?, ?)",
+        [("AAPL", 10, 100.0, datetime(2024, 1, 2)), ("MSFT", 5, 300.0, datetime(2024, 1, 3))]
+    )
+    conn.commit()
+    conn.close()
+    model = PortfolioModel()
+    model.rebuild_positions()
+    yield model
+    close_db_connections()
+
+def quote(price):
+    return {"symbol": "AAPL", "price": price, "volume": 1000000, "change": 2.50, "change_percent": "1.5%"}
+
+def test_portfolio_uses_fresh_stored_prices(portfolio_model):
+    """Test that only symbols without a fresh stored price are quoted upstream, and written back"""
+    portfolio_model.prices.save_prices({"AAPL": 120.0})
+    portfolio_model.prices.save_prices({"MSFT": 250.0}, time.time() - 3600)
+
+    with patch.object(portfolio_model.stock_model, 'get_stock_info', return_value=quote(310.0)) as get_quote:
+        holdings = {holding["symbol"]: holding for holding in portfolio_model.get_portfolio()}
+        assert [call.args[0] for call in get_quote.call_args_list] == ["MSFT"]
+        assert holdings["AAPL"]["current_price"] == 120.0
+        assert holdings["MSFT"]["current_price"] == 310.0
+
+        portfolio_model.get_portfolio_value()
+        assert get_quote.call_count == 1
+
+def test_refresher_writes_stalest_prices_until_quota_runs_out(portfolio_model, tmp_path):
+    """Test that a refresh batch stores prices and stops when quota is exhausted"""
+    refresher = PriceRefresher(portfolio_model.stock_model, portfolio_model.prices,
+                               lock_path=str(tmp_path / "refresh.lock"))
+    portfolio_model.prices.save_prices({"MSFT": 250.0}, time.time() - 3600)
+
+    with patch.object(portfolio_model.stock_model, 'refresh_quote',
+                      side_effect=[quote(130.0), QuotaExhaustedError("quota", 60)]) as refresh:
+        assert refresher.refresh_once() == 1
+    assert [call.args[0] for call in refresh.call_args_list] == ["AAPL", "MSFT"]
+
+    with patch.object(portfolio_model.stock_model, 'refresh_quote', return_value=quote(320.0)) as refresh:
+        assert refresher.refresh_once() == 1
+    refresh.assert_called_once_with("MSFT", BACKGROUND)
+
+def test_refresher_skips_prices_younger_than_max_age(portfolio_model, tmp_path):
+    """Test that only prices about to go stale are refreshed, not every price older than the interval"""
+    refresher = PriceRefresher(portfolio_model.stock_model, portfolio_model.prices,
+                               lock_path=str(tmp_path / "refresh.lock"), interval=60)
+    portfolio_model.prices.max_age = 300
+    portfolio_model.prices.save_prices({"AAPL": 120.0}, time.time() - 120)
+    portfolio_model.prices.save_prices({"MSFT": 250.0}, time.time() - 250)
+
+    with patch.object(portfolio_model.stock_model, 'refresh_quote', return_value=quote(320.0)) as refresh:
+        assert refresher.refresh_once() == 1
+    refresh.assert_called_once_with("MSFT", BACKGROUND)
+
+def test_only_one_refresher_holds_the_lock(portfolio_model, tmp_path):
+    """Test that a second refresher on the same lock file does no work"""
+    lock_path = str(tmp_path / "refresh.lock")
+    first = PriceRefresher(portfolio_model.stock_model, portfolio_model.prices, lock_path)
+    second = PriceRefresher(portfolio_model.stock_model, portfolio_model.prices, lock_path)
+    try:
+        assert first._acquire_lock()
+        assert not second._acquire_lock()
+    finally:
+        first.stop()
+    assert second._acquire_lock()
+    second.stop()
@@ -0,0 +1,78 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response
+from music_collection.utils import profiling
+from music_collection.utils.json_provider import configure_json, stream_json_array
+from music_collection.utils.profiling import Profiler
+
+def test_profiling_is_off_without_token(tmp_path):
+    """Test that nothing is profiled, even when asked, unless a token is configured"""
+    profiler = Profiler(token=None, sample_rate=1.0, directory=str(tmp_path))
+    assert profiler.start("GET", "/api/portfolio", "anything") is None
+    assert profiler.start("GET", "/api/portfolio", None) is None
+
+def test_profile_splits_phases_and_follows_pool_threads(tmp_path):
+    """Test that phases are timed on the request thread and in pool work submitted for it"""
+    profiler = Profiler(token="secret", sample_rate=0.0, directory=str(tmp_path))
+    assert profiler.start("GET", "/api/portfolio", "wrong") is None
+    assert profiler.start("GET", "/api/portfolio", None) is None
+
+    token = profiler.start("GET", "/api/portfolio", "secret")
+    assert token is not None
+    # One profile at a time per process
+    assert profiler.start("GET", "/api/portfolio", "secret") is None
+
+    with profiling.phase("db"):
+        time.sleep(0.01)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        profiling.submit(executor, profiling.record, "upstream", 0.5).result()
+    profile_id = profiler.finish(token, 200)
+
+    summary = profiler.get_profile(profile_id)
+    assert summary["phases_ms"]["db"] >= 10
+    assert summary["phases_ms"]["upstream"] == 0
+    assert summary["parallel_ms"]["upstream"] == 500
+    assert summary["phases_ms"]["compute"] >= 0
+    assert [profile["id"] for profile in profiler.list_profiles()] == [profile_id]
+    assert "function calls" in profiler.format_stats(profile_id)
+
+def test_sample_rate_is_shared_and_expires(tmp_path, monkeypatch):
+    """Test that a sample rate set in one process is picked up by another until it expires"""
+    monkeypatch.setattr(profiling, "SAMPLE_RATE_CHECK_INTERVAL", 0.0)
+    first = Profiler(token="secret", sample_rate=0.0, directory=str(tmp_path))
+    second = Profiler(token="secret", sample_rate=0.0, directory=str(tmp_path))
+
+    first.set_sample_rate(1.0, duration=60)
+    token = second.start("GET", "/api/health", None)
+    assert token is not None
+    second.finish(token, 200)
+
+    first.set_sample_rate(1.0, duration=0.01)
+    time.sleep(0.02)
+    assert second.start("GET", "/api/health", None) is None
+
+def test_streamed_encoding_counts_as_serialize(tmp_path):
+    """Test that encoding a streamed body is timed as serialize while the body is read"""
+    app = Flask(__name__)
+    configure_json(app)
+    profiler = Profiler(token="secret", sample_rate=0.0, directory=str(tmp_path))
+
+    token = profiler.start("GET", "/api/portfolio/lots", "secret")
+    body = b"".join(stream_json_array(app, ({"id": index} for index in range(20000))))
+    summary = profiler.get_profile(profiler.finish(token, 200))
+
+    assert body.startswith(b'[{"id":0}')
+    assert summary["phases_ms"]["serialize"] > 0
+    assert summary["phase_calls"]["serialize"] == 1
+
+def test_event_stream_profile_ends_before_the_body(tmp_path):
+    """Test that an open event stream does not keep the profiler busy, while a finite stream is profiled to the end"""
+    profiler = Profiler(token="secret", sample_rate=0.0, directory=str(tmp_path))
+
+    token = profiler.start("GET", "/api/portfolio/stream", "secret")
+    events = Response(iter(["data: {}\n\n"] * 3), mimetype="text/event-stream")
+    profiler.finish_response(token, events)
+    assert profiling.current() is None
+    assert profiler.get_profile(events.headers["X-Profile-Id"])["path"] == "/api/portfolio/stream"
+    # The stream is still open, yet the next request can be profiled
+    assert profiler.start("GET", "/api/portfolio", "secret") is not None
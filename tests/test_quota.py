@@ -0,0 +1,85 @@
+import pytest
+import threading
+import time
+from unittest.mock import patch
+from music_collection.models.stock_model import StockModel
+from music_collection.utils.quota import BACKGROUND, BROWSE, TRADE, VALUATION, QuotaExhaustedError, QuotaScheduler
+
+def test_browsing_cannot_spend_reserved_quota():
+    """Test that browsing stops at its reserve while trades can use the rest"""
+    scheduler = QuotaScheduler(per_minute=10, per_day=0)
+    for _ in range(7):
+        scheduler.acquire(BROWSE, timeout=0)
+    with pytest.raises(QuotaExhaustedError) as error:
+        scheduler.acquire(BROWSE, timeout=0)
+    assert error.value.retry_after >= 1
+
+    for _ in range(3):
+        scheduler.acquire(TRADE, timeout=0)
+    stats = scheduler.stats()
+    assert stats["classes"]["browse"] == {"granted": 7, "rejected": 1, "avg_wait_ms": pytest.approx(0, abs=50)}
+    assert stats["buckets"]["minute"]["remaining"] < 1
+
+def test_background_cannot_spend_browsing_quota():
+    """Test that background calls stop at half of a bucket while browsing can use more"""
+    scheduler = QuotaScheduler(per_minute=10, per_day=0)
+    for _ in range(5):
+        scheduler.acquire(BACKGROUND)
+    with pytest.raises(QuotaExhaustedError):
+        scheduler.acquire(BACKGROUND)
+    scheduler.acquire(BROWSE, timeout=0)
+
+def test_waiting_callers_are_served_by_priority():
+    """Test that a queued trade is served before a browse call queued earlier"""
+    scheduler = QuotaScheduler(per_minute=600, per_day=0, reserve={TRADE: 0, VALUATION: 0, BROWSE: 0})
+    for _ in range(600):
+        scheduler.acquire(TRADE, timeout=0)
+
+    order = []
+    def call(priority):
+        scheduler.acquire(priority, timeout=5)
+        order.append(priority)
+
+    browse = threading.Thread(target=call, args=(BROWSE,))
+    browse.start()
+    while not scheduler.stats()["waiting"]:
+        time.sleep(0.001)
+    trade = threading.Thread(target=call, args=(TRADE,))
+    trade.start()
+    browse.join()
+    trade.join()
+    assert order == [TRADE, BROWSE]
+
+def test_quota_exhausted_is_not_masked():
+    """Test that a quota rejection reaches the caller instead of a generic fetch error"""
+    model = StockModel()
+    model.scheduler = QuotaScheduler(per_minute=1, per_day=0)
+    model.client.scheduler = model.scheduler
+    with patch.object(model.client, '_attempt', return_value={"Global Quote": {"05. price": "1"}}):
+        model.get_stock_info("AAPL", TRADE)
+        with pytest.raises(QuotaExhaustedError):
+            model.get_stock_info("MSFT", TRADE)
+    assert model.get_quota_stats()["classes"]["trade"]["rejected"] == 1
+
+def test_shared_schedulers_spend_one_budget(tmp_path):
+    """Test that processes sharing a quota file cannot together grant more than the configured quota"""
+    workers = [QuotaScheduler(per_minute=5, per_day=25) for _ in range(4)]
+    for scheduler in workers:
+        scheduler.share(str(tmp_path / "quota"))
+
+    granted = 0
+    for _ in range(3):
+        for scheduler in workers:
+            try:
+                scheduler.acquire(TRADE, timeout=0)
+                granted += 1
+            except QuotaExhaustedError:
+                pass
+    assert granted == 5
+    assert workers[0].stats()["buckets"]["day"]["remaining"] == pytest.approx(20, abs=0.01)
+
+    # A new worker, e.g. one recycled by gunicorn, picks up the spent budget
+    replacement = QuotaScheduler(per_minute=5, per_day=25)
+    replacement.share(str(tmp_path / "quota"))
+    with pytest.raises(QuotaExhaustedError):
+        replacement.acquire(TRADE, timeout=0)
@@ -3,12 +3,14 @@ import sqlite3
 from datetime import datetime
 from unittest.mock import Mock, patch
 from music_collection.models.portfolio_model import PortfolioModel
+from music_collection.utils.migrations import run_migrations
+from music_collection.utils.sql_utils import close_db_connections
 
 @pytest.fixture
-def portfolio_model():
-    """Create a test portfolio model with in-memory database"""
-    # Create shared database connection
-    conn = sqlite3.connect(":memory:")
+def portfolio_model(tmp_path, monkeypatch):
+    """Create a test portfolio model with a file-backed test database"""
+    db_path = str(tmp_path / "stocks.db")
+    conn = sqlite3.connect(db_path)
     
     # Create the portfolio table
     conn.execute("""
@@ -21,16 +23,17 @@ def portfolio_model():
         )
     """)
     conn.commit()
+    conn.close()
     
-    # Create model and set connection
+    # Point the shared connection manager at the test database
+    monkeypatch.setattr("music_collection.utils.sql_utils.DB_PATH", db_path)
+    run_migrations()
     model = PortfolioModel()
-    model.db_path = ":memory:"
-    model._conn = conn  # Store connection on model instance
     
     yield model
     
     # Cleanup
-    conn.close()
+    close_db_connections()
 
 @pytest.fixture
 def mock_stock_info():
@@ -0,0 +1,83 @@
+import pytest
+import threading
+import time
+from music_collection.models.session_model import SessionModel
+from music_collection.models.user_model import UserModel
+from music_collection.utils.hash_pool import HashPool, HashPoolBusyError
+from music_collection.utils.migrations import run_migrations
+from music_collection.utils.sql_utils import close_db_connections
+
+@pytest.fixture
+def user_model(tmp_path, monkeypatch):
+    """Create a user model that hashes inline against a migrated test database"""
+    monkeypatch.setattr("music_collection.utils.sql_utils.DB_PATH", str(tmp_path / "stocks.db"))
+    run_migrations()
+    yield UserModel(hash_pool=HashPool(workers=0))
+    close_db_connections()
+
+def test_create_account_and_login(user_model):
+    """Test that a created account can log in only with the right password"""
+    user_model.create_account("testuser", "testpassword")
+    assert user_model.login("testuser", "testpassword")["message"] == "Login successful"
+    with pytest.raises(ValueError, match="Invalid username or password"):
+        user_model.login("testuser", "wrongpassword")
+
+def test_hash_pool_rejects_when_queue_full():
+    """Test that hashing beyond the pending limit fails fast instead of queueing"""
+    pool = HashPool(workers=1, max_pending=1)
+    thread = threading.Thread(target=pool.hash, args=("password", b"salt", 2000000))
+    thread.start()
+
+    # Wait until the slow hash holds the only slot
+    while pool._slots._value:
+        time.sleep(0.01)
+    try:
+        with pytest.raises(HashPoolBusyError):
+            pool.hash("password", b"salt", 1)
+    finally:
+        thread.join()
+        pool.shutdown()
+    assert pool.hash("password", b"salt", 1) == HashPool(workers=0).hash("password", b"salt", 1)
+
+def test_hash_pool_timeout_is_shed():
+    """Test that a hash outliving the timeout is reported as overload rather than a generic error"""
+    pool = HashPool(workers=1, timeout=0.001)
+    try:
+        with pytest.raises(HashPoolBusyError):
+            pool.hash("password", b"salt", 2000000)
+    finally:
+        pool.shutdown()
+
+def test_login_issues_session_token(user_model):
+    """Test that a login token validates without hashing and stops working after logout"""
+    user_model.create_account("testuser", "testpassword")
+    token = user_model.login("testuser", "testpassword")["token"]
+
+    # A fresh model has an empty cache, so this goes through the sessions table
+    sessions = SessionModel(secret=user_model.sessions.secret)
+    assert sessions.validate(token)["username"] == "testuser"
+
+    user_model.sessions.revoke(token)
+    sessions.cache.clear()
+    with pytest.raises(ValueError, match="Invalid session"):
+        sessions.validate(token)
+
+def test_session_token_rejects_forged_and_expired(user_model):
+    """Test that tampered and expired tokens are rejected"""
+    token = user_model.sessions.create_session(1, "testuser")["token"]
+    token_id, expires_at, signature = token.split('.')
+    with pytest.raises(ValueError, match="Invalid session"):
+        user_model.sessions.validate(f"{token_id}.{int(expires_at) + 1000}.{signature}")
+
+    user_model.sessions.ttl = -1
+    expired = user_model.sessions.create_session(1, "testuser")["token"]
+    with pytest.raises(ValueError, match="Session expired"):
+        user_model.sessions.validate(expired)
+
+def test_update_password_revokes_sessions(user_model):
+    """Test that changing the password ends existing sessions"""
+    user_model.create_account("testuser", "testpassword")
+    token = user_model.login("testuser", "testpassword")["token"]
+    user_model.update_password("testuser", "testpassword", "newpassword")
+    with pytest.raises(ValueError, match="Invalid session"):
+        user_model.sessions.validate(token)